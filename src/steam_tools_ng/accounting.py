@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+#
+# Lara Maia <dev@lara.monster> 2015 ~ 2023
+#
+# The Steam Tools NG is free software: you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, either version 3 of
+# the License, or (at your option) any later version.
+#
+# The Steam Tools NG is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see http://www.gnu.org/licenses/.
+#
+
+# CPU time and wakeups of each task running on the event loop.
+#
+# A task factory wraps each coroutine, so every step of a task (a wakeup) is
+# timed with the thread CPU clock. Tasks are accounted by module: module tasks
+# are named after it and the tasks they create are accounted to the same module.
+# Background tasks are accounted by their coroutine name.
+
+import asyncio
+import collections.abc
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Generator, Optional
+
+from . import i18n, loop_monitor
+
+_ = i18n.get_translation
+
+thread_time = time.thread_time
+
+
+@dataclass
+class TaskAccount:
+    cpu_time: float = 0.0
+    wakeups: int = 0
+    tasks: int = 0
+
+
+accounts: Dict[str, TaskAccount] = {}
+start_time = time.monotonic()
+start_cpu_time = thread_time()
+
+
+class _AccountedCoroutine(collections.abc.Coroutine):  # type: ignore
+    __slots__ = ('coro', 'task', 'parent', 'account', 'key')
+
+    def __init__(self, coro: Any, parent: Optional['_AccountedCoroutine']) -> None:
+        self.coro = coro
+        self.task: Optional['asyncio.Task[Any]'] = None
+        self.parent = parent
+        self.account: Optional[TaskAccount] = None
+        self.key = ''
+
+    # task name is only set after the task factory returns
+    def _account(self) -> TaskAccount:
+        assert self.task
+        name = self.task.get_name()
+
+        if name not in loop_monitor.known_modules:
+            if self.parent and self.parent.account and self.parent.key in loop_monitor.known_modules:
+                name = self.parent.key
+            else:
+                name = getattr(self.coro, '__qualname__', name)
+
+        self.key = name
+        self.account = accounts.setdefault(name, TaskAccount())
+        self.account.tasks += 1
+        self.parent = None
+        return self.account
+
+    def send(self, value: Any) -> Any:
+        account = self.account or self._account()
+        start = thread_time()
+
+        try:
+            return self.coro.send(value)
+        finally:
+            account.cpu_time += thread_time() - start
+            account.wakeups += 1
+
+    def throw(self, *args: Any) -> Any:
+        account = self.account or self._account()
+        start = thread_time()
+
+        try:
+            return self.coro.throw(*args)
+        finally:
+            account.cpu_time += thread_time() - start
+            account.wakeups += 1
+
+    def close(self) -> None:
+        self.coro.close()
+
+    def __await__(self) -> Generator[Any, None, Any]:
+        return self.coro.__await__()  # type: ignore
+
+    # cr_frame, cr_await, etc. (used by task repr and get_stack)
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.coro, name)
+
+    def __repr__(self) -> str:
+        return repr(self.coro)
+
+
+def _task_factory(loop: asyncio.AbstractEventLoop, coro: Any, **kwargs: Any) -> 'asyncio.Task[Any]':
+    parent_task = asyncio.current_task(loop)
+    parent = parent_task.get_coro() if parent_task else None
+    wrapper = _AccountedCoroutine(coro, parent if isinstance(parent, _AccountedCoroutine) else None)
+    task = asyncio.Task(wrapper, loop=loop, **kwargs)
+    wrapper.task = task
+    return task
+
+
+def install(loop: asyncio.AbstractEventLoop) -> None:
+    global start_time, start_cpu_time
+    start_time = time.monotonic()
+    start_cpu_time = thread_time()
+    loop.set_task_factory(_task_factory)
+
+
+def as_dict() -> Dict[str, Dict[str, Any]]:
+    return {
+        name: {'cpu_time': account.cpu_time, 'wakeups': account.wakeups, 'tasks': account.tasks}
+        for name, account in accounts.items()
+    }
+
+
+# events are the ModuleData yielded by each module (see metrics.module_events)
+def summary(limit: int = 25, events: Optional[Dict[str, float]] = None) -> str:
+    elapsed = max(time.monotonic() - start_time, 1)
+    total_cpu_time = thread_time() - start_cpu_time
+    events = events or {}
+    lines = [f"{'task':<48} {'cpu':>9} {'cpu%':>6} {'wakeups':>8} {'/s':>7} {'tasks':>6} {'events':>7}"]
+    sorted_accounts = sorted(accounts.items(), key=lambda item: item[1].cpu_time, reverse=True)
+
+    for name, account in sorted_accounts[:limit]:
+        lines.append(
+            f"{name[:48]:<48} {account.cpu_time:>8.2f}s {account.cpu_time / elapsed * 100:>5.1f}% "
+            f"{account.wakeups:>8} {account.wakeups / elapsed:>7.2f} {account.tasks:>6} "
+            f"{int(events.get(name, 0)) if name in events else '':>7}"
+        )
+
+    # callbacks (call_soon, call_later, GLib sources) and the loop itself
+    other_cpu_time = max(total_cpu_time - sum(account.cpu_time for account in accounts.values()), 0)
+    lines.append(f"{_('(loop and callbacks)'):<48} {other_cpu_time:>8.2f}s {other_cpu_time / elapsed * 100:>5.1f}%")
+    return '\n'.join(lines)
@@ -0,0 +1,222 @@
+#!/usr/bin/env python
+#
+# Lara Maia <dev@lara.monster> 2015 ~ 2023
+#
+# The Steam Tools NG is free software: you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, either version 3 of
+# the License, or (at your option) any later version.
+#
+# The Steam Tools NG is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see http://www.gnu.org/licenses/.
+#
+# Application startup, in order: event loop, config, logger, http.
+# Everything is initialized on first use and each stage is timed.
+
+import asyncio
+import contextlib
+import logging
+import ssl
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Type, TYPE_CHECKING
+
+from . import accounting, config, http_stats, i18n, loop_monitor, memory, profiling
+
+if TYPE_CHECKING:
+    import aiohttp
+    from . import metrics
+
+_ = i18n.get_translation
+log = logging.getLogger(__name__)
+
+# hosts (and subdomains) replaced by `redirect_url`
+redirect_hosts = ('steampowered.com', 'steamcommunity.com', 'steamgifts.com', 'steamtrades.com')
+
+
+def _redirect_request_class(redirect_url: str) -> Type['aiohttp.ClientRequest']:
+    import aiohttp
+    from multidict import CIMultiDict
+    from yarl import URL
+
+    target = URL(redirect_url)
+
+    # config.init refuses it as well
+    if not target.host:
+        raise ValueError(_("Invalid redirect url: {}").format(redirect_url))
+
+    target_host: str = target.host
+
+    class RedirectRequest(aiohttp.ClientRequest):
+        def __init__(self, method: str, url: URL, *args: Any, headers: Any = None, **kwargs: Any) -> None:
+            host = url.host or ''
+
+            if any(host == redirect_host or host.endswith(f'.{redirect_host}') for redirect_host in redirect_hosts):
+                headers = CIMultiDict(headers or {})
+                headers['X-Forwarded-Host'] = host
+                url = url.with_scheme(target.scheme).with_host(target_host).with_port(target.port)
+
+            super().__init__(method, url, *args, headers=headers, **kwargs)
+
+    return RedirectRequest
+
+
+class Bootstrap:
+    def __init__(self) -> None:
+        self.timings: Dict[str, float] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._tcp_connector: Optional['aiohttp.TCPConnector'] = None
+        self._http_stats_task: Optional['asyncio.Task[None]'] = None
+        self._metrics_exporter: Optional['metrics.MetricsExporter'] = None
+        self._config_loaded = False
+        self._logger_loaded = False
+
+    @contextlib.contextmanager
+    def _measure(self, stage: str) -> Iterator[None]:
+        start_time = time.perf_counter()
+
+        try:
+            yield
+        finally:
+            self.timings[stage] = time.perf_counter() - start_time
+            log.debug(_("Startup stage %s took %.3fs"), stage, self.timings[stage])
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        if not self._loop:
+            with self._measure('loop'):
+                if sys.platform == 'win32':
+                    self._loop = asyncio.ProactorEventLoop()
+                else:
+                    self._loop = asyncio.new_event_loop()
+
+                asyncio.set_event_loop(self._loop)
+
+                if self._config_loaded and config.parser.getboolean('logger', 'task_accounting'):
+                    accounting.install(self._loop)
+
+                self._loop.call_soon(self._start_monitors)
+
+        return self._loop
+
+    # started from the loop itself, so it's running when any frontend starts it
+    def _start_monitors(self) -> None:
+        if not self._config_loaded:
+            return
+
+        profiling.install_signal_handler(self.loop)
+
+        if interval := config.parser.getint('logger', 'memory_report_interval'):
+            memory.tracker.start(interval=interval)
+
+        if threshold := config.parser.getint('logger', 'slow_callback_threshold'):
+            loop_monitor.monitor.threshold = threshold / 1000
+            loop_monitor.monitor.start()
+
+    def init_config(self) -> None:
+        if self._config_loaded:
+            return
+
+        with self._measure('config'):
+            config.init()
+
+        self._config_loaded = True
+
+    def init_logger(self) -> None:
+        if self._logger_loaded:
+            return
+
+        self.init_config()
+
+        with self._measure('logger'):
+            config.init_logger()
+
+        self._logger_loaded = True
+
+    def reload_config(self) -> None:
+        config.parser.clear()
+        self._config_loaded = False
+        self.init_config()
+
+    # all accounts share the same connection pool but each one has its own http session (and cookies)
+    async def init_http(self, session_index: int = 0) -> None:
+        # network stack is only loaded when a session is going to be created
+        import aiohttp
+        import stlib
+
+        with self._measure(f'http{session_index}'):
+            if not self._tcp_connector:
+                ssl_context = ssl.SSLContext()
+
+                if hasattr(sys, 'frozen'):
+                    _executable_path = Path(sys.executable).parent
+                    ssl_context.load_verify_locations(cafile=_executable_path / 'etc' / 'cacert.pem')
+
+                self._tcp_connector = aiohttp.TCPConnector(ssl=ssl_context, force_close=True)
+
+                if interval := config.parser.getint('logger', 'http_stats_interval'):
+                    self._http_stats_task = asyncio.create_task(http_stats.stats.log_periodically(interval))
+
+            http_params: Dict[str, Any] = {'trace_configs': [http_stats.stats.trace_config()]}
+
+            if redirect_url := config.parser.get('steam', 'redirect_url'):
+                log.warning(_("All Steam requests are being redirected to %s"), redirect_url)
+                http_params['request_class'] = _redirect_request_class(redirect_url)
+
+            try:
+                await stlib.set_default_http_params(
+                    session_index,
+                    connector=self._tcp_connector,
+                    connector_owner=False,
+                    **http_params,
+                )
+            except IndexError:
+                log.debug(_("http params for session %s are already set"), session_index)
+
+    async def init_metrics(self) -> None:
+        if self._metrics_exporter:
+            return
+
+        from . import metrics
+
+        with self._measure('metrics'):
+            self._metrics_exporter = metrics.new_exporter()
+
+            if self._metrics_exporter:
+                try:
+                    await self._metrics_exporter.start()
+                except OSError as exception:
+                    log.error(_("Unable to start metrics exporter: %s"), str(exception))
+
+    async def close(self) -> None:
+        loop_monitor.monitor.stop()
+
+        if memory.tracker.is_running:
+            memory.tracker.stop()
+
+        if self._metrics_exporter:
+            await self._metrics_exporter.stop()
+            self._metrics_exporter = None
+
+        if self._http_stats_task:
+            self._http_stats_task.cancel()
+            self._http_stats_task = None
+
+        if self._tcp_connector:
+            await self._tcp_connector.close()
+            self._tcp_connector = None
+
+    # called by frontends after the loop has stopped
+    def shutdown(self) -> None:
+        if self._loop and not self._loop.is_closed():
+            with contextlib.suppress(KeyboardInterrupt):
+                self._loop.run_until_complete(self.close())
+
+
+instance = Bootstrap()
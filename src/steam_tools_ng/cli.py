@@ -23,8 +23,7 @@ import textwrap
 from multiprocessing import freeze_support
 from pathlib import Path
 
-from steam_tools_ng import config, i18n, __version__
-from steam_tools_ng.console import cli
+from steam_tools_ng import accounting, bootstrap, config, http_stats, i18n, loop_monitor, memory, __version__
 
 _ = i18n.get_translation
 log = logging.getLogger(__name__)
@@ -32,7 +31,6 @@ log = logging.getLogger(__name__)
 
 def main() -> None:
     freeze_support()
-    config.init()
 
     command_parser = argparse.ArgumentParser(
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -54,6 +52,15 @@ def main() -> None:
         help='Start a module',
     )
 
+    command_parser.add_argument(
+        '-a', '--account',
+        action='append',
+        type=int,
+        metavar='<index>',
+        help='Run the module for the account at [login<index>] config section (can be repeated)',
+        dest='accounts',
+    )
+
     command_parser.add_argument(
         '--config-dir',
         action='store_true',
@@ -96,6 +103,20 @@ def main() -> None:
         dest='remove_authenticator',
     )
 
+    command_parser.add_argument(
+        '--stats',
+        action='store_true',
+        help='Show http requests, event loop and per module CPU stats when quitting',
+        dest='stats',
+    )
+
+    command_parser.add_argument(
+        '--memory-report',
+        action='store_true',
+        help='Track memory allocations and show the growth of each module when quitting',
+        dest='memory_report',
+    )
+
     command_parser.add_argument(
         '-v', '--version',
         action='store_true',
@@ -120,11 +141,13 @@ def main() -> None:
         print(config.config_file_directory)
         sys.exit(0)
 
+    bootstrap.instance.init_config()
+
     if console_params.log_dir:
         print(config.parser.get("logger", "log_directory"))
         sys.exit(0)
 
-    config.init_logger()
+    bootstrap.instance.init_logger()
 
     if console_params.reset:
         config.config_file.unlink(missing_ok=True)
@@ -155,12 +178,30 @@ def main() -> None:
             log.critical("Use 'steam-tools-ng-gui' for the graphical user interface.")
             sys.exit(1)
 
+    # started before the console interface is loaded, so its allocations are also traced
+    if console_params.memory_report:
+        memory.tracker.start()
+
+    # console interface (and stlib) is only loaded when a module will run
+    from steam_tools_ng.console import cli
+
     module_name = console_params.module
     module_options = console_params.options
 
-    app = cli.SteamToolsNG(module_name, module_options)
+    app = cli.SteamToolsNG(module_name, module_options, console_params.accounts)
     app.run()
 
+    if console_params.stats:
+        print(http_stats.stats.summary())
+        print()
+        print(loop_monitor.monitor.summary())
+        print()
+        from steam_tools_ng import metrics
+        print(accounting.summary(events=metrics.events_by_module()))
+
+    if console_params.memory_report:
+        print(memory.tracker.format_report())
+
 
 if __name__ == "__main__":
     main()
@@ -15,7 +15,6 @@
 # You should have received a copy of the GNU General Public License
 # along with this program. If not, see http://www.gnu.org/licenses/.
 #
-import asyncio
 import configparser
 import locale
 import logging
@@ -25,9 +24,9 @@ from collections import OrderedDict
 from pathlib import Path
 
 import sys
-from typing import Any, Dict
+from typing import Any, Dict, List
+from urllib.parse import urlsplit
 
-from stlib import plugins as stlib_plugins
 from . import i18n, logger_handlers
 
 parser = configparser.RawConfigParser()
@@ -45,13 +44,6 @@ config_file_directory = data_dir / 'steam-tools-ng'
 config_file_name = 'steam-tools-ng.config'
 config_file = config_file_directory / config_file_name
 
-try:
-    from stlib import client
-except ImportError as exception:
-    log.error(str(exception))
-    client = None
-
-
 def _(message):
     return message
 
@@ -122,13 +114,9 @@ coupon_discounts = OrderedDict([
 _ = i18n.get_translation
 
 if sys.platform == 'win32':
-    event_loop = asyncio.ProactorEventLoop()
     file_manager = 'explorer'
 else:
     file_manager = 'xdg-open'
-    event_loop = asyncio.new_event_loop()
-
-asyncio.set_event_loop(event_loop)
 
 default_config: Dict[str, Dict[str, Any]] = {
     'logger': {
@@ -136,9 +124,21 @@ default_config: Dict[str, Dict[str, Any]] = {
         'log_level': 'debug',
         'log_console_level': 'info',
         'log_color': True,
+        # seconds between http stats summaries on log (0 to disable)
+        'http_stats_interval': 900,
+        # log callbacks that block the event loop for longer than this (in ms, 0 to disable)
+        'slow_callback_threshold': 100,
+        # profiler started by SIGUSR2 (sampling or cprofile)
+        'profiler_mode': 'sampling',
+        # CPU time and wakeups of each module (see internals window or --stats)
+        'task_accounting': True,
+        # seconds between memory growth reports on log (enables tracemalloc, 0 to disable)
+        'memory_report_interval': 0,
     },
     'steam': {
         'api_url': 'https://api.steampowered.com',
+        # send every steam, steamgifts and steamtrades request to this server (e.g. tools/steam_simulator.py)
+        'redirect_url': '',
     },
     'coupons': {
         'enable': True,
@@ -160,6 +160,7 @@ default_config: Dict[str, Dict[str, Any]] = {
         'enable': True,
         'wait_for_bump': 3700,
         'trade_ids': '',
+        'trade_info_ttl': 86400,
     },
     'steamgifts': {
         'enable': True,
@@ -168,6 +169,7 @@ default_config: Dict[str, Dict[str, Any]] = {
         'wait_after_each_strategy': 10,
         'wait_after_full_cycle': 3700,
         'minimum_points': 0,
+        'listing_cache_ttl': 300,
     },
     'cardfarming': {
         'enable': True,
@@ -176,11 +178,26 @@ default_config: Dict[str, Dict[str, Any]] = {
         'wait_while_running': 300,
         'wait_for_drops': 120,
         'max_concurrency': 50,
+        'max_executors_memory': 0,
+        'resume_state_ttl': 21600,
         'invisible': True,
     },
     'fakerun': {
         'cakes': '',
     },
+    'control': {
+        'enable': False,
+        'socket_path': config_file_directory / 'steam-tools-ng.sock',
+    },
+    'metrics': {
+        'enable': False,
+        'listen_address': '127.0.0.1',
+        # 0 to only write the textfile
+        'port': 9495,
+        # OpenMetrics file for node_exporter textfile collector (e.g. /var/lib/node_exporter/stng.prom)
+        'textfile': '',
+        'textfile_interval': 60,
+    },
     'general': {
         'theme': 'light',
         'show_close_button': True,
@@ -219,6 +236,47 @@ for index in range(1, 6):
         default_config[f'steamgifts_strategy{index}']['enable'] = True
 
 
+# extra accounts have their own sections, named after the main one plus the account
+# index: [login1], [steamtrades1], [steamgifts_strategy2_1] (strategy 2 of account 1)
+def account_section(section: str, session_index: int = 0) -> str:
+    if session_index == 0:
+        return section
+
+    separator = '_' if section[-1].isdigit() else ''
+    return f'{section}{separator}{session_index}'
+
+
+def login_section(session_index: int = 0) -> str:
+    return account_section('login', session_index)
+
+
+# module options of an account. Options missing from its own section come from the main one
+def get(section: str, option: str, session_index: int = 0) -> str:
+    return parser.get(account_section(section, session_index), option, fallback=parser.get(section, option))
+
+
+def getint(section: str, option: str, session_index: int = 0) -> int:
+    return parser.getint(account_section(section, session_index), option, fallback=parser.getint(section, option))
+
+
+def getboolean(section: str, option: str, session_index: int = 0) -> bool:
+    return parser.getboolean(
+        account_section(section, session_index),
+        option,
+        fallback=parser.getboolean(section, option),
+    )
+
+
+def accounts() -> List[int]:
+    session_indexes = [0]
+
+    for section in parser.sections():
+        if section.startswith('login') and section[5:].isdigit() and int(section[5:]) > 0:
+            session_indexes.append(int(section[5:]))
+
+    return sorted(session_indexes)
+
+
 def update_log_level(type_: str, level_string: str) -> None:
     level = getattr(logging, level_string.upper())
     file_handler, console_handler, *extra_handlers = logging.root.handlers
@@ -230,7 +288,7 @@ def update_log_level(type_: str, level_string: str) -> None:
 
 
 def validate_config(section: str, option: str, defaults: OrderedDict[str, str]) -> None:
-    value = parser.get(section, option)
+    value = parser.get(section, option, fallback='')
 
     if value and value not in defaults.keys():
         if option == 'language':
@@ -251,6 +309,12 @@ def init() -> None:
     if config_file.is_file():
         parser.read(config_file)
 
+    # extra accounts only need the options that differ from the defaults
+    for session_index in accounts()[1:]:
+        for option, value in default_config['login'].items():
+            if not parser.has_option(login_section(session_index), option):
+                parser.set(login_section(session_index), option, str(value))
+
     # fallback deprecated values
     if (parser.get('steam', 'api_url') in [
         'https://api.lara.monster', 'https://api.lara.click',
@@ -268,14 +332,28 @@ def init() -> None:
     validate_config("logger", "log_console_level", log_levels)
     validate_config("general", "theme", gtk_themes)
     validate_config("general", "language", translations)
-    validate_config("steamgifts", "mode", steamgifts_modes)
+    i18n.set_language(parser.get("general", "language"))
+
+    for session_index in accounts():
+        validate_config(account_section("steamgifts", session_index), "mode", steamgifts_modes)
 
-    for _index in range(1, 4):
-        validate_config(f"steamgifts_strategy{_index}", "restrict_type", giveaway_types)
-        validate_config(f"steamgifts_strategy{_index}", "sort_type", giveaway_sort_types)
+        for _index in range(1, 4):
+            strategy = account_section(f"steamgifts_strategy{_index}", session_index)
+            validate_config(strategy, "restrict_type", giveaway_types)
+            validate_config(strategy, "sort_type", giveaway_sort_types)
+
+    if redirect_url := parser.get("steam", "redirect_url"):
+        redirect_parts = urlsplit(redirect_url)
+
+        if redirect_parts.scheme not in ('http', 'https') or not redirect_parts.hostname:
+            raise configparser.Error(_("Please, fix your config file. Invalid redirect_url: {}").format(redirect_url))
 
     log_directory.mkdir(parents=True, exist_ok=True)
 
+    # stlib is slow to import, so it's only loaded when config is initialized
+    import stlib
+    from stlib import plugins as stlib_plugins
+
     stlib_plugins.add_search_paths(
         str(Path(os.getcwd(), 'lib', 'stlib-plugins')),
         *[str(Path(site_, 'stlib-plugins')) for site_ in site.getsitepackages()],
@@ -288,7 +366,8 @@ def init() -> None:
     if not stlib_plugins.has_plugin("steamgifts"):
         new("steamgifts", "enable", False)
 
-    if not client:
+    if not stlib.steamworks_available:
+        log.error(_("stlib has been built without SteamWorks support. Client interface is unavailable"))
         new("cardfarming", "enable", False)
 
 
@@ -325,6 +404,8 @@ def new(section: str, option: str, value: Any) -> None:
         update_log_level("file", value)
     elif option == "log_console_level":
         update_log_level("console", value)
+    elif section == "general" and option == "language":
+        i18n.set_language(value)
 
     if parser.get(section, option, fallback='') != str(value):
         log.debug(_('Saving {}:{} on config file').format(section, option))
@@ -20,7 +20,7 @@ import contextlib
 import functools
 import logging
 import sys
-from typing import Optional, Any, Callable
+from typing import Optional, Any, Callable, List
 
 import aiohttp
 
@@ -28,7 +28,7 @@ import stlib
 from stlib import plugins, universe, login, community, webapi, internals
 from . import authenticator, utils
 from . import login as cli_login
-from .. import i18n, config, core
+from .. import bootstrap, i18n, config, core, control, events, metrics
 
 log = logging.getLogger(__name__)
 _ = i18n.get_translation
@@ -41,7 +41,13 @@ def while_running(function: Callable[..., Any]) -> Callable[..., Any]:
             await function(self, *args, **kwargs)
 
             if self.stop:
-                self.on_quit()
+                self.running_modules -= 1
+
+                # wait until all accounts finish
+                if not self.running_modules:
+                    self.flush_display()
+                    self.on_quit()
+
                 break
 
     return wrapper
@@ -49,11 +55,17 @@ def while_running(function: Callable[..., Any]) -> Callable[..., Any]:
 
 # noinspection PyUnusedLocal
 class SteamToolsNG:
-    def __init__(self, module_name: str, module_options: str) -> None:
+    def __init__(self, module_name: str, module_options: str, accounts: Optional[List[int]] = None) -> None:
         self.module_name = module_name
+        self.accounts = sorted(set(accounts)) if accounts else [0]
+        self.running_modules = 0
         self.stop = False
         self.custom_gameid = 0
         self.extra_gameid = None
+        self.play_event: Optional[asyncio.Event] = None
+        self.control: Optional[control.ControlServer] = None
+        # progress lines are coalesced if the terminal can't keep up
+        self.display = events.bus.subscribe([module_name], {events.ProgressEvent: events.LATEST})
 
         if (
             module_name in {'cardfarming', 'fakerun'}
@@ -75,6 +87,19 @@ class SteamToolsNG:
                 ).format(module_name))
                 sys.exit(1)
 
+        for session_index in self.accounts:
+            if not config.parser.has_section(config.login_section(session_index)):
+                log.critical(_("There's no [{}] section in config file").format(config.login_section(session_index)))
+                sys.exit(1)
+
+        # Steam Client and authenticator can only handle the main account
+        if (
+            module_name in {'cardfarming', 'fakerun', 'add_authenticator', 'remove_authenticator'}
+            and self.accounts != [0]
+        ):
+            log.critical(_("{} module can only be used with the main account").format(module_name))
+            sys.exit(1)
+
         try:
             if module_name == 'fakerun':
                 self.stop = True
@@ -105,7 +130,11 @@ class SteamToolsNG:
 
     @property
     def steamid(self) -> Optional[universe.SteamId]:
-        if steamid := config.parser.getint("login", "steamid"):
+        return self.get_steamid(self.accounts[0])
+
+    @staticmethod
+    def get_steamid(session_index: int = 0) -> Optional[universe.SteamId]:
+        if steamid := config.parser.getint(config.login_section(session_index), "steamid"):
             try:
                 return universe.generate_steamid(steamid)
             except ValueError:
@@ -115,35 +144,38 @@ class SteamToolsNG:
 
     # FIXME: https://github.com/python/asyncio/pull/465
     def run(self) -> None:
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
+        loop = bootstrap.instance.loop
         task = loop.create_task(self.async_activate())
         task.add_done_callback(utils.safe_task_callback)
 
         with contextlib.suppress(KeyboardInterrupt):
             loop.run_forever()
 
-    async def do_login(self, *, block: bool = True, auto: bool = False) -> None:
-        login_session = cli_login.Login(self)
+        bootstrap.instance.shutdown()
+
+    async def do_login(self, *, block: bool = True, auto: bool = False, session_index: int = 0) -> None:
+        login_session = cli_login.Login(self, session_index=session_index)
         await login_session.do_login(auto)
 
-    async def async_activate(self) -> None:
-        login_session = await login.Login.new_session(0, api_url=self.api_url)
+    async def new_account_session(self, session_index: int) -> bool:
+        await bootstrap.instance.init_http(session_index)
+
+        login_session = await login.Login.new_session(session_index, api_url=self.api_url)
         utils.set_console(info=_("Logging on Steam. Please wait!"))
         try_count = 3
 
         for login_count in range(try_count):
             try:
                 if login_count == 0:
-                    await self.do_login(auto=True)
+                    await self.do_login(auto=True, session_index=session_index)
                 else:
-                    await self.do_login()
+                    await self.do_login(session_index=session_index)
             except aiohttp.ClientError as exception:
                 log.exception(str(exception))
                 log.error(_("Check your connection. (server down?)"))
 
                 if login_count == 2:
-                    return
+                    return False
                 log.error(_("Waiting 10 seconds to try again"))
                 await asyncio.sleep(10)
 
@@ -151,7 +183,7 @@ class SteamToolsNG:
                 utils.set_console(info=_("Steam login Successful"))
                 break
 
-        community_session = await community.Community.new_session(0, api_url=self.api_url)
+        community_session = await community.Community.new_session(session_index, api_url=self.api_url)
 
         try:
             api_key = await community_session.get_api_key()
@@ -172,18 +204,51 @@ class SteamToolsNG:
             log.error(_("Limited account! Using dummy API key"))
             api_key = (0, 'Steam Tools NG')
 
-        await webapi.SteamWebAPI.new_session(0, api_key=api_key[0], api_url=self.api_url)
-        await internals.Internals.new_session(0)
+        await webapi.SteamWebAPI.new_session(session_index, api_key=api_key[0], api_url=self.api_url)
+        await internals.Internals.new_session(session_index)
 
         if self.module_name in ['steamtrades', 'steamgifts']:
             plugin = plugins.get_plugin(self.module_name)
-            await plugin.Main.new_session(0)
+            await plugin.Main.new_session(session_index)
+
+        return True
+
+    async def async_activate(self) -> None:
+        for session_index in self.accounts:
+            if not await self.new_account_session(session_index):
+                return
+
+        self.play_event = asyncio.Event()
+        self.play_event.set()
+        self.control = control.new_server()
+        await bootstrap.instance.init_metrics()
+        events.bus.add_listener(metrics.on_event)
+
+        display_task = asyncio.create_task(self.display_status())
+        display_task.add_done_callback(utils.safe_task_callback)
+
+        if self.control:
+            events.bus.add_listener(self.control.on_event)
+            await self.control.start()
+
+            if self.module_name in config.plugins:
+                self.control.register_module(self.module_name, self.play_event)
 
         log.debug(_("Initializing module %s"), self.module_name)
         module = getattr(self, f"run_{self.module_name}")
-        task = asyncio.create_task(module())
-        log.debug(_("Adding a new callback for %s"), task)
-        task.add_done_callback(utils.safe_task_callback)
+
+        if self.module_name in ['add_authenticator', 'remove_authenticator']:
+            tasks = [asyncio.create_task(module())]
+        else:
+            tasks = [
+                asyncio.create_task(module(session_index), name=self.module_name) for session_index in self.accounts
+            ]
+
+        self.running_modules = len(tasks)
+
+        for task in tasks:
+            log.debug(_("Adding a new callback for %s"), task)
+            task.add_done_callback(utils.safe_task_callback)
 
     async def run_add_authenticator(self) -> None:
         authenticator_manage = authenticator.ManageAuthenticator(self)
@@ -193,47 +258,83 @@ class SteamToolsNG:
         authenticator_manage = authenticator.ManageAuthenticator(self)
         await authenticator_manage.remove_authenticator()
 
+    def set_status(self, module_data: core.utils.ModuleData, session_index: int) -> None:
+        module_data.account = session_index
+        events.bus.publish(self.module_name, module_data)
+
+    # console is updated by its own task, so modules don't wait for the terminal
+    async def display_status(self) -> None:
+        async for event in self.display:
+            utils.set_console(event.data)
+
+    def flush_display(self) -> None:
+        for event in self.display.drain():
+            utils.set_console(event.data)
+
     @while_running
-    async def run_steamguard(self) -> None:
-        steamguard = core.steamguard.main()
+    async def run_steamguard(self, session_index: int) -> None:
+        await self.play_event.wait()
+        steamguard = core.steamguard.main(session_index)
 
+        # modules are paused between events (control socket pause)
         async for module_data in steamguard:
-            utils.set_console(module_data)
+            if self.play_event:
+                await self.play_event.wait()
+
+            self.set_status(module_data, session_index)
 
     @while_running
-    async def run_cardfarming(self) -> None:
-        cardfarming = core.cardfarming.main(self.steamid, custom_game_id=self.custom_gameid)
+    async def run_cardfarming(self, session_index: int) -> None:
+        cardfarming = core.cardfarming.main(
+            self.get_steamid(session_index),
+            self.play_event,
+            custom_game_id=self.custom_gameid,
+            session_index=session_index,
+        )
 
         async for module_data in cardfarming:
-            utils.set_console(module_data)
+            self.set_status(module_data, session_index)
 
     @while_running
-    async def run_fakerun(self) -> None:
-        fakerun = core.fakerun.main(self.steamid, self.custom_gameid, self.extra_gameid)
+    async def run_fakerun(self, session_index: int) -> None:
+        fakerun = core.fakerun.main(
+            self.get_steamid(session_index),
+            self.custom_gameid,
+            self.extra_gameid,
+            session_index=session_index,
+        )
 
         async for module_data in fakerun:
-            utils.set_console(module_data)
+            self.set_status(module_data, session_index)
 
     @while_running
-    async def run_steamtrades(self) -> None:
-        steamtrades = core.steamtrades.main()
+    async def run_steamtrades(self, session_index: int) -> None:
+        await self.play_event.wait()
+        steamtrades = core.steamtrades.main(session_index)
 
         async for module_data in steamtrades:
-            utils.set_console(module_data)
+            if self.play_event:
+                await self.play_event.wait()
+
+            self.set_status(module_data, session_index)
 
             if module_data.action == "login":
-                await self.do_login(auto=True)
+                await self.do_login(auto=True, session_index=session_index)
                 continue
 
     @while_running
-    async def run_steamgifts(self) -> None:
-        steamgifts = core.steamgifts.main()
+    async def run_steamgifts(self, session_index: int) -> None:
+        await self.play_event.wait()
+        steamgifts = core.steamgifts.main(session_index)
 
         async for module_data in steamgifts:
-            utils.set_console(module_data)
+            if self.play_event:
+                await self.play_event.wait()
+
+            self.set_status(module_data, session_index)
 
             if module_data.action == "login":
-                await self.do_login(auto=True)
+                await self.do_login(auto=True, session_index=session_index)
                 continue
 
     @staticmethod
@@ -37,9 +37,11 @@ _ = i18n.get_translation
 
 # noinspection PyUnusedLocal
 class Login:
-    def __init__(self, cli_: 'cli.SteamToolsNG', mobile_login: bool = True) -> None:
+    def __init__(self, cli_: 'cli.SteamToolsNG', mobile_login: bool = True, session_index: int = 0) -> None:
         self.cli = cli_
         self.mobile_login = mobile_login
+        self.session_index = session_index
+        self.login_section = config.login_section(session_index)
         self.has_user_data = False
         self._username = ''
         self.__password = ''
@@ -58,11 +60,11 @@ class Login:
 
     @property
     def shared_secret(self) -> str:
-        return config.parser.get("login", "shared_secret")
+        return config.parser.get(self.login_section, "shared_secret")
 
     @property
     def identity_secret(self) -> str:
-        return config.parser.get("login", "identity_secret")
+        return config.parser.get(self.login_section, "identity_secret")
 
     async def do_login(
             self,
@@ -73,27 +75,27 @@ class Login:
         utils.set_console(info=_("Retrieving user data"))
 
         if auto:
-            self._username = config.parser.get("login", "account_name")
-            encrypted_password = config.parser.get("login", "password")
+            self._username = config.parser.get(self.login_section, "account_name")
+            encrypted_password = config.parser.get(self.login_section, "password")
             self.set_password(encrypted_password)
 
         if not self.username or not self.__password:
             user_input = utils.safe_input(_("Please, write your username"))
             assert isinstance(user_input, str), "Safe input is returning bool when it should return str"
-            config.new("login", "account_name", user_input)
+            config.new(self.login_section, "account_name", user_input)
             self._username = user_input
 
             self.__password = getpass.getpass(_("Please, write your password (IT'S HIDDEN, and will be encrypted)"))
             encrypted_password = core.utils.encode_password(self.__password)
-            config.new("login", "password", encrypted_password)
+            config.new(self.login_section, "password", encrypted_password)
 
-        _login_session = login.Login.get_session(0)
+        _login_session = login.Login.get_session(self.session_index)
         _login_session.http_session.cookie_jar.clear()
         _login_session.username = self.username
         _login_session.password = self.__password
 
-        config.remove('login', 'refresh_token')
-        config.remove('login', 'access_token')
+        config.remove(self.login_section, 'refresh_token')
+        config.remove(self.login_section, 'access_token')
 
         if not self.shared_secret:
             log.warning(_("No shared secret found. Trying to log-in without two-factor authentication."))
@@ -166,7 +168,7 @@ class Login:
                 }
 
                 for key, value in new_configs.items():
-                    config.new("login", key, value)
+                    config.new(self.login_section, key, value)
 
                 # steamid = universe.generate_steamid(new_configs['steamid'])
                 # _login_session.restore_login(steamid, new_configs['token'], new_configs['token_secure'])
@@ -17,12 +17,15 @@
 #
 import asyncio
 import logging
-import os
+import shutil
 import sys
-from typing import Optional, Union, List, Tuple, Any
+from typing import Optional, Union, List, Tuple, Any, TYPE_CHECKING
 
 from .. import i18n, core
 
+if TYPE_CHECKING:
+    from ..core.utils import ModuleData
+
 log = logging.getLogger(__name__)
 _ = i18n.get_translation
 
@@ -79,7 +82,7 @@ def safe_input(
 
 
 def set_console(
-        module_data: Optional[core.utils.ModuleData] = None,
+        module_data: Optional['ModuleData'] = None,
         *,
         display: str = '',
         status: str = '',
@@ -88,8 +91,11 @@ def set_console(
         level: Tuple[int, int] = (0, 0),
         suppress_logging: bool = False,
 ) -> None:
+    # falls back to $COLUMNS (or 80) when output isn't a terminal
+    blank_line = ' ' * (shutil.get_terminal_size().columns - 1)
+
     for std in (sys.stdout, sys.stderr):
-        print(' ' * (os.get_terminal_size().columns - 1), end='\r', file=std)
+        print(blank_line, end='\r', file=std)
 
     if not module_data:
         module_data = core.utils.ModuleData(display, status, info, error, level, suppress_logging=suppress_logging)
@@ -102,6 +108,9 @@ def set_console(
 
         return
 
+    if module_data.account:
+        print(f"[{module_data.account}]", end=' ')
+
     if module_data.status:
         if not module_data.suppress_logging:
             log.debug(f"status data: {module_data.status}")
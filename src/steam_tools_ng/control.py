@@ -0,0 +1,417 @@
+#!/usr/bin/env python
+#
+# Lara Maia <dev@lara.monster> 2015 ~ 2023
+#
+# The Steam Tools NG is free software: you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, either version 3 of
+# the License, or (at your option) any later version.
+#
+# The Steam Tools NG is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see http://www.gnu.org/licenses/.
+#
+
+# Local control channel (JSON-RPC 2.0, one message per line) over a UNIX socket.
+#
+# Requests: {"jsonrpc": "2.0", "id": 1, "method": "pause", "params": {"module": "cardfarming"}}
+# Available methods: modules, pause, resume, enable, disable, fetch_coupons,
+# stop_fetching_coupons, finalize_confirmations, profile_start, profile_stop,
+# memory_start, memory_report, memory_stop, subscribe, unsubscribe
+#
+# After `subscribe`, the server pushes a `module_data` notification for each
+# event yielded by the running modules.
+#
+# `enable` and `disable` start and stop modules only on frontends that manage them
+# (the GUI). The CLI runs a single module until it ends, so use `pause` and `resume` there.
+
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import sys
+from dataclasses import fields
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple, cast
+
+import aiohttp
+
+from stlib import community, universe
+from . import config, events, i18n, memory, metrics, profiling
+from .core import utils
+
+_ = i18n.get_translation
+log = logging.getLogger(__name__)
+
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+SERVER_ERROR = -32000
+
+
+class ControlError(Exception):
+    def __init__(self, code: int, message: str) -> None:
+        super().__init__(message)
+        self.code = code
+
+
+class ControlServer:
+    def __init__(self, socket_path: Path, queue_size: int = 256) -> None:
+        self.socket_path = socket_path
+        self.queue_size = queue_size
+        self.fetch_coupon_event: Optional[asyncio.Event] = None
+        # set by frontends which start and stop modules when their enable option changes
+        self.manage_modules = False
+        self.confirmations: Dict[int, List[community.Confirmation]] = {}
+
+        self._play_events: Dict[str, asyncio.Event] = {}
+        self._play_callbacks: Dict[str, Callable[[bool], None]] = {}
+        self._subscribers: Dict[asyncio.Queue[Dict[str, Any]], Set[str]] = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._clients: Set[asyncio.StreamWriter] = set()
+
+    @property
+    def is_serving(self) -> bool:
+        return self._server is not None and self._server.is_serving()
+
+    def register_module(
+            self,
+            module_name: str,
+            play_event: asyncio.Event,
+            play_callback: Optional[Callable[[bool], None]] = None,
+    ) -> None:
+        self._play_events[module_name] = play_event
+
+        if play_callback:
+            self._play_callbacks[module_name] = play_callback
+
+    def on_event(self, event: events.Event) -> None:
+        self.publish(event.module, event.data)
+
+    def publish(self, module_name: str, module_data: utils.ModuleData) -> None:
+        if module_name == "confirmations" and module_data.action == "update":
+            self.confirmations[module_data.account] = module_data.raw_data
+
+        if not self._subscribers:
+            return
+
+        # raw_data can hold anything (even executors), so it's never copied or sent
+        params = {field.name: getattr(module_data, field.name) for field in fields(module_data)}
+        del params['raw_data']
+        message = {'jsonrpc': '2.0', 'method': 'module_data', 'params': {'module': module_name, **params}}
+
+        for queue, modules in self._subscribers.items():
+            if modules and module_name not in modules:
+                continue
+
+            # slow subscribers lose the oldest events instead of stalling modules
+            if queue.full():
+                queue.get_nowait()
+
+            queue.put_nowait(message)
+
+    async def start(self) -> None:
+        if sys.platform == 'win32' or not hasattr(asyncio, 'start_unix_server'):
+            log.error(_("Control socket is not supported on this platform"))
+            return
+
+        if self.socket_path.is_socket():
+            self.socket_path.unlink()
+
+        self.socket_path.parent.mkdir(parents=True, exist_ok=True)
+        self._server = await asyncio.start_unix_server(self._on_client_connected, path=str(self.socket_path))
+        os.chmod(self.socket_path, 0o600)
+        log.info(_("Control socket listening at %s"), self.socket_path)
+
+    async def stop(self) -> None:
+        if not self._server:
+            return
+
+        self._server.close()
+
+        for writer in self._clients:
+            writer.close()
+
+        await self._server.wait_closed()
+        self._server = None
+        self.socket_path.unlink(missing_ok=True)
+
+    async def _on_client_connected(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        queue: asyncio.Queue[Dict[str, Any]] = asyncio.Queue(self.queue_size)
+        stream_task: Optional[asyncio.Task[None]] = None
+        self._clients.add(writer)
+
+        try:
+            while line := await reader.readline():
+                response, subscribe = await self._dispatch(line, queue)
+
+                if response:
+                    writer.write(json.dumps(response).encode() + b'\n')
+                    await writer.drain()
+
+                if subscribe and not stream_task:
+                    stream_task = asyncio.create_task(self._stream(queue, writer))
+        except ConnectionError:
+            log.debug(_("Control client disconnected"))
+        finally:
+            self._clients.discard(writer)
+            self._subscribers.pop(queue, None)
+
+            if stream_task:
+                stream_task.cancel()
+
+                with contextlib.suppress(asyncio.CancelledError):
+                    await stream_task
+
+            writer.close()
+
+    async def _stream(self, queue: asyncio.Queue[Dict[str, Any]], writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                message = await queue.get()
+                writer.write(json.dumps(message).encode() + b'\n')
+                await writer.drain()
+        except ConnectionError:
+            log.debug(_("Control client disconnected"))
+            self._subscribers.pop(queue, None)
+
+    async def _dispatch(
+            self,
+            line: bytes,
+            queue: asyncio.Queue[Dict[str, Any]],
+    ) -> Tuple[Optional[Dict[str, Any]], bool]:
+        request_id = None
+        subscribe = False
+
+        try:
+            try:
+                request = json.loads(line)
+            except ValueError:
+                raise ControlError(PARSE_ERROR, "Parse error") from None
+
+            if not isinstance(request, dict) or not isinstance(request.get('method'), str):
+                raise ControlError(INVALID_REQUEST, "Invalid request")
+
+            request_id = request.get('id')
+            method = request['method']
+            params = request.get('params', {})
+
+            if not isinstance(params, dict):
+                raise ControlError(INVALID_PARAMS, "params must be an object")
+
+            if method == 'subscribe':
+                modules = params.get('modules', [])
+                self._subscribers[queue] = set(modules)
+                result: Any = sorted(modules) or list(config.plugins.keys())
+                subscribe = True
+            elif method == 'unsubscribe':
+                result = self._subscribers.pop(queue, None) is not None
+            else:
+                handler = getattr(self, f'rpc_{method}', None)
+
+                if not handler:
+                    raise ControlError(METHOD_NOT_FOUND, f"Method {method} not found")
+
+                try:
+                    result = await handler(**params)
+                except TypeError as exception:
+                    raise ControlError(INVALID_PARAMS, str(exception)) from None
+        except ControlError as exception:
+            error = {'code': exception.code, 'message': str(exception)}
+            response = {'jsonrpc': '2.0', 'id': request_id, 'error': error}
+        except Exception as exception:
+            log.exception(str(exception))
+            response = {'jsonrpc': '2.0', 'id': request_id, 'error': {'code': SERVER_ERROR, 'message': str(exception)}}
+        else:
+            response = {'jsonrpc': '2.0', 'id': request_id, 'result': result}
+
+        # notifications (requests without id) don't receive a response
+        if request_id is None and 'error' not in response:
+            return None, subscribe
+
+        return response, subscribe
+
+    def _check_module(self, module: str) -> None:
+        if module not in config.plugins:
+            raise ControlError(INVALID_PARAMS, f"Unknown module {module}")
+
+    def _set_playing(self, module: str, value: bool) -> bool:
+        self._check_module(module)
+
+        if module not in self._play_events:
+            raise ControlError(SERVER_ERROR, f"{module} can't be paused")
+
+        if module in self._play_callbacks:
+            self._play_callbacks[module](value)
+        elif value:
+            self._play_events[module].set()
+        else:
+            self._play_events[module].clear()
+
+        return self._play_events[module].is_set()
+
+    @staticmethod
+    def _enable_option(module: str) -> Tuple[str, str]:
+        if module == "confirmations":
+            return "steamguard", "enable_confirmations"
+
+        return module, "enable"
+
+    async def rpc_modules(self) -> Dict[str, Dict[str, Any]]:
+        modules = {}
+
+        for module in config.plugins.keys():
+            section, option = self._enable_option(module)
+            play_event = self._play_events.get(module)
+
+            modules[module] = {
+                'enabled': config.parser.getboolean(section, option),
+                'playing': play_event.is_set() if play_event else None,
+            }
+
+        return modules
+
+    async def rpc_pause(self, module: str) -> bool:
+        return self._set_playing(module, False)
+
+    async def rpc_resume(self, module: str) -> bool:
+        return self._set_playing(module, True)
+
+    def _set_enabled(self, module: str, value: bool) -> bool:
+        self._check_module(module)
+
+        if not self.manage_modules:
+            raise ControlError(SERVER_ERROR, "modules can't be enabled or disabled here. Use pause or resume")
+
+        config.new(*self._enable_option(module), value)
+        return value
+
+    async def rpc_enable(self, module: str) -> bool:
+        return self._set_enabled(module, True)
+
+    async def rpc_disable(self, module: str) -> bool:
+        return self._set_enabled(module, False)
+
+    async def rpc_fetch_coupons(self) -> bool:
+        if not self.fetch_coupon_event:
+            raise ControlError(SERVER_ERROR, "coupons module is not running")
+
+        self.fetch_coupon_event.set()
+        return True
+
+    async def rpc_stop_fetching_coupons(self) -> bool:
+        if not self.fetch_coupon_event:
+            raise ControlError(SERVER_ERROR, "coupons module is not running")
+
+        self.fetch_coupon_event.clear()
+        return False
+
+    async def rpc_finalize_confirmations(
+            self,
+            action: str,
+            confirmation_id: Optional[int] = None,
+            account: int = 0,
+    ) -> List[int]:
+        if action not in ("allow", "cancel"):
+            raise ControlError(INVALID_PARAMS, "action must be allow or cancel")
+
+        login_section = config.login_section(account)
+
+        if not config.parser.has_section(login_section):
+            raise ControlError(INVALID_PARAMS, f"Unknown account {account}")
+
+        identity_secret = config.parser.get(login_section, "identity_secret")
+        deviceid = config.parser.get(login_section, "deviceid")
+
+        try:
+            steamid = universe.generate_steamid(config.parser.getint(login_section, "steamid"))
+        except ValueError:
+            raise ControlError(SERVER_ERROR, "Your steamid is invalid. (are you logged in?)") from None
+
+        confirmations = self.confirmations.get(account, [])
+
+        if confirmation_id is None:
+            targets = list(confirmations)
+        else:
+            targets = [item for item in confirmations if item.id == confirmation_id]
+
+            if not targets:
+                raise ControlError(INVALID_PARAMS, f"Confirmation {confirmation_id} not found")
+
+        community_session = cast(community.Community, community.Community.get_session(account))
+        finalized = []
+
+        for confirmation_ in targets:
+            try:
+                # steam confirmation server isn't reliable
+                for _i in range(2):
+                    await community_session.send_confirmation(
+                        identity_secret,
+                        steamid,
+                        deviceid,
+                        confirmation_.id,
+                        confirmation_.nonce,
+                        action,
+                    )
+                    await asyncio.sleep(0.5)
+            except aiohttp.ClientError as exception:
+                log.error("Unable to finalize confirmation %s: %s", confirmation_.id, str(exception))
+                continue
+
+            finalized.append(confirmation_.id)
+            metrics.confirmations_processed.inc(action)
+
+        self.confirmations[account] = [item for item in confirmations if item.id not in finalized]
+        return finalized
+
+    async def rpc_profile_start(self, mode: str = 'sampling', interval: float = 0.005, duration: float = 0) -> str:
+        try:
+            profiling.profiler.start(mode, interval, duration)
+        except ValueError as exception:
+            raise ControlError(INVALID_PARAMS, str(exception)) from None
+        except RuntimeError as exception:
+            raise ControlError(SERVER_ERROR, str(exception)) from None
+
+        return mode
+
+    async def rpc_profile_stop(self) -> List[str]:
+        try:
+            return [str(file) for file in profiling.profiler.stop()]
+        except RuntimeError as exception:
+            raise ControlError(SERVER_ERROR, str(exception)) from None
+
+    async def rpc_memory_start(self, nframes: int = 25, interval: int = 0) -> bool:
+        try:
+            memory.tracker.start(nframes, interval)
+        except RuntimeError as exception:
+            raise ControlError(SERVER_ERROR, str(exception)) from None
+
+        return True
+
+    async def rpc_memory_report(self, limit: int = 10) -> Dict[str, Any]:
+        try:
+            return memory.tracker.report(limit)
+        except RuntimeError as exception:
+            raise ControlError(SERVER_ERROR, str(exception)) from None
+
+    async def rpc_memory_stop(self) -> bool:
+        try:
+            memory.tracker.stop()
+        except RuntimeError as exception:
+            raise ControlError(SERVER_ERROR, str(exception)) from None
+
+        return False
+
+
+def new_server() -> Optional[ControlServer]:
+    if not config.parser.getboolean("control", "enable"):
+        return None
+
+    socket_path = Path(config.parser.get("control", "socket_path"))
+    return ControlServer(socket_path)
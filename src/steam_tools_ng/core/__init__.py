@@ -22,33 +22,26 @@ __all__ = [
     'steamtrades',
     'steamgifts',
     'coupons',
+    'cardfarming',
+    'fakerun',
+    'supervisor',
     'utils',
 ]
 
-import asyncio
-import ssl
-import sys
-from pathlib import Path
-
-import aiohttp
+import importlib
+from types import ModuleType
 
 import stlib
-from . import *
-
-if stlib.steamworks_available:
-    from . import cardfarming, fakerun
-
 
-async def fix_ssl():
-    ssl_context = ssl.SSLContext()
 
-    if hasattr(sys, 'frozen'):
-        _executable_path = Path(sys.executable).parent
-        ssl_context.load_verify_locations(cafile=_executable_path / 'etc' / 'cacert.pem')
+# modules are only imported when requested (PEP 562) so each
+# frontend loads just what it's going to run
+def __getattr__(name: str) -> ModuleType:
+    if name not in __all__:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-    tcp_connector = aiohttp.TCPConnector(ssl=ssl_context, force_close=True)
-    await stlib.set_default_http_params(0, connector=tcp_connector)
+    if name in ['cardfarming', 'fakerun', 'supervisor'] and not stlib.steamworks_available:
+        raise AttributeError(f"{name} is not available because stlib was built without SteamWorks support")
 
+    return importlib.import_module(f'.{name}', __name__)
 
-loop = asyncio.get_event_loop()
-loop.create_task(fix_ssl())
@@ -17,34 +17,251 @@
 #
 import asyncio
 import contextlib
+import json
+import logging
+import os
 import random
-import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
 from subprocess import call
-from typing import AsyncGenerator, Dict, Optional, Any
+from typing import AsyncGenerator, Dict, List, Optional, Any
 
 import aiohttp
 
-from stlib import webapi, client, universe, community
+from stlib import webapi, universe, community
 from . import utils
-from .. import i18n, config
+from .supervisor import ExecutorSupervisor
+from .. import i18n, config, metrics
 
 _ = i18n.get_translation
-executors = {}
+log = logging.getLogger(__name__)
+supervisor = ExecutorSupervisor()
 
+# steam usually drops a card each half hour of playtime after the mandatory waiting
+default_drop_interval = 1800
 
-def safe_exit(*args: Any, **kwargs: Any) -> None:
-    for executor in executors.values():
-        with contextlib.suppress(RuntimeError):
-            executor.shutdown(*args, **kwargs)
+
+@dataclass
+class GameHistory:
+    # all values are in seconds of playtime
+    playtime: int = 0
+    last_drop_playtime: int = 0
+    drops: int = 0
+    # playtime between two observed drops and how many of them were measured
+    drop_playtime: int = 0
+    drop_intervals: int = 0
+
+
+# Predicts when each game will drop its next card, from the playtime and drops seen so far
+class FarmingPlanner:
+    def __init__(self) -> None:
+        self.history: Dict[int, GameHistory] = {}
+
+    def record_playtime(self, appid: int, playtime: int) -> None:
+        self.history.setdefault(appid, GameHistory()).playtime = playtime
+
+    def record_drops(self, appid: int, drops: int) -> None:
+        history = self.history.setdefault(appid, GameHistory())
+
+        if drops <= 0:
+            return
+
+        if history.drops and history.playtime > history.last_drop_playtime:
+            history.drop_playtime += history.playtime - history.last_drop_playtime
+            history.drop_intervals += drops
+
+        history.drops += drops
+        history.last_drop_playtime = history.playtime
+
+    def drop_interval(self, appid: int) -> float:
+        history = self.history.get(appid)
+
+        if history and history.drop_intervals:
+            return history.drop_playtime / history.drop_intervals
+
+        # games without enough history use the average of all games
+        drop_playtime = sum(history_.drop_playtime for history_ in self.history.values())
+        drop_intervals = sum(history_.drop_intervals for history_ in self.history.values())
+
+        if drop_intervals:
+            return drop_playtime / drop_intervals
+
+        return default_drop_interval
+
+    # burst: just accumulate playtime until the mandatory waiting is reached
+    # idle: game is already dropping, check it at the predicted drop time
+    def strategy(self, appid: int, mandatory_waiting: int) -> str:
+        history = self.history.get(appid, GameHistory())
+        return 'burst' if history.playtime < mandatory_waiting else 'idle'
+
+    def time_to_next_drop(self, appid: int, mandatory_waiting: int) -> float:
+        history = self.history.get(appid, GameHistory())
+
+        if history.playtime < mandatory_waiting:
+            return mandatory_waiting - history.playtime
+
+        played_since_drop = history.playtime - max(history.last_drop_playtime, mandatory_waiting)
+        return max(self.drop_interval(appid) - played_since_drop, 0)
+
+    def wait_offset(self, appid: int, mandatory_waiting: int, wait_while_running: int) -> int:
+        if self.strategy(appid, mandatory_waiting) == 'burst':
+            return int(self.time_to_next_drop(appid, mandatory_waiting))
+
+        # drops are checked when predicted, but not too often or too late
+        wait_offset = self.time_to_next_drop(appid, mandatory_waiting)
+        wait_offset = min(max(wait_offset, wait_while_running), wait_while_running * 3)
+        return random.randint(int(wait_offset), int(wait_offset / 100 * 125))
+
+    def sort(self, badges: List[community.Badge], mandatory_waiting: int, reverse_cards: bool) -> List[community.Badge]:
+        # cards are only used to break ties
+        badges = sorted(badges, key=lambda badge_: badge_.cards, reverse=reverse_cards)
+        return sorted(badges, key=lambda badge_: self.time_to_next_drop(badge_.appid, mandatory_waiting))
+
+
+planner = FarmingPlanner()
+
+
+def state_file(session_index: int) -> Path:
+    return config.config_file_directory / f'cardfarming-{session_index}.json'
+
+
+# badges with cards remaining and the planner history, so a restart can resume farming
+async def save_state(session_index: int, badges: Dict[int, community.Badge]) -> None:
+    state = {
+        'time': utils.clock.time(),
+        'badges': [list(badge) for badge in badges.values() if badge.cards > 0],
+        'history': {str(appid): asdict(history) for appid, history in planner.history.items()},
+    }
+
+    await utils.write_file(state_file(session_index), json.dumps(state))
+
+
+# returns saved badges if they are recent enough to be trusted
+def load_state(session_index: int) -> Optional[List[community.Badge]]:
+    try:
+        state = json.loads(state_file(session_index).read_text(encoding='utf-8'))
+        history = {int(appid): GameHistory(**values) for appid, values in state['history'].items()}
+        badges = [community.Badge(*badge) for badge in state['badges']]
+        saved_time = float(state['time'])
+    except FileNotFoundError:
+        return None
+    except (ValueError, KeyError, TypeError):
+        log.warning(_("Ignoring invalid card farming state file"))
+        return None
+
+    for appid, values in history.items():
+        planner.history.setdefault(appid, values)
+
+    if not badges or utils.clock.time() - saved_time > config.parser.getint("cardfarming", "resume_state_ttl"):
+        return None
+
+    return badges
+
+
+# Number of games running at the same time. It's lowered fast when something goes
+# wrong (steam is busy, executors fail to start, host is overloaded or the drop rate
+# per game goes down) and raised slowly while all slots are in use and drops are fine
+class ConcurrencyController:
+    def __init__(self, maximum: int, window: int = 600) -> None:
+        self.maximum = max(maximum, 1)
+        self.window = window
+        self.limit = self.maximum
+        self.reason = _("Starting")
+
+        self._window_start = utils.clock.monotonic()
+        self._last_sample = self._window_start
+        self._last_decrease = 0.0
+        self._drops = 0
+        self._game_time = 0.0
+        self._busy = 0
+        self._spawn_failures = supervisor.spawn_failures()
+        self._previous_rate: Optional[float] = None
+        self._raised = False
+
+    # drops per game per hour in the current window
+    @property
+    def drop_rate(self) -> float:
+        if not self._game_time:
+            return 0
+
+        return self._drops / (self._game_time / 3600)
+
+    def record_drops(self, drops: int) -> None:
+        self._drops += max(drops, 0)
+
+    def record_busy(self) -> None:
+        self._busy += 1
+
+    def _set_limit(self, limit: int, reason: str) -> bool:
+        limit = min(max(limit, 1), self.maximum)
+
+        if limit == self.limit:
+            return False
+
+        if limit < self.limit:
+            self._last_decrease = utils.clock.monotonic()
+
+        log.info(_("Concurrency limit changed from %s to %s: %s"), self.limit, limit, reason)
+        self.limit = limit
+        self.reason = reason
+        return True
+
+    @staticmethod
+    def _host_overloaded() -> bool:
+        if not hasattr(os, 'getloadavg'):
+            return False
+
+        return os.getloadavg()[0] > (os.cpu_count() or 1)
+
+    # returns True when the limit has changed
+    def sample(self, running: int) -> bool:
+        now = utils.clock.monotonic()
+        self._game_time += running * (now - self._last_sample)
+        self._last_sample = now
+
+        if self._busy:
+            self._busy = 0
+            return self._set_limit(self.limit // 2, _("Steam Server is busy"))
+
+        spawn_failures = supervisor.spawn_failures()
+
+        if spawn_failures > self._spawn_failures:
+            self._spawn_failures = spawn_failures
+            return self._set_limit(self.limit // 2, _("Unable to start games"))
+
+        if now - self._last_decrease > 60 and self._host_overloaded():
+            return self._set_limit(self.limit - 1, _("Host is overloaded"))
+
+        if now - self._window_start < self.window:
+            return False
+
+        rate = self.drop_rate
+        previous_rate = self._previous_rate
+        raised = self._raised
+        self._previous_rate = rate
+        self._window_start = now
+        self._drops = 0
+        self._game_time = 0
+        self._raised = False
+
+        if raised and previous_rate and rate < previous_rate * 0.7:
+            return self._set_limit(self.limit - 1, _("Drop rate per game went down"))
+
+        if running >= self.limit and self.limit < self.maximum:
+            self._raised = True
+            return self._set_limit(self.limit + 1, _("Drop rate is stable"))
+
+        return False
 
 
 async def while_has_cards(
         steamid: universe.SteamId,
         badge: community.Badge,
         play_event: Optional[asyncio.Event] = None,
+        session_index: int = 0,
 ) -> AsyncGenerator[utils.ModuleData, None]:
-    webapi_session = webapi.SteamWebAPI.get_session(0)
-    community_session = community.Community.get_session(0)
+    webapi_session = webapi.SteamWebAPI.get_session(session_index)
+    community_session = community.Community.get_session(session_index)
 
     while badge.cards != 0:
         if play_event:
@@ -65,13 +282,24 @@ async def while_has_cards(
 
             continue
 
-        if game_info.playtime_forever * 60 >= mandatory_waiting:
-            wait_offset = random.randint(wait_while_running, int(wait_while_running / 100 * 125))
-        else:
-            wait_offset = mandatory_waiting - game_info.playtime_forever * 60
+        planner.record_playtime(badge.appid, game_info.playtime_forever * 60)
+        wait_offset = planner.wait_offset(badge.appid, mandatory_waiting, wait_while_running)
+        log.debug(
+            _("%s is using %s strategy (next drop in %ss)"),
+            badge.appid,
+            planner.strategy(badge.appid, mandatory_waiting),
+            int(planner.time_to_next_drop(badge.appid, mandatory_waiting)),
+        )
 
         try:
-            executor = client.SteamAPIExecutor(badge.appid)
+            executor = await supervisor.spawn(badge.appid)
+        except MemoryError:
+            module_data = utils.ModuleData(error=_("Not enough memory to run more games"), info=_("Waiting Changes"))
+
+            async for data in utils.timed_module_data(60, module_data):
+                yield data
+
+            continue
         except AttributeError:
             yield utils.ModuleData(action='ignore', info=_("Invalid game id {}. Ignoring.").format(badge.appid))
             break
@@ -93,14 +321,21 @@ async def while_has_cards(
 
         async for data in utils.timed_module_data(wait_offset, module_data):
             if play_event and not play_event.is_set():
-                executor.shutdown()
-                await asyncio.sleep(1)
+                supervisor.pause(badge.appid)
+                await utils.clock.sleep(1)
                 await play_event.wait()
-                executor.__init__(executor.appid)
+                await supervisor.resume(badge.appid)
+
+            # executor died, or the game was parked to lower the concurrency
+            info = supervisor.executors.get(badge.appid)
+
+            if not info or info.state in ('dead', 'paused'):
+                with contextlib.suppress(ProcessLookupError, MemoryError):
+                    await supervisor.spawn(badge.appid)
 
             yield data
 
-        executor.shutdown()
+        supervisor.stop(badge.appid)
         wait_offset = random.randint(wait_for_drops, int(wait_for_drops / 100 * 125))
 
         module_data = utils.ModuleData(
@@ -117,14 +352,16 @@ async def while_has_cards(
                 cards = await community_session.get_card_drops_remaining(steamid, badge.appid)
             except aiohttp.ClientError:
                 yield utils.ModuleData(error=_("Check your connection. (server down?)"), info=_("Waiting Changes"))
-                await asyncio.sleep(10)
+                await utils.clock.sleep(10)
             except community.BadgeError:
-                yield utils.ModuleData(error=_("Steam Server is busy"), info=_("Waiting Changes"))
-                await asyncio.sleep(20)
+                yield utils.ModuleData(error=_("Steam Server is busy"), info=_("Waiting Changes"), action="busy")
+                await utils.clock.sleep(20)
             else:
                 break
 
-        yield utils.ModuleData(action="update_drops", raw_data=badge.cards - cards)
+        planner.record_drops(badge.appid, badge.cards - cards)
+        metrics.record_drops(session_index, badge.cards - cards)
+        yield utils.ModuleData(display=str(badge.appid), action="update_drops", raw_data=badge.cards - cards)
 
         # noinspection PyProtectedMember
         badge = badge._replace(cards=cards)
@@ -139,24 +376,38 @@ async def main(
         steamid: universe.SteamId,
         play_event: Optional[asyncio.Event] = None,
         custom_game_id: int = 0,
+        session_index: int = 0,
 ) -> AsyncGenerator[utils.ModuleData, None]:
     if play_event:
         await play_event.wait()
 
-    asyncio.current_task().add_done_callback(safe_exit)
+    asyncio.current_task().add_done_callback(supervisor.shutdown)
+    supervisor.max_memory = config.parser.getint("cardfarming", "max_executors_memory") * 1024 * 1024
 
     reverse_sorting = config.parser.getboolean("cardfarming", "reverse_sorting")
     max_concurrency = config.parser.getint("cardfarming", "max_concurrency")
     invisible = config.parser.getboolean("cardfarming", "invisible")
-    community_session = community.Community.get_session(0)
+    community_session = community.Community.get_session(session_index)
     total_cards_remaining = 0
 
+    mandatory_waiting = config.parser.getint("cardfarming", "mandatory_waiting")
+    webapi_session = webapi.SteamWebAPI.get_session(session_index)
+
     try:
-        badges = sorted(
-            await community_session.get_badges(steamid),
-            key=lambda badge_: badge_.cards,  # type: ignore
-            reverse=reverse_sorting
-        )
+        # badges page is slow, so a recent state is used when available
+        if saved_badges := load_state(session_index):
+            log.info(_("Resuming card farming from saved state"))
+            badges = saved_badges
+        else:
+            badges = await community_session.get_badges(steamid)
+
+            # playtime is only used to sort the games, so it's not a problem if it's not available
+            with contextlib.suppress(ValueError):
+                if badges:
+                    appids = [badge.appid for badge in badges]
+
+                    for game in await webapi_session.get_owned_games(steamid, appids_filter=appids):
+                        planner.record_playtime(game.appid, game.playtime_forever * 60)
     except aiohttp.ClientError:
         module_data = utils.ModuleData(error=_("Check your connection. (server down?)"), info=_("Waiting Changes"))
 
@@ -165,6 +416,14 @@ async def main(
 
         return
 
+    # games closer to drop a card are started first
+    badges = planner.sort(badges, mandatory_waiting, reverse_sorting)
+    farming_badges = {badge.appid: badge for badge in badges}
+    await save_state(session_index, farming_badges)
+
+    if not badges:
+        metrics.cards_remaining.set(0, str(session_index))
+
     if not badges or (custom_game_id and custom_game_id not in [badge.appid for badge in badges]):
         module_data = utils.ModuleData(error=_("No more cards to drop."), info=_("Waiting Changes"))
         wait_offset = random.randint(300, 500)
@@ -189,84 +448,92 @@ async def main(
             yield utils.ModuleData(info=_("Skipping {}").format(badge.appid))
             continue
 
-        generators[badge.appid] = while_has_cards(steamid, badge, play_event)
+        generators[badge.appid] = while_has_cards(steamid, badge, play_event, session_index)
         total_cards_remaining += badge.cards
 
-    tasks: Dict[int, Optional[asyncio.Task[Any]]] = {}
-    semaphore = asyncio.Semaphore(max_concurrency)
+    metrics.cards_remaining.set(total_cards_remaining, str(session_index))
+    controller = ConcurrencyController(max_concurrency)
+    # games waiting for a free slot (not started yet or parked when limit was lowered)
+    pending = list(generators)
+    tasks: Dict[int, asyncio.Task[Any]] = {}
     last_update = 0
 
-    while True:
-        for appid in generators:
+    while pending or tasks:
+        pending.sort(key=lambda appid_: planner.time_to_next_drop(appid_, mandatory_waiting))
+
+        while pending and len(tasks) < controller.limit:
+            appid = pending.pop(0)
             progress_coro = anext(generators[appid])
             assert asyncio.iscoroutine(progress_coro)
+            tasks[appid] = asyncio.create_task(progress_coro)
 
-            if appid not in tasks:
-                if semaphore.locked():
-                    break
+        await asyncio.wait(tasks.values(), return_when=asyncio.FIRST_COMPLETED)
 
-                await semaphore.acquire()
-                tasks[appid] = asyncio.create_task(progress_coro)
+        for appid, task in list(tasks.items()):
+            if not task.done():
+                continue
 
-            if not tasks[appid]:
+            del tasks[appid]
+            current_exception = task.exception()
+
+            if isinstance(current_exception, StopAsyncIteration):
                 continue
 
-            current_task = tasks[appid]
-            assert isinstance(current_task, asyncio.Task)
+            if current_exception:
+                raise current_exception
 
-            if current_task.done():
-                semaphore.release()
+            data: utils.ModuleData = task.result()
 
-                if current_task.exception():
-                    if isinstance(current_task.exception(), StopAsyncIteration):
-                        tasks[appid] = None
-                        continue
+            if data.action == "update_drops":
+                total_cards_remaining -= data.raw_data
+                metrics.cards_remaining.set(total_cards_remaining, str(session_index))
+                cards = farming_badges[appid].cards - data.raw_data
+                # noinspection PyProtectedMember
+                farming_badges[appid] = farming_badges[appid]._replace(cards=cards)
+                await save_state(session_index, farming_badges)
+                controller.record_drops(data.raw_data)
 
-                    current_exception = current_task.exception()
-                    assert isinstance(current_exception, BaseException)
-                    raise current_exception
+            if data.action == "busy":
+                controller.record_busy()
 
-                await semaphore.acquire()
+            if len(tasks) >= controller.limit:
+                # game will be resumed from where it was when a slot is available again
+                supervisor.pause(appid)
+                pending.append(appid)
+            else:
+                progress_coro = anext(generators[appid])
+                assert asyncio.iscoroutine(progress_coro)
                 tasks[appid] = asyncio.create_task(progress_coro)
 
-        if not any(tasks.values()):
-            break
-
-        await asyncio.wait([task for task in tasks.values() if task], return_when=asyncio.FIRST_COMPLETED)
-
-        for appid, task in tasks.items():
-            if task and task.done() and not task.exception():
-                global executors
-                data: utils.ModuleData = task.result()
-
-                if data.action == 'check':
-                    executors[appid] = data.raw_data
-
-                if data.action == "update_drops":
-                    total_cards_remaining -= data.raw_data
-
-                if int(time.time()) > last_update + 3:
-                    current_running_limit = len(tasks)
-                    total_remaining = len(generators) - len([task for task in tasks.values() if not task])
-                    running_executors = [executor for executor in executors.values() if executor.is_running()]
-                    extra_info = ''
-
-                    current_running_limit = min(current_running_limit, total_remaining)
-                    if current_running_limit == 2:
-                        extra_info = _(" +{} other").format(current_running_limit - 1)
-                    elif current_running_limit > 2:
-                        extra_info = _(" +{} others").format(current_running_limit - 1)
-
-                    yield utils.ModuleData(
-                        display=' : '.join([str(executor.appid) for executor in running_executors]),
-                        info=data.info + extra_info,
-                        status=_('{} from {} remaining ({} cards)').format(
-                            current_running_limit,
-                            total_remaining,
-                            total_cards_remaining,
-                        ),
-                        level=data.level,
-                        raw_data=running_executors,
-                        action=data.action,
-                    )
-                    last_update = int(time.time())
+            if controller.sample(len(tasks)):
+                yield utils.ModuleData(
+                    info=_("Running up to {} games: {}").format(controller.limit, controller.reason),
+                )
+
+            if int(utils.clock.time()) > last_update + 3:
+                current_running_limit = len(tasks)
+                total_remaining = len(pending) + len(tasks)
+                supervisor.health_check()
+                supervisor.reap()
+                supervisor.update_usage()
+                running_executors = supervisor.running_executors()
+                extra_info = ''
+
+                if current_running_limit == 2:
+                    extra_info = _(" +{} other").format(current_running_limit - 1)
+                elif current_running_limit > 2:
+                    extra_info = _(" +{} others").format(current_running_limit - 1)
+
+                yield utils.ModuleData(
+                    display=' : '.join([str(executor.appid) for executor in running_executors]),
+                    info=data.info + extra_info,
+                    status=_('{} from {} remaining ({} cards)').format(
+                        current_running_limit,
+                        total_remaining,
+                        total_cards_remaining,
+                    ),
+                    level=data.level,
+                    raw_data=running_executors,
+                    action=data.action,
+                )
+                last_update = int(utils.clock.time())
@@ -32,11 +32,13 @@ log = logging.getLogger(__name__)
 async def main(
         steamid: universe.SteamId,
         wait_available: Callable[[], Awaitable[None]],
+        session_index: int = 0,
 ) -> AsyncGenerator[utils.ModuleData, None]:
     await wait_available()
 
-    identity_secret = config.parser.get("login", "identity_secret")
-    session = community.Community.get_session(0)
+    login_section = config.login_section(session_index)
+    identity_secret = config.parser.get(login_section, "identity_secret")
+    session = community.Community.get_session(session_index)
 
     if not identity_secret:
         config.new("confirmations", "enable", "false")
@@ -47,12 +49,12 @@ async def main(
 
         return
 
-    deviceid = config.parser.get("login", "deviceid")
+    deviceid = config.parser.get(login_section, "deviceid")
 
     if not deviceid:
         log.warning(_("Unable to find deviceid. Generating from identity."))
         deviceid = universe.generate_device_id(identity_secret)
-        config.new("login", "deviceid", deviceid)
+        config.new(login_section, "deviceid", deviceid)
 
     try:
         confirmations = await session.get_confirmations(identity_secret, steamid, deviceid)
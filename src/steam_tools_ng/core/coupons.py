@@ -17,7 +17,7 @@
 #
 import asyncio
 import logging
-from typing import AsyncGenerator, Callable, Awaitable
+from typing import AsyncGenerator, Callable, Awaitable, FrozenSet, Iterable, NamedTuple, Tuple
 
 import aiohttp
 
@@ -29,17 +29,48 @@ _ = i18n.get_translation
 log = logging.getLogger(__name__)
 
 
+class Blacklist(NamedTuple):
+    names: FrozenSet[str]
+    # `*name` entries
+    suffixes: Tuple[str, ...]
+    # `name*` entries
+    prefixes: Tuple[str, ...]
+
+
+def coupon_game_name(coupon_name: str) -> str:
+    return coupon_name.split('% OFF')[-1].split('- Coupon')[0].strip()
+
+
+def parse_blacklist(blacklist: str, extra_names: Iterable[str] = ()) -> Blacklist:
+    names = [coupon_game_name(name) for name in blacklist.split(',')]
+
+    return Blacklist(
+        frozenset([*names, *extra_names]),
+        tuple(name[1:] for name in names if name.startswith('*')),
+        tuple(name[:-1] for name in names if name.endswith('*')),
+    )
+
+
+def is_blacklisted(game_name: str, blacklist: Blacklist) -> bool:
+    return (
+            game_name in blacklist.names or
+            game_name.endswith(blacklist.suffixes) or
+            game_name.startswith(blacklist.prefixes)
+    )
+
+
 async def main(
         steamid: universe.SteamId,
         fetch_coupon_event: asyncio.Event,
         wait_available: Callable[[], Awaitable[None]],
+        session_index: int = 0,
 ) -> AsyncGenerator[utils.ModuleData, None]:
     await wait_available()
     await fetch_coupon_event.wait()
 
-    community_session = community.Community.get_session(0)
-    internals_session = internals.Internals.get_session(0)
-    webapi_session = webapi.SteamWebAPI.get_session(0)
+    community_session = community.Community.get_session(session_index)
+    internals_session = internals.Internals.get_session(session_index)
+    webapi_session = webapi.SteamWebAPI.get_session(session_index)
     botids = config.parser.get('coupons', 'botids')
     tokens = config.parser.get('coupons', 'tokens')
     appid = config.parser.getint('coupons', 'appid')
@@ -47,7 +78,7 @@ async def main(
 
     if not botids:
         yield utils.ModuleData(error=_("No botID found"), info=_("Waiting Changes"))
-        await asyncio.sleep(5)
+        await utils.clock.sleep(5)
         return
 
     bot_list = [bot.strip() for bot in botids.split(',')]
@@ -55,14 +86,14 @@ async def main(
 
     if len(bot_list) != len(token_list):
         yield utils.ModuleData(error=_("Invalid config. Each bot must have id and token."), info=_("Waiting Changes"))
-        await asyncio.sleep(5)
+        await utils.clock.sleep(5)
         return
 
     try:
         owned_games = await webapi_session.get_owned_games(steamid)
     except aiohttp.ClientError:
         yield utils.ModuleData(error=_("Failed when trying to get owned games"))
-        await asyncio.sleep(30)
+        await utils.clock.sleep(30)
         return
 
     yield utils.ModuleData(action="clear")
@@ -73,7 +104,7 @@ async def main(
             steamid = universe.generate_steamid(botid)
         except ValueError:
             yield utils.ModuleData(error=_("The botid {} is invalid").format(botid))
-            await asyncio.sleep(5)
+            await utils.clock.sleep(5)
             return
 
         try:
@@ -101,15 +132,22 @@ async def main(
 
             continue
 
+        owned_names = [game.name for game in owned_games]
+        raw_blacklist = config.parser.get('coupons', 'blacklist')
+        blacklist = parse_blacklist(raw_blacklist, owned_names)
+
         for index, coupon_ in enumerate(inventory):
             yield utils.ModuleData(action="update_level", raw_data=(index, len(inventory)))
             package_link = coupon_.actions[0]['link']
             packageids = [int(id_) for id_ in package_link.split('=')[1].split(',')]
-            blacklist = config.parser.get('coupons', 'blacklist')
-            ignored_list = [name.split('% OFF')[-1].split('- Coupon')[0].strip() for name in blacklist.split(',')]
-            ignored_list.extend([game.name for game in owned_games])
+            game_name = coupon_game_name(coupon_.name)
             minimum_discount = config.parser.getint('coupons', 'minimum_discount')
-            game_name = coupon_.name.split('% OFF')[-1].split('- Coupon')[0].strip()
+
+            # blacklist can be changed from the GUI while coupons are fetched,
+            # but it's only parsed again when that happens
+            if config.parser.get('coupons', 'blacklist') != raw_blacklist:
+                raw_blacklist = config.parser.get('coupons', 'blacklist')
+                blacklist = parse_blacklist(raw_blacklist, owned_names)
 
             for package_id in packageids:
                 if not fetch_coupon_event.is_set():
@@ -117,16 +155,7 @@ async def main(
                     yield utils.ModuleData(action="update_level", raw_data=(0, 0))
                     return
 
-                if any(
-                        ignored == game_name or
-                        (ignored.startswith('*') and game_name.endswith(ignored[1:])) or
-                        (ignored.endswith('*') and game_name.startswith(ignored[:-1]))
-                        for ignored in blacklist
-                ):
-                    log.info(_('Ignoring coupon %s due blacklist'), coupon_.name)
-                    continue
-
-                if coupon_.name.split('% OFF')[-1].split('- Coupon')[0].strip() in ignored_list:
+                if is_blacklisted(game_name, blacklist):
                     log.info(_('Ignoring coupon %s due blacklist'), coupon_.name)
                     continue
 
@@ -155,10 +184,10 @@ async def main(
                     continue
                 except ValueError:
                     yield utils.ModuleData(error=_("Failed to get package details"), info=_("Waiting Changes"))
-                    await asyncio.sleep(1)
+                    await utils.clock.sleep(1)
                     continue
                 else:
-                    await asyncio.sleep(.5)
+                    await utils.clock.sleep(.5)
 
                 if package_details.discount_percent:
                     real_price = package_details.price - (
@@ -16,7 +16,6 @@
 # along with this program. If not, see http://www.gnu.org/licenses/.
 #
 import aiohttp
-import asyncio
 from subprocess import call
 from typing import AsyncGenerator, Optional, List
 
@@ -29,12 +28,12 @@ _ = i18n.get_translation
 
 async def mixing_igredients(ids: List[str]) -> AsyncGenerator[utils.ModuleData, None]:
     yield utils.ModuleData(display=str(34), status=_("Mixing ingredients"))
-    await asyncio.sleep(2)
+    await utils.clock.sleep(2)
 
     try:
         for id_ in ids:
             with client.SteamAPIExecutor(int(id_)):
-                await asyncio.sleep(2)
+                await utils.clock.sleep(2)
                 yield utils.ModuleData(display=id_, status=_("Sugar successfully added"))
     except ProcessLookupError:
         yield utils.ModuleData(error=_("Steam Client is not running."))
@@ -44,6 +43,7 @@ async def cake(
         webapi_session: webapi.SteamWebAPI,
         steamid: universe.SteamId,
         game_id: int,
+        session_index: int = 0,
 ) -> AsyncGenerator[utils.ModuleData, None]:
     yield utils.ModuleData(display=str(34), status=_("Loading a delicious cake"))
     ids = config.parser.get('fakerun', 'cakes').strip().split(',')
@@ -70,12 +70,12 @@ async def cake(
         return
 
     call(f'{config.file_manager} "steam://run/{game_id}"')
-    await asyncio.sleep(3)
+    await utils.clock.sleep(3)
 
     async for slice_ in mixing_igredients(ids):
         yield slice_
 
-    community_session = community.Community.get_session(0)
+    community_session = community.Community.get_session(session_index)
 
     while True:
         last_played_game = await community_session.get_last_played_game(steamid)
@@ -84,7 +84,7 @@ async def cake(
             yield utils.ModuleData(display=str(34), status=_("getting cake out of pan"))
 
             # Prevent pan to fall out of hands
-            await asyncio.sleep(3)
+            await utils.clock.sleep(3)
 
             async for slice_ in mixing_igredients(ids):
                 yield slice_
@@ -92,19 +92,20 @@ async def cake(
             yield utils.ModuleData(display=str(34), status=_("Cake is ready"))
             break
 
-        await asyncio.sleep(10)
+        await utils.clock.sleep(10)
 
 
 async def main(
         steamid: universe.SteamId,
         game_id: int,
         extra_game_id: Optional[int] = None,
+        session_index: int = 0,
 ) -> AsyncGenerator[utils.ModuleData, None]:
-    webapi_session = webapi.SteamWebAPI.get_session(0)
+    webapi_session = webapi.SteamWebAPI.get_session(session_index)
 
     if game_id == 34:
         assert isinstance(extra_game_id, int), "No extra game_id"
-        async for slice_ in cake(webapi_session, steamid, extra_game_id):
+        async for slice_ in cake(webapi_session, steamid, extra_game_id, session_index):
             yield slice_
         return
 
@@ -139,7 +140,7 @@ async def main(
                     raw_data=executor,
                     action="check",
                 )
-                await asyncio.sleep(1)
+                await utils.clock.sleep(1)
                 start_time += 1
     except ProcessLookupError:
         yield utils.ModuleData(error=_("Steam Client is not running."))
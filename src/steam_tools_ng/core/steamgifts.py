@@ -17,36 +17,315 @@
 #
 import asyncio
 import logging
+import math
 import random
-from typing import AsyncGenerator
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncGenerator, Any, Callable, Dict, List, Optional, Set, Tuple, TypeVar
 
 import aiohttp
 
 from stlib import plugins, login
 from . import utils
-from .. import i18n, config
+from .. import i18n, config, metrics
 
 _ = i18n.get_translation
 log = logging.getLogger(__name__)
 
+T = TypeVar('T')
 
-async def main() -> AsyncGenerator[utils.ModuleData, None]:
+# (session_index, type, metascore, entries, pinned) -> (fetch time, giveaways)
+_listing_cache: Dict[Tuple[Any, ...], Tuple[float, List[Any]]] = {}
+
+# how long (in seconds) a giveaway is skipped after each result
+index_expiration = {
+    'joined': 60 * 60 * 24 * 60,
+    'ended': 60 * 60 * 24 * 60,
+    'failed': 60 * 60 * 6,
+}
+
+
+# giveaways that were already joined (or can't be joined), kept across restarts.
+# sqlite blocks on each commit, so it only runs on its own thread, and new entries
+# are written in batches while the module keeps going. Each module run opens its own
+# index and closes it when done
+class GiveawayIndex:
+    def __init__(self, database: str) -> None:
+        self.database = database
+        self.connection: Optional[sqlite3.Connection] = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='giveaway_index')
+        self._pending: List[Tuple[int, str, str, float]] = []
+        self._flush_task: Optional['asyncio.Task[None]'] = None
+
+    async def _run(self, function: Callable[..., T], *args: Any) -> T:
+        return await asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
+
+    def _connect(self) -> sqlite3.Connection:
+        if not self.connection:
+            self.connection = sqlite3.connect(self.database, check_same_thread=False)
+
+            with self.connection:
+                self.connection.execute(
+                    "CREATE TABLE IF NOT EXISTS giveaways ("
+                    "session_index INTEGER, id TEXT, state TEXT, expires REAL, "
+                    "PRIMARY KEY (session_index, id))"
+                )
+
+        return self.connection
+
+    def _write(self, rows: List[Tuple[int, str, str, float]]) -> None:
+        with self._connect() as connection:
+            connection.executemany("INSERT OR REPLACE INTO giveaways VALUES (?, ?, ?, ?)", rows)
+
+    def _known_ids(self, session_index: int, now: float) -> Set[str]:
+        with self._connect() as connection:
+            connection.execute("DELETE FROM giveaways WHERE expires < ?", (now,))
+
+        cursor = connection.execute("SELECT id FROM giveaways WHERE session_index = ?", (session_index,))
+        return {giveaway_id for giveaway_id, in cursor}
+
+    def add(self, session_index: int, giveaway_id: str, state: str) -> None:
+        expires = utils.clock.time() + index_expiration[state]
+        self._pending.append((session_index, giveaway_id, state, expires))
+
+        if not self._flush_task:
+            self._flush_task = asyncio.create_task(self.flush())
+
+    async def flush(self) -> None:
+        try:
+            # entries added while writing are saved on the next batch
+            while self._pending:
+                rows, self._pending = self._pending, []
+
+                try:
+                    await self._run(self._write, rows)
+                except (sqlite3.Error, OSError) as exception:
+                    log.error(_("Unable to save giveaway index: %s"), str(exception))
+                    # they're written again with the next batch
+                    self._pending = rows + self._pending
+                    break
+        finally:
+            self._flush_task = None
+
+    async def known_ids(self, session_index: int) -> Set[str]:
+        if self._flush_task:
+            await asyncio.shield(self._flush_task)
+
+        return await self._run(self._known_ids, session_index, utils.clock.time())
+
+    async def close(self) -> None:
+        if self._flush_task:
+            await asyncio.shield(self._flush_task)
+
+        # last try for entries that failed before
+        await self.flush()
+
+        if self._pending:
+            log.warning(_("%s giveaways were not saved on the index"), len(self._pending))
+
+        if self.connection:
+            await self._run(self.connection.close)
+            self.connection = None
+
+        self._executor.shutdown()
+
+
+def index_file() -> str:
+    return str(config.config_file_directory / 'steamgifts.sqlite3')
+
+
+def cached_giveaways(
+        session_index: int,
+        type_: str,
+        metascore_filter: Tuple[int, int],
+        entries_filter: Tuple[int, int],
+        pinned: bool,
+) -> Optional[List[Any]]:
+    cache_key = (session_index, type_, metascore_filter, entries_filter, pinned)
+    ttl = config.getint("steamgifts", "listing_cache_ttl", session_index)
+
+    if cache_key in _listing_cache:
+        fetch_time, giveaways = _listing_cache[cache_key]
+
+        if utils.clock.monotonic() - fetch_time < ttl:
+            return giveaways
+
+    return None
+
+
+# metascore and entries aren't available on giveaway info, so they must be
+# filtered by steamgifts. Everything else is filtered locally by each strategy
+async def get_giveaways(
+        steamgifts_session: Any,
+        session_index: int,
+        type_: str,
+        metascore_filter: Tuple[int, int],
+        entries_filter: Tuple[int, int],
+        pinned: bool,
+) -> List[Any]:
+    cache_key = (session_index, type_, metascore_filter, entries_filter, pinned)
+
+    if (giveaways := cached_giveaways(*cache_key)) is not None:
+        log.debug(_("Using cached giveaways for %s"), type_)
+        return giveaways
+
+    giveaways = await steamgifts_session.get_giveaways(
+        type_,
+        metascore_filter,
+        entries_filter=entries_filter,
+        pinned_giveaways=pinned,
+    )
+
+    _listing_cache[cache_key] = (utils.clock.monotonic(), giveaways)
+    return giveaways
+
+
+def discard_giveaway(session_index: int, giveaway_id: str) -> None:
+    for cache_key, (fetch_time, giveaways) in _listing_cache.items():
+        if cache_key[0] == session_index:
+            giveaways[:] = [giveaway for giveaway in giveaways if giveaway.id != giveaway_id]
+
+
+def filter_giveaways(
+        giveaways: List[Any],
+        points_filter: Tuple[int, int],
+        level_filter: Tuple[int, int],
+        copies_filter: Tuple[int, int],
+) -> List[Any]:
+    return [
+        giveaway for giveaway in giveaways
+        if points_filter[0] <= giveaway.points <= points_filter[1]
+        and level_filter[0] <= giveaway.level <= level_filter[1]
+        and copies_filter[0] <= giveaway.copies <= copies_filter[1]
+    ]
+
+
+# Entries, metascore and end time aren't available on the listing, so the chance
+# of winning is estimated by copies and level (higher levels have fewer entrants)
+def score_giveaway(giveaway: Any) -> float:
+    return giveaway.copies * (1 + giveaway.level / 10)
+
+
+# 0/1 knapsack over available points: maximize the total score of the joined giveaways.
+# Giveaways are kept in the given order, so earlier ones win ties
+def plan_giveaways(giveaways: List[Any], budget: int) -> List[Any]:
+    if budget <= 0 or not giveaways:
+        return []
+
+    best_score = [0.0] * (budget + 1)
+    selected = [[False] * (budget + 1) for _giveaway in giveaways]
+
+    for index, giveaway in enumerate(giveaways):
+        score = score_giveaway(giveaway)
+
+        for points in range(budget, giveaway.points - 1, -1):
+            if best_score[points - giveaway.points] + score > best_score[points]:
+                best_score[points] = best_score[points - giveaway.points] + score
+                selected[index][points] = True
+
+    plan = []
+    points = budget
+
+    for index in range(len(giveaways) - 1, -1, -1):
+        if selected[index][points]:
+            plan.append(giveaways[index])
+            points -= giveaways[index].points
+
+    plan.reverse()
+    return plan
+
+
+async def fetch_listings(
+        steamgifts_session: Any,
+        session_index: int,
+        queue: 'asyncio.Queue[Any]',
+        limiter: utils.RateLimiter,
+) -> None:
+    pinned = config.getboolean("steamgifts", "developer_giveaways", session_index)
+
+    try:
+        for strategy_index in range(1, 6):
+            strategy = f"steamgifts_strategy{strategy_index}"
+            enabled = config.getboolean(strategy, "enable", session_index)
+
+            if not enabled:
+                await queue.put(utils.ModuleData(info=_("Strategy {} is disabled. Skipping.").format(strategy_index)))
+                continue
+
+            type_ = config.get(strategy, "restrict_type", session_index)
+            minimum_points = config.getint(strategy, "minimum_points", session_index)
+            maximum_points = config.getint(strategy, "maximum_points", session_index)
+            minimum_level = config.getint(strategy, "minimum_level", session_index)
+            maximum_level = config.getint(strategy, "maximum_level", session_index)
+            minimum_copies = config.getint(strategy, "minimum_copies", session_index)
+            maximum_copies = config.getint(strategy, "maximum_copies", session_index)
+            minimum_metascore = config.getint(strategy, "minimum_metascore", session_index)
+            maximum_metascore = config.getint(strategy, "maximum_metascore", session_index)
+            minimum_entries = config.getint(strategy, "minimum_entries", session_index)
+            maximum_entries = config.getint(strategy, "maximum_entries", session_index)
+
+            metascore_filter = (minimum_metascore, maximum_metascore)
+            entries_filter = (minimum_entries, maximum_entries)
+
+            if cached_giveaways(session_index, type_, metascore_filter, entries_filter, pinned) is None:
+                await limiter.wait()
+
+            giveaways = await get_giveaways(
+                steamgifts_session,
+                session_index,
+                type_,
+                metascore_filter,
+                entries_filter,
+                pinned,
+            )
+
+            giveaways = filter_giveaways(
+                giveaways,
+                (minimum_points, maximum_points),
+                (minimum_level, maximum_level),
+                (minimum_copies, maximum_copies),
+            )
+
+            if not giveaways:
+                await queue.put(
+                    utils.ModuleData(status=_("No giveaways to join for strategy {}. Skipping.").format(strategy_index))
+                )
+                continue
+
+            sort_type = config.get(strategy, "sort_type", session_index)
+            sort_name = sort_type[:-1]
+            sort_direction = sort_type[-1]
+
+            giveaways = sorted(
+                giveaways,
+                key=lambda giveaway_: getattr(giveaway_, sort_name),
+                reverse=sort_direction == '-',
+            )
+
+            await queue.put(giveaways)
+    except aiohttp.ClientError as exception:
+        await queue.put(exception)
+    finally:
+        await queue.put(None)
+
+
+async def main(session_index: int = 0) -> AsyncGenerator[utils.ModuleData, None]:
     yield utils.ModuleData(status=_("Loading"))
 
     if not plugins.has_plugin("steamgifts"):
         raise ImportError(_("Unable to find Steamgifts plugin."))
 
     steamgifts = plugins.get_plugin("steamgifts")
-    steamgifts_session = steamgifts.Main.get_session(0)
+    steamgifts_session = steamgifts.Main.get_session(session_index)
     try:
         await steamgifts_session.do_login()
     except aiohttp.ClientError:
         yield utils.ModuleData(error=_("Check your connection. (server down?)"), info=_("Waiting Changes"))
-        await asyncio.sleep(15)
+        await utils.clock.sleep(15)
         return
     except steamgifts.TooFast:
         yield utils.ModuleData(error=_("Unable to login. Trying again in 15 seconds"))
-        await asyncio.sleep(15)
+        await utils.clock.sleep(15)
         return
     except steamgifts.UserSuspended:
         module_data = utils.ModuleData(error=_("User is suspended."))
@@ -57,95 +336,89 @@ async def main() -> AsyncGenerator[utils.ModuleData, None]:
         return
     except steamgifts.PrivateProfile:
         yield utils.ModuleData(error=_("Your profile must be public to use steamgifts."), info=_("Waiting Changes"))
-        await asyncio.sleep(30)
+        await utils.clock.sleep(30)
         return
     except login.LoginError:
         yield utils.ModuleData(error=_("User is not logged in. Trying again in 30 seconds"))
-        await asyncio.sleep(30)
+        await utils.clock.sleep(30)
         return
 
     try:
         await steamgifts_session.configure()
     except aiohttp.ClientError:
         yield utils.ModuleData(error=_("Check your connection. (server down?)"))
-        await asyncio.sleep(15)
+        await utils.clock.sleep(15)
         return
     except steamgifts.ConfigureError:
         yield utils.ModuleData(error=_("Unable to configure steamgifts."))
-        await asyncio.sleep(20)
+        await utils.clock.sleep(20)
         return
 
-    pinned = config.parser.getboolean("steamgifts", "developer_giveaways")
-    points_to_preserve = config.parser.getint("steamgifts", "minimum_points")
-    mode = config.parser.get("steamgifts", "mode")
-    wait_after_each_strategy = config.parser.getint("steamgifts", "wait_after_each_strategy")
-    wait_after_full_cycle = config.parser.getint("steamgifts", "wait_after_full_cycle")
-
-    for strategy_index in range(1, 6):
-        strategy = f"steamgifts_strategy{strategy_index}"
-        enabled = config.parser.get(strategy, "enable")
-
-        if not enabled:
-            yield utils.ModuleData(info=_("Strategy {} is disabled. Skipping.").format(strategy_index))
-            continue
-
-        type_ = config.parser.get(strategy, "restrict_type")
-        minimum_points = config.parser.getint(strategy, "minimum_points")
-        maximum_points = config.parser.getint(strategy, "maximum_points")
-        minimum_level = config.parser.getint(strategy, "minimum_level")
-        maximum_level = config.parser.getint(strategy, "maximum_level")
-        minimum_copies = config.parser.getint(strategy, "minimum_copies")
-        maximum_copies = config.parser.getint(strategy, "maximum_copies")
-        minimum_metascore = config.parser.getint(strategy, "minimum_metascore")
-        maximum_metascore = config.parser.getint(strategy, "maximum_metascore")
-        minimum_entries = config.parser.getint(strategy, "minimum_entries")
-        maximum_entries = config.parser.getint(strategy, "maximum_entries")
-
-        max_ban_wait = random.randint(5, 15)
-        async for data in utils.timed_module_data(max_ban_wait, utils.ModuleData()):
-            yield data
+    points_to_preserve = config.getint("steamgifts", "minimum_points", session_index)
+    mode = config.get("steamgifts", "mode", session_index)
+    wait_after_each_strategy = config.getint("steamgifts", "wait_after_each_strategy", session_index)
+    wait_after_full_cycle = config.getint("steamgifts", "wait_after_full_cycle", session_index)
+    index = GiveawayIndex(index_file())
+
+    # listings are fetched in background while planned giveaways are joined.
+    # Each new listing is merged with the remaining candidates and the plan is
+    # made again with the points that are still available
+    fetch_limiter = utils.RateLimiter(wait_after_each_strategy, wait_after_each_strategy / 6, delay_first=True)
+    join_limiter = utils.RateLimiter(5, 10, delay_first=True)
+    listings: asyncio.Queue[Any] = asyncio.Queue()
+    fetch_task = asyncio.create_task(fetch_listings(steamgifts_session, session_index, listings, fetch_limiter))
+
+    candidates: Dict[str, Any] = {}
+    plan: List[Any] = []
+    fetching = True
+    joined_count = 0
+    wait_enabled = False
+    restart = False
 
-        try:
-            giveaways = await steamgifts_session.get_giveaways(
-                type_,
-                (minimum_metascore, maximum_metascore),
-                (minimum_level, maximum_level),
-                (minimum_entries, maximum_entries),
-                (minimum_points, maximum_points),
-                (minimum_copies, maximum_copies),
-                pinned_giveaways=pinned,
-            )
-        except aiohttp.ClientError:
-            yield utils.ModuleData(error=_("Check your connection. (server down?)"))
-            await asyncio.sleep(15)
-            return
+    try:
+        known_ids = await index.known_ids(session_index)
+
+        while True:
+            if fetching and (not plan or not listings.empty()):
+                listing = await listings.get()
+
+                if listing is None:
+                    fetching = False
+                elif isinstance(listing, utils.ModuleData):
+                    yield listing
+                elif isinstance(listing, aiohttp.ClientError):
+                    yield utils.ModuleData(error=_("Check your connection. (server down?)"))
+                    await utils.clock.sleep(15)
+                    return
+                else:
+                    # earlier strategies and sort order have priority when scores are equal
+                    for giveaway in listing:
+                        if giveaway.id not in known_ids:
+                            candidates.setdefault(giveaway.id, giveaway)
 
-        wait_enabled = False
+                    budget = steamgifts_session.user_info.points - points_to_preserve
+                    metrics.steamgifts_points.set(steamgifts_session.user_info.points, str(session_index))
+                    plan = plan_giveaways(list(candidates.values()), budget)
 
-        if giveaways:
-            sort_type = config.parser.get(strategy, "sort_type")
-            sort_name = sort_type[:-1]
-            sort_direction = sort_type[-1]
-
-            giveaways = sorted(
-                giveaways,
-                key=lambda giveaway_: getattr(giveaway_, sort_name),
-                reverse=sort_direction == '-',
-            )
-        else:
-            yield utils.ModuleData(status=_("No giveaways to join for strategy {}. Skipping.").format(strategy_index))
-            continue
+                    yield utils.ModuleData(
+                        status=_("Joining {} of {} giveaways ({} points)").format(
+                            len(plan),
+                            len(candidates),
+                            sum(giveaway.points for giveaway in plan),
+                        )
+                    )
 
-        restart = False
+                continue
 
-        for index, giveaway in enumerate(giveaways):
-            module_data = utils.ModuleData(display=giveaway.id, info=giveaway.name)
-            max_ban_wait = random.randint(5, 15)
+            if not plan:
+                break
 
-            async for data in utils.timed_module_data(max_ban_wait, module_data):
-                yield data
+            giveaway = plan.pop(0)
+            del candidates[giveaway.id]
+            user_info = steamgifts_session.user_info
 
-            if steamgifts_session.user_info.points <= points_to_preserve:
+            # checks are made before waiting, so giveaways that will fail anyway don't waste time
+            if user_info.points <= points_to_preserve:
                 yield utils.ModuleData(status=_("Minimum points reached."))
                 wait_enabled = True
 
@@ -154,10 +427,27 @@ async def main() -> AsyncGenerator[utils.ModuleData, None]:
 
                 break
 
-            yield utils.ModuleData(level=(index, len(giveaway)))
+            if giveaway.level > user_info.level or giveaway.points > user_info.points:
+                log.debug(_("Skipping %s because user don't have all the requirements to join."), giveaway.id)
+                continue
+
+            module_data = utils.ModuleData(display=giveaway.id, info=giveaway.name)
+
+            async for data in utils.timed_module_data(math.ceil(join_limiter.reserve()), module_data):
+                yield data
+
+            yield utils.ModuleData(level=(joined_count, joined_count + len(plan) + 1))
+            joined_count += 1
 
             try:
-                if await steamgifts_session.join(giveaway):
+                joined = await steamgifts_session.join(giveaway)
+                discard_giveaway(session_index, giveaway.id)
+                index.add(session_index, giveaway.id, 'joined' if joined else 'failed')
+
+                metrics.steamgifts_points.set(steamgifts_session.user_info.points, str(session_index))
+
+                if joined:
+                    metrics.giveaways_joined.inc(str(session_index))
                     yield utils.ModuleData(
                         display=giveaway.id,
                         status=f"{_('Joined')} {giveaway.name} "
@@ -165,62 +455,65 @@ async def main() -> AsyncGenerator[utils.ModuleData, None]:
                     )
                     wait_enabled = True
                 else:
-                    yield utils.ModuleData(display=giveaway.id, error=_("Unable to join {}."))
-                    await asyncio.sleep(5)
+                    yield utils.ModuleData(display=giveaway.id, error=_("Unable to join {}.").format(giveaway.id))
                     continue
             except aiohttp.ClientError:
                 yield utils.ModuleData(error=_("Check your connection. (server down?)"))
-                await asyncio.sleep(15)
+                await utils.clock.sleep(15)
                 wait_enabled = False
                 break
             except steamgifts.NoGiveawaysError:
+                index.add(session_index, giveaway.id, 'failed')
                 yield utils.ModuleData(error=_("No giveaways available to join."))
-                await asyncio.sleep(15)
                 continue
             except steamgifts.GiveawayEndedError:
+                discard_giveaway(session_index, giveaway.id)
+                index.add(session_index, giveaway.id, 'ended')
                 yield utils.ModuleData(error=_("Giveaway is already ended."))
-                await asyncio.sleep(5)
                 continue
             except login.LoginError:
                 yield utils.ModuleData(error=_("Login is lost. Trying to relogin."))
-                await asyncio.sleep(5)
+                await utils.clock.sleep(5)
                 wait_enabled = False
                 break
             except steamgifts.NoLevelError:
                 yield utils.ModuleData(error=_("User don't have required level to join."))
-                await asyncio.sleep(5)
                 continue
             except steamgifts.NoPointsError:
                 yield utils.ModuleData(error=_("User don't have required points to join."))
-                await asyncio.sleep(5)
 
                 if steamgifts_session.user_info.points <= 2:
                     break
 
                 continue
+    finally:
+        fetch_task.cancel()
+        await asyncio.wait([fetch_task])
+
+        # an unexpected error on fetch ends the listings, but it can't stop the cleanup
+        if not fetch_task.cancelled() and (exception := fetch_task.exception()):
+            log.error(_("Unable to fetch giveaways: %s"), repr(exception))
 
-        if not wait_enabled:
-            await asyncio.sleep(10)
-            return
+        await index.close()
 
+    if joined_count and not wait_enabled:
+        await utils.clock.sleep(10)
+        return
+
+    if not joined_count and not wait_enabled:
+        yield utils.ModuleData(status=_("No giveaways to join."))
+
+    if restart:
+        yield utils.ModuleData(info=_("Restarting due to mode selection"))
         wait_offset = random.randint(
             wait_after_each_strategy,
             wait_after_each_strategy + int(wait_after_each_strategy / 6),
         )
-
-        module_data = utils.ModuleData(info=_("Waiting before next strategy"))
-
-        async for data in utils.timed_module_data(wait_offset, module_data):
-            yield data
-
-        if restart:
-            yield utils.ModuleData(info=_("Restarting due to mode selection"))
-            break
-
-    wait_offset = random.randint(
-        wait_after_full_cycle,
-        wait_after_full_cycle + int(wait_after_full_cycle / 6),
-    )
+    else:
+        wait_offset = random.randint(
+            wait_after_full_cycle,
+            wait_after_full_cycle + int(wait_after_full_cycle / 6),
+        )
 
     module_data = utils.ModuleData(info=_("Waiting for next cycle"))
 
@@ -16,7 +16,6 @@
 # along with this program. If not, see http://www.gnu.org/licenses/.
 #
 import aiohttp
-import asyncio
 import binascii
 import logging
 from typing import AsyncGenerator
@@ -45,9 +44,9 @@ def cached_server_time() -> int:
         return real_time
 
 
-async def main() -> AsyncGenerator[utils.ModuleData, None]:
-    shared_secret = config.parser.get("login", "shared_secret")
-    webapi_session = webapi.SteamWebAPI.get_session(0)
+async def main(session_index: int = 0) -> AsyncGenerator[utils.ModuleData, None]:
+    shared_secret = config.parser.get(config.login_section(session_index), "shared_secret")
+    webapi_session = webapi.SteamWebAPI.get_session(session_index)
 
     try:
         server_time = cached_server_time()
@@ -74,10 +73,10 @@ async def main() -> AsyncGenerator[utils.ModuleData, None]:
         auth_code = universe.generate_steam_code(server_time, shared_secret)
     except (ValueError, binascii.Error):
         yield utils.ModuleData(error=_("The current shared secret is invalid."), info=_("Waiting Changes"))
-        await asyncio.sleep(10)
+        await utils.clock.sleep(10)
     except ProcessLookupError:
         yield utils.ModuleData(status=_("Steam Client is not running"), info=_("Waiting Changes"))
-        await asyncio.sleep(10)
+        await utils.clock.sleep(10)
     else:
         log.info(_("New code in 30 seconds"))
         seconds = 30 - (server_time % 30)
@@ -91,4 +90,4 @@ async def main() -> AsyncGenerator[utils.ModuleData, None]:
                 suppress_logging=True,
             )
 
-            await asyncio.sleep(0.125)
+            await utils.clock.sleep(0.125)
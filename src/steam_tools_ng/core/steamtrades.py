@@ -17,45 +17,179 @@
 #
 import aiohttp
 import asyncio
+import contextlib
 import logging
-import random
-from typing import AsyncGenerator
+import math
+from typing import AsyncGenerator, Any, Dict, List, Tuple
 
 from stlib import plugins, login
 from . import utils
-from .. import i18n, config
+from .. import i18n, config, metrics
 
 _ = i18n.get_translation
 log = logging.getLogger(__name__)
 
+# all trades (and accounts) share the same site, so requests are spaced like before
+rate_limiter = utils.RateLimiter(5, 10)
 
-async def main() -> AsyncGenerator[utils.ModuleData, None]:
+# delay before trying again a trade that failed for a temporary reason
+retry_delay = 300
+
+# session_index -> when each trade can be bumped again
+_schedulers: Dict[int, utils.DeadlineScheduler] = {}
+
+
+def get_scheduler(session_index: int) -> utils.DeadlineScheduler:
+    if session_index not in _schedulers:
+        schedule_file = config.config_file_directory / f'steamtrades-{session_index}.json'
+        _schedulers[session_index] = utils.DeadlineScheduler(schedule_file)
+
+    return _schedulers[session_index]
+
+
+# (session_index, trade_id) -> (fetch time, trade info)
+_trade_info_cache: Dict[Tuple[int, str], Tuple[float, Any]] = {}
+
+
+async def get_trade_info(
+        steamtrades_session: Any,
+        session_index: int,
+        trade_id: str,
+        refresh: bool = False,
+) -> Tuple[Any, bool]:
+    cache_key = (session_index, trade_id)
+    ttl = config.getint("steamtrades", "trade_info_ttl", session_index)
+
+    if not refresh and cache_key in _trade_info_cache:
+        fetch_time, trade_info = _trade_info_cache[cache_key]
+
+        if utils.clock.monotonic() - fetch_time < ttl:
+            return trade_info, True
+
+    _trade_info_cache.pop(cache_key, None)
+    await rate_limiter.wait()
+    trade_info = await steamtrades_session.get_trade_info(trade_id)
+    _trade_info_cache[cache_key] = (utils.clock.monotonic(), trade_info)
+
+    return trade_info, False
+
+
+# bumps a single trade and returns how long (in seconds) it must wait before the next bump
+async def bump_trade(
+        steamtrades: Any,
+        steamtrades_session: Any,
+        session_index: int,
+        trade_id: str,
+        queue: 'asyncio.Queue[utils.ModuleData]',
+) -> int:
+    wait_for_bump = config.getint("steamtrades", "wait_for_bump", session_index)
+    # a trade that can't be bumped even with fresh info isn't fetched or bumped again until its info expires
+    unbumpable_delay = max(config.getint("steamtrades", "trade_info_ttl", session_index), wait_for_bump)
+    refresh = False
+
+    # cached trade info is only refreshed when the bump fails in a way that suggests the trade changed
+    while True:
+        try:
+            trade_info, cached = await get_trade_info(steamtrades_session, session_index, trade_id, refresh)
+        except (IndexError, aiohttp.ClientResponseError):
+            await queue.put(utils.ModuleData(display=trade_id, error=_("Unable to find trade id")))
+            return wait_for_bump
+        except aiohttp.ClientError:
+            await queue.put(utils.ModuleData(display=trade_id, error=_("Check your connection. (server down?)")))
+            return retry_delay
+
+        await queue.put(utils.ModuleData(display=trade_info.id, info=trade_info.title))
+        await rate_limiter.wait()
+        refresh = cached
+
+        try:
+            if await steamtrades_session.bump(trade_info):
+                metrics.trades_bumped.inc(str(session_index))
+                await queue.put(utils.ModuleData(display=trade_id, info=_("Bumped!")))
+                return wait_for_bump
+
+            if cached:
+                continue
+
+            await queue.put(utils.ModuleData(display=trade_id, error=_("Unable to bump")))
+            return retry_delay
+        except aiohttp.ClientResponseError as exception:
+            if exception.status in (404, 410):
+                if cached:
+                    continue
+
+                await queue.put(utils.ModuleData(display=trade_id, error=_("Unable to find trade id")))
+                return unbumpable_delay
+
+            await queue.put(utils.ModuleData(display=trade_id, error=_("Check your connection. (server down?)")))
+            return retry_delay
+        except aiohttp.ClientError:
+            await queue.put(utils.ModuleData(display=trade_id, error=_("Check your connection. (server down?)")))
+            return retry_delay
+        except steamtrades.NoTradesError:
+            if cached:
+                continue
+
+            await queue.put(utils.ModuleData(display=trade_id, error=_("No trades available to bump")))
+            return unbumpable_delay
+        except steamtrades.TradeNotReadyError as exception:
+            log.debug(_("Trade %s will be ready in %s minutes"), trade_id, exception.time_left)
+            return int(exception.time_left * 60)
+        except steamtrades.TradeClosedError as exception:
+            if cached:
+                continue
+
+            await queue.put(utils.ModuleData(error=_("Trade {}({}) is closed").format(exception.title, exception.id)))
+            return unbumpable_delay
+
+
+# wakes up when the first trade is ready to be bumped again
+async def wait_for_next_bump(
+        scheduler: utils.DeadlineScheduler,
+        trades: List[str],
+) -> AsyncGenerator[utils.ModuleData, None]:
+    wait_offset = max(math.ceil(scheduler.next_deadline(trades) - utils.clock.time()), 0)
+    module_data = utils.ModuleData(info=_("Waiting Changes"))
+
+    async for data in utils.timed_module_data(wait_offset, module_data):
+        yield data
+
+
+async def main(session_index: int = 0) -> AsyncGenerator[utils.ModuleData, None]:
     yield utils.ModuleData(status=_("Loading"))
 
     if not plugins.has_plugin("steamtrades"):
         raise ImportError(_("Unable to find Steamtrades plugin"))
 
     steamtrades = plugins.get_plugin("steamtrades")
-    steamtrades_session = steamtrades.Main.get_session(0)
-    trade_ids = config.parser.get("steamtrades", "trade_ids")
-    wait_for_bump = config.parser.getint("steamtrades", "wait_for_bump")
+    steamtrades_session = steamtrades.Main.get_session(session_index)
+    trade_ids = config.get("steamtrades", "trade_ids", session_index)
 
     if not trade_ids:
         yield utils.ModuleData(error=_("No trade ID found"), info=_("Waiting Changes"))
-        await asyncio.sleep(5)
+        await utils.clock.sleep(5)
         return
 
     trades = [trade.strip() for trade in trade_ids.split(',')]
+    scheduler = get_scheduler(session_index)
+    scheduler.retain(trades)
+    ready_trades = [trade for trade in trades if scheduler.is_due(trade)]
+
+    if not ready_trades:
+        async for data in wait_for_next_bump(scheduler, trades):
+            yield data
+
+        return
 
     try:
         await steamtrades_session.do_login()
     except aiohttp.ClientError:
         yield utils.ModuleData(error=_("Check your connection. (server down?)"))
-        await asyncio.sleep(15)
+        await utils.clock.sleep(15)
         return
     except steamtrades.TooFast:
         yield utils.ModuleData(error=_("Unable to login. Trying again in 15 seconds"))
-        await asyncio.sleep(15)
+        await utils.clock.sleep(15)
         return
     except steamtrades.UserSuspended:
         module_data = utils.ModuleData(error=_("User is suspended."))
@@ -66,73 +200,65 @@ async def main() -> AsyncGenerator[utils.ModuleData, None]:
         return
     except steamtrades.PrivateProfile:
         yield utils.ModuleData(error=_("Your profile must be public to use steamtrades."), info=_("Waiting Changes"))
-        await asyncio.sleep(30)
+        await utils.clock.sleep(30)
         return
     except steamtrades.UserLevelError:
         yield utils.ModuleData(error=_("You must be level 1 or greater to use steamtrades."))
-        await asyncio.sleep(30)
+        await utils.clock.sleep(30)
         return
     except login.LoginError:
         yield utils.ModuleData(error=_("User is not logged in. Trying again in 30 seconds"))
-        await asyncio.sleep(30)
+        await utils.clock.sleep(30)
         return
 
-    bumped = False
+    queue: asyncio.Queue[utils.ModuleData] = asyncio.Queue()
+    tasks = {
+        asyncio.create_task(bump_trade(steamtrades, steamtrades_session, session_index, trade, queue)): trade
+        for trade in ready_trades
+    }
+    # an error on a trade doesn't stop the others, except when login is lost
+    wait_task = asyncio.create_task(asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION))
 
-    for trade_id in trades:
-        try:
-            trade_info = await steamtrades_session.get_trade_info(trade_id)
-        except (IndexError, aiohttp.ClientResponseError):
-            yield utils.ModuleData(error=_("Unable to find trade id"))
-            bumped = False
-            break
-        except aiohttp.ClientError:
-            yield utils.ModuleData(error=_("Check your connection. (server down?)"))
-            bumped = False
-            break
+    try:
+        while not wait_task.done() or not queue.empty():
+            queue_task = asyncio.create_task(queue.get())
+            await asyncio.wait([queue_task, wait_task], return_when=asyncio.FIRST_COMPLETED)
 
-        module_data = utils.ModuleData(display=trade_info.id, info=trade_info.title)
-        max_ban_wait = random.randint(5, 15)
+            if queue_task.done():
+                yield queue_task.result()
+            else:
+                queue_task.cancel()
+    finally:
+        wait_task.cancel()
 
-        async for data in utils.timed_module_data(max_ban_wait, module_data):
-            yield data
+        for task in tasks:
+            task.cancel()
 
-        try:
-            if await steamtrades_session.bump(trade_info):
-                yield utils.ModuleData(display=trade_id, info=_("Bumped!"))
-                bumped = True
-            else:
-                yield utils.ModuleData(display=trade_id, error=_("Unable to bump"))
-                await asyncio.sleep(5)
-                continue
-        except aiohttp.ClientError:
-            yield utils.ModuleData(error=_("Check your connection. (server down?)"))
-            await asyncio.sleep(10)
-            bumped = False
-            break
-        except steamtrades.NoTradesError:
-            yield utils.ModuleData(error=_("No trades available to bump"))
-            await asyncio.sleep(15)
-            continue
-        except steamtrades.TradeNotReadyError as exception:
-            wait_for_bump = exception.time_left * 60
-            bumped = True
-        except steamtrades.TradeClosedError as exception:
-            yield utils.ModuleData(error=_("Trade {}({}) is closed").format(exception.title, exception.id))
-            await asyncio.sleep(5)
+        with contextlib.suppress(asyncio.CancelledError):
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    exceptions = []
+
+    # trades that were bumped are scheduled (and saved) even if another one failed
+    for task, trade in tasks.items():
+        if task.cancelled():
             continue
-        except login.LoginError:
-            yield utils.ModuleData(error=_("Login is lost. Trying to relogin."))
-            await asyncio.sleep(5)
-            bumped = False
-            break
 
-    if not bumped:
-        await asyncio.sleep(10)
-        return
+        if exception := task.exception():
+            exceptions.append(exception)
+        else:
+            scheduler.schedule(trade, utils.clock.time() + task.result())
 
-    wait_offset = random.randint(wait_for_bump, wait_for_bump + 400)
-    module_data = utils.ModuleData(info=_("Waiting Changes"))
+    await scheduler.save()
 
-    async for data in utils.timed_module_data(wait_offset, module_data):
+    for exception in exceptions:
+        if isinstance(exception, login.LoginError):
+            yield utils.ModuleData(error=_("Login is lost. Trying to relogin."))
+            await utils.clock.sleep(5)
+            return
+
+    if exceptions:
+        raise exceptions[0]
+
+    async for data in wait_for_next_bump(scheduler, trades):
         yield data
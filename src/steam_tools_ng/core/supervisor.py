@@ -0,0 +1,195 @@
+#!/usr/bin/env python
+#
+# Lara Maia <dev@lara.monster> 2015 ~ 2023
+#
+# The Steam Tools NG is free software: you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, either version 3 of
+# the License, or (at your option) any later version.
+#
+# The Steam Tools NG is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see http://www.gnu.org/licenses/.
+#
+import logging
+import multiprocessing
+import os
+import sys
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from stlib import client
+from . import utils
+from .. import i18n
+
+_ = i18n.get_translation
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class ExecutorInfo:
+    appid: int
+    executor: Optional[client.SteamAPIExecutor] = None
+    # running, paused, stopped or dead
+    state: str = 'stopped'
+    spawned_at: float = 0
+    spawn_count: int = 0
+    spawn_failures: int = 0
+    # seconds of CPU and bytes of resident memory used by the executor processes
+    cpu_time: float = 0
+    memory: int = 0
+
+
+def process_usage(pid: int) -> Tuple[float, int]:
+    # only available on Linux for now
+    if not sys.platform.startswith('linux'):
+        return 0, 0
+
+    try:
+        with open(f'/proc/{pid}/stat', encoding='utf-8') as stat_file:
+            # process name can have spaces, so fields are counted after it
+            stat = stat_file.read().rsplit(')', 1)[1].split()
+
+        with open(f'/proc/{pid}/statm', encoding='utf-8') as statm_file:
+            resident_pages = int(statm_file.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return 0, 0
+
+    cpu_time = (int(stat[11]) + int(stat[12])) / os.sysconf('SC_CLK_TCK')
+    return cpu_time, resident_pages * os.sysconf('SC_PAGE_SIZE')
+
+
+# Owns every SteamAPIExecutor (one process per game) used by card farming
+class ExecutorSupervisor:
+    def __init__(self, spawn_interval: float = 0.5, max_memory: int = 0) -> None:
+        self.executors: Dict[int, ExecutorInfo] = {}
+        self.spawn_limiter = utils.RateLimiter(spawn_interval)
+        # in bytes. 0 means no limit
+        self.max_memory = max_memory
+
+    def running_executors(self) -> List[client.SteamAPIExecutor]:
+        return [
+            info.executor for info in self.executors.values()
+            if info.state == 'running' and info.executor
+        ]
+
+    def spawn_failures(self) -> int:
+        return sum(info.spawn_failures for info in self.executors.values())
+
+    def total_memory(self) -> int:
+        return sum(info.memory for info in self.executors.values() if info.state == 'running')
+
+    async def spawn(self, appid: int) -> client.SteamAPIExecutor:
+        info = self.executors.setdefault(appid, ExecutorInfo(appid))
+
+        if info.state == 'running' and info.executor and self.is_alive(appid):
+            return info.executor
+
+        self.update_usage()
+
+        if self.max_memory and self.total_memory() >= self.max_memory:
+            info.spawn_failures += 1
+            raise MemoryError(_("Executors are using too much memory"))
+
+        await self.spawn_limiter.wait()
+
+        try:
+            info.executor = client.SteamAPIExecutor(appid)
+        except Exception:
+            info.spawn_failures += 1
+            raise
+
+        info.state = 'running'
+        info.spawned_at = utils.clock.monotonic()
+        info.spawn_count += 1
+        log.debug(_("Executor for %s spawned"), appid)
+
+        return info.executor
+
+    def _shutdown(self, info: ExecutorInfo, state: str) -> None:
+        if info.executor:
+            try:
+                info.executor.shutdown()
+            except (RuntimeError, OSError) as exception:
+                log.debug(_("Executor for %s was already down: %s"), info.appid, str(exception))
+
+            info.executor = None
+
+        info.state = state
+
+    def pause(self, appid: int) -> None:
+        if appid in self.executors and self.executors[appid].state == 'running':
+            self._shutdown(self.executors[appid], 'paused')
+
+    async def resume(self, appid: int) -> Optional[client.SteamAPIExecutor]:
+        if appid in self.executors and self.executors[appid].state == 'paused':
+            return await self.spawn(appid)
+
+        return None
+
+    def pause_all(self) -> None:
+        for appid in list(self.executors):
+            self.pause(appid)
+
+    async def resume_all(self) -> None:
+        for appid in list(self.executors):
+            await self.resume(appid)
+
+    def stop(self, appid: int) -> None:
+        if appid in self.executors:
+            self._shutdown(self.executors[appid], 'stopped')
+
+    @staticmethod
+    def _pids(executor: client.SteamAPIExecutor) -> List[int]:
+        # noinspection PyProtectedMember
+        processes = executor._processes or {}
+        return list(processes)
+
+    def is_alive(self, appid: int) -> bool:
+        executor = self.executors[appid].executor
+
+        if not executor or getattr(executor, '_broken', False):
+            return False
+
+        # noinspection PyProtectedMember
+        processes = executor._processes or {}
+        return all(process.is_alive() for process in processes.values())
+
+    # returns games that lost their executor process
+    def health_check(self) -> List[int]:
+        dead = []
+
+        for appid, info in self.executors.items():
+            if info.state == 'running' and not self.is_alive(appid):
+                log.warning(_("Executor for %s died"), appid)
+                self._shutdown(info, 'dead')
+                dead.append(appid)
+
+        return dead
+
+    def update_usage(self) -> None:
+        for info in self.executors.values():
+            if info.state != 'running' or not info.executor:
+                continue
+
+            usage = [process_usage(pid) for pid in self._pids(info.executor)]
+            info.cpu_time = sum(cpu_time for cpu_time, _memory in usage)
+            info.memory = sum(memory for _cpu_time, memory in usage)
+
+    def reap(self) -> None:
+        # joins finished child processes, so they don't stay as zombies
+        multiprocessing.active_children()
+
+        # dead executors are kept, so the game respawns them on the next check
+        for appid in [appid for appid, info in self.executors.items() if info.state == 'stopped']:
+            del self.executors[appid]
+
+    def shutdown(self, *args: object) -> None:
+        for info in self.executors.values():
+            self._shutdown(info, 'stopped')
+
+        self.reap()
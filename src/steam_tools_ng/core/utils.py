@@ -18,12 +18,20 @@
 
 import asyncio
 import codecs
+import heapq
 import inspect
+import json
 import logging
+import random
+import selectors
 import time
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from functools import cache, wraps
-from typing import Tuple, Any, Callable, AsyncGenerator
+from pathlib import Path
+from typing import Tuple, Any, Callable, AsyncGenerator, Awaitable, Dict, Iterable, List, Optional, TypeVar
+
+T = TypeVar('T')
 
 
 @dataclass
@@ -36,6 +44,85 @@ class ModuleData:
     action: str = ''
     raw_data: Any = None
     suppress_logging: bool = False
+    account: int = 0
+
+
+# Time source used by core modules. Replace it with `set_clock` (e.g. to run on virtual time)
+class Clock:
+    def time(self) -> float:
+        return time.time()
+
+    def monotonic(self) -> float:
+        return time.monotonic()
+
+    async def sleep(self, delay: float) -> None:
+        await asyncio.sleep(delay)
+
+
+clock = Clock()
+
+
+def set_clock(clock_: Clock) -> None:
+    global clock
+    clock = clock_
+
+
+class _VirtualSelector(selectors.DefaultSelector):
+    # real time waiting for pending I/O (e.g. a local server) before skipping ahead
+    io_wait = 0.05
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.virtual_time = 0.0
+
+    def select(self, timeout: Optional[float] = None) -> List[Tuple[selectors.SelectorKey, int]]:
+        if timeout is None:
+            # no timers scheduled, only I/O can wake up the loop
+            return super().select(None)
+
+        # the loop's self-pipe is always registered
+        has_io = len(self.get_map()) > 1
+        events = super().select(min(timeout, self.io_wait) if has_io else 0)
+
+        if not events:
+            self.virtual_time += timeout
+
+        return events
+
+
+# Event loop that jumps straight to the next timer instead of waiting for it
+class VirtualEventLoop(asyncio.SelectorEventLoop):
+    def __init__(self) -> None:
+        self._virtual_selector = _VirtualSelector()
+        super().__init__(self._virtual_selector)
+
+    def time(self) -> float:
+        return self._virtual_selector.virtual_time
+
+
+class VirtualClock(Clock):
+    def __init__(self, loop: VirtualEventLoop, start_time: Optional[float] = None) -> None:
+        self.loop = loop
+        self.start_time = time.time() if start_time is None else start_time
+
+    def time(self) -> float:
+        return self.start_time + self.loop.time()
+
+    def monotonic(self) -> float:
+        return self.loop.time()
+
+
+# Runs `main` on virtual time, so hours of module schedules take seconds
+def run_virtual(main: Awaitable[T], start_time: Optional[float] = None) -> T:
+    loop = VirtualEventLoop()
+    previous_clock = clock
+    set_clock(VirtualClock(loop, start_time))
+
+    try:
+        return loop.run_until_complete(main)
+    finally:
+        set_clock(previous_clock)
+        loop.close()
 
 
 async def timed_module_data(wait_offset: int, module_data: ModuleData) -> AsyncGenerator[ModuleData, None]:
@@ -64,19 +151,103 @@ async def timed_module_data(wait_offset: int, module_data: ModuleData) -> AsyncG
         module_data.info = f'{info} ({current_time}{current_time_size})'
 
         yield module_data
-        await asyncio.sleep(1)
+        await clock.sleep(1)
+
+
+# Spaces calls by at least `interval` seconds (plus a random `jitter`)
+class RateLimiter:
+    def __init__(self, interval: float, jitter: float = 0, delay_first: bool = False) -> None:
+        self.interval = interval
+        self.jitter = jitter
+        self._next_time = 0.0
+
+        # first request also waits an interval, instead of going out right away
+        if delay_first:
+            self.reserve()
+
+    # books the next slot and returns how long the caller must wait for it
+    def reserve(self) -> float:
+        now = clock.monotonic()
+        start_time = max(now, self._next_time)
+        self._next_time = start_time + self.interval + random.uniform(0, self.jitter)
+        return start_time - now
+
+    async def wait(self) -> None:
+        await clock.sleep(self.reserve())
+
+
+# Keeps the next eligible time of each key in a heap (saved on `path`, if any)
+class DeadlineScheduler:
+    def __init__(self, path: Optional[Path] = None) -> None:
+        self.path = path
+        self._deadlines: Dict[str, float] = {}
+        self._heap: List[Tuple[float, str]] = []
+
+        if path and path.is_file():
+            try:
+                self._deadlines = json.loads(path.read_text(encoding='utf-8'))
+            except ValueError:
+                logging.getLogger(__name__).warning("Ignoring invalid deadlines file %s", path)
+
+            self._heap = [(deadline, key) for key, deadline in self._deadlines.items()]
+            heapq.heapify(self._heap)
+
+    def deadline(self, key: str) -> float:
+        return self._deadlines.get(key, 0)
+
+    def is_due(self, key: str) -> bool:
+        return self.deadline(key) <= clock.time()
+
+    def schedule(self, key: str, deadline: float) -> None:
+        self._deadlines[key] = deadline
+        heapq.heappush(self._heap, (deadline, key))
+
+    # keys that aren't tracked anymore are removed (and also from the heap when they reach the top)
+    def retain(self, keys: Iterable[str]) -> None:
+        keys = set(keys)
+        self._deadlines = {key: deadline for key, deadline in self._deadlines.items() if key in keys}
+
+    # unknown keys are due now
+    def next_deadline(self, keys: Iterable[str]) -> float:
+        if any(key not in self._deadlines for key in keys):
+            return 0
+
+        # discard stale entries (rescheduled or removed keys)
+        while self._heap and self._deadlines.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+
+        return self._heap[0][0] if self._heap else 0
+
+    async def save(self) -> None:
+        if self.path:
+            await write_file(self.path, json.dumps(self._deadlines))
+
+
+# state files are written by a single thread, so writes to the same file never overlap
+_file_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='stng-files')
+
+
+def _replace_file(path: Path, data: str) -> None:
+    temp_file = path.with_suffix('.tmp')
+    temp_file.write_text(data, encoding='utf-8')
+    temp_file.replace(path)
+
+
+# replaces the file at once, without blocking the event loop on disk latency
+async def write_file(path: Path, data: str) -> None:
+    await asyncio.get_running_loop().run_in_executor(_file_executor, _replace_file, path, data)
 
 
 def time_offset_cache(ttl: int = 60) -> Callable[[Callable[[], int]], Callable[[], int]]:
     def wrapper(function_: Any) -> Callable[[], int]:
         function_ = cache(function_)
-        function_.time_base = time.time()
+        function_.time_base = clock.time()
 
         @wraps(function_)
         def wrapped() -> int:
-            if time.time() >= function_.time_base + ttl:
+            if clock.time() >= function_.time_base + ttl:
                 function_.cache_clear()
-                function_.time_base = time.time()
+                function_.time_base = clock.time()
 
             time_raw = function_()
 
@@ -85,7 +256,7 @@ def time_offset_cache(ttl: int = 60) -> Callable[[Callable[[], int]], Callable[[
                 return time_raw
 
             function_.time_offset = function_.time_base - time_raw
-            return round(time.time() + function_.time_offset)
+            return round(clock.time() + function_.time_offset)
 
         return wrapped
 
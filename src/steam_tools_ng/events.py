@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+#
+# Lara Maia <dev@lara.monster> 2015 ~ 2023
+#
+# The Steam Tools NG is free software: you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, either version 3 of
+# the License, or (at your option) any later version.
+#
+# The Steam Tools NG is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see http://www.gnu.org/licenses/.
+#
+
+# Event bus between core modules and their consumers (gtk, console, metrics, control socket).
+#
+# Frontends publish each ModuleData yielded by a module and go back to the module
+# right away, so a slow consumer doesn't stall it. Consumers can be:
+#
+# listeners: plain callbacks, called on publish. Must be cheap (metrics, control fan-out)
+# subscriptions: async iterators with their own queue and a backpressure policy
+#                for each event type:
+#                LATEST: only the most recent event of each module/account is kept
+#                LOSSLESS: all events are delivered
+#                DROP_OLDEST: up to `maxsize` events are kept, older ones are dropped
+
+import asyncio
+import collections
+import itertools
+import logging
+from dataclasses import dataclass, replace
+from typing import Any, Callable, Deque, Dict, Hashable, Iterable, List, Optional, Set, Type
+
+from . import i18n
+from .core import utils
+
+_ = i18n.get_translation
+log = logging.getLogger(__name__)
+
+LATEST = 'latest'
+LOSSLESS = 'lossless'
+DROP_OLDEST = 'drop_oldest'
+
+# actions that are just progress updates (countdown ticks, progress bars)
+progress_actions = {'', 'check', 'busy', 'update_level'}
+
+
+@dataclass(frozen=True)
+class Event:
+    module: str
+    data: utils.ModuleData
+
+
+class ProgressEvent(Event):
+    pass
+
+
+class ActionEvent(Event):
+    pass
+
+
+class ErrorEvent(Event):
+    pass
+
+
+def new_event(module_name: str, module_data: utils.ModuleData) -> Event:
+    if module_data.error:
+        return ErrorEvent(module_name, module_data)
+
+    if module_data.action in progress_actions:
+        return ProgressEvent(module_name, module_data)
+
+    return ActionEvent(module_name, module_data)
+
+
+class Subscription:
+    def __init__(
+            self,
+            bus: 'EventBus',
+            modules: Iterable[str] = (),
+            policies: Optional[Dict[Type[Event], str]] = None,
+            maxsize: int = 256,
+    ) -> None:
+        self.bus = bus
+        self.modules: Set[str] = set(modules)
+        self.policies = policies or {}
+        self.maxsize = maxsize
+        self.dropped = 0
+
+        self._pending: 'collections.OrderedDict[Hashable, Event]' = collections.OrderedDict()
+        self._bounded: Deque[int] = collections.deque()
+        self._sequence = itertools.count()
+        self._waiter: Optional[asyncio.Future[None]] = None
+
+    def put(self, event: Event) -> None:
+        policy = self.policies.get(type(event), LOSSLESS)
+        key: Hashable
+
+        if policy == LATEST:
+            key = (type(event), event.module, event.data.account)
+            # the replaced event goes to the end of the queue, as it's a new one
+            self._pending.pop(key, None)
+        else:
+            key = next(self._sequence)
+
+            if policy == DROP_OLDEST:
+                self._bounded.append(key)
+
+                while len(self._bounded) > self.maxsize:
+                    if self._pending.pop(self._bounded.popleft(), None):
+                        self.dropped += 1
+
+        self._pending[key] = event
+
+        if self._waiter and not self._waiter.done():
+            self._waiter.set_result(None)
+
+    def drain(self) -> List[Event]:
+        events = list(self._pending.values())
+        self._pending.clear()
+        self._bounded.clear()
+        return events
+
+    async def get(self) -> Event:
+        while not self._pending:
+            self._waiter = asyncio.get_running_loop().create_future()
+
+            try:
+                await self._waiter
+            finally:
+                self._waiter = None
+
+        key, event = self._pending.popitem(last=False)
+
+        if self._bounded and self._bounded[0] == key:
+            self._bounded.popleft()
+
+        return event
+
+    def close(self) -> None:
+        self.bus.unsubscribe(self)
+
+    def __aiter__(self) -> 'Subscription':
+        return self
+
+    async def __anext__(self) -> Event:
+        return await self.get()
+
+
+class EventBus:
+    def __init__(self) -> None:
+        self._listeners: List[Callable[[Event], Any]] = []
+        self._subscriptions: List[Subscription] = []
+
+    def add_listener(self, listener: Callable[[Event], Any]) -> None:
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[Event], Any]) -> None:
+        self._listeners.remove(listener)
+
+    def subscribe(
+            self,
+            modules: Iterable[str] = (),
+            policies: Optional[Dict[Type[Event], str]] = None,
+            maxsize: int = 256,
+    ) -> Subscription:
+        subscription = Subscription(self, modules, policies, maxsize)
+        self._subscriptions.append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        if subscription in self._subscriptions:
+            self._subscriptions.remove(subscription)
+
+    def publish(self, module_name: str, module_data: utils.ModuleData) -> Event:
+        # modules keep changing the same ModuleData after yielding it (see timed_module_data),
+        # so queued events must have their own copy
+        event = new_event(module_name, replace(module_data))
+
+        for listener in self._listeners:
+            try:
+                listener(event)
+            except Exception as exception:
+                # a broken consumer must not stop the module
+                log.exception(_("Event listener %s failed: %s"), listener, str(exception))
+
+        for subscription in self._subscriptions:
+            if not subscription.modules or module_name in subscription.modules:
+                subscription.put(event)
+
+        return event
+
+
+bus = EventBus()
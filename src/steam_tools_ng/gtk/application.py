@@ -27,8 +27,9 @@ from gi.repository import Gio, Gtk
 
 from stlib import universe, login, community, webapi, internals, plugins
 from . import about, settings, window, utils
+from . import internals as gtk_internals
 from . import login as gtk_login
-from .. import config, i18n, core
+from .. import bootstrap, config, events, i18n, core, control, metrics
 
 _ = i18n.get_translation
 log = logging.getLogger(__name__)
@@ -55,6 +56,7 @@ class SteamToolsNG(Gtk.Application):
         self.api_url = config.parser.get("steam", "api_url")
 
         self.old_confirmations: List[community.Confirmation] = []
+        self.control: Optional[control.ControlServer] = None
 
     @property
     def main_window(self) -> Optional[window.Main]:
@@ -77,6 +79,10 @@ class SteamToolsNG(Gtk.Application):
         settings_action.connect("activate", self.on_settings_activate)
         self.add_action(settings_action)
 
+        internals_action = Gio.SimpleAction.new("internals")
+        internals_action.connect("activate", self.on_internals_activate)
+        self.add_action(internals_action)
+
         about_action = Gio.SimpleAction.new("about")
         about_action.connect("activate", self.on_about_activate)
         self.add_action(about_action)
@@ -124,6 +130,7 @@ class SteamToolsNG(Gtk.Application):
         await asyncio.sleep(3)
 
         assert isinstance(self.main_window, window.Main)
+        await bootstrap.instance.init_http(0)
         login_session = await login.Login.new_session(0, api_url=self.api_url)
 
         self.main_window.statusbar.set_warning("steamguard", _("Logging on Steam. Please wait!"))
@@ -180,6 +187,24 @@ class SteamToolsNG(Gtk.Application):
         webapi_session = await webapi.SteamWebAPI.new_session(0, api_key=api_key[0], api_url=self.api_url)
         internals_session = await internals.Internals.new_session(0)
 
+        self.control = control.new_server()
+        await bootstrap.instance.init_metrics()
+        events.bus.add_listener(metrics.on_event)
+
+        if self.control:
+            events.bus.add_listener(self.control.on_event)
+
+            for module_name in ["steamguard", "cardfarming", "steamtrades", "steamgifts"]:
+                status = getattr(self.main_window, f'{module_name}_status')
+                self.control.register_module(module_name, status.play_event, status.set_playing)
+
+            self.control.fetch_coupon_event = self.main_window.fetch_coupon_event
+            self.control.manage_modules = True
+            await self.control.start()
+
+        display_task = asyncio.create_task(self.display_status())
+        display_task.add_done_callback(utils.safe_task_callback)
+
         modules: Dict[str, asyncio.Task[Any]] = {}
 
         while self.main_window.get_realized():
@@ -209,11 +234,11 @@ class SteamToolsNG(Gtk.Application):
                                 await plugin.Main.new_session(0)
 
                         if module_name in ["coupons", "confirmations"]:
-                            task = asyncio.create_task(module())
+                            task = asyncio.create_task(module(), name=module_name)
                         else:
                             self.main_window.set_status(module_name, status=_("Loading"))
                             play_event = self.main_window.get_play_event(module_name)
-                            task = asyncio.create_task(module(play_event))
+                            task = asyncio.create_task(module(play_event), name=module_name)
 
                         log.debug(_("Adding a new callback for %s"), task)
                         task.add_done_callback(utils.safe_task_callback)
@@ -233,34 +258,38 @@ class SteamToolsNG(Gtk.Application):
                 else:
                     await asyncio.sleep(1)
 
+    # status is updated by its own task, so modules don't wait for the UI
+    async def display_status(self) -> None:
+        subscription = events.bus.subscribe(
+            ["steamguard", "cardfarming", "steamtrades", "steamgifts"],
+            {events.ProgressEvent: events.LATEST},
+        )
+
+        try:
+            async for event in subscription:
+                self.main_window.set_status(event.module, event.data)
+        finally:
+            subscription.close()
+
     @while_window_realized
     async def run_steamguard(self, play_event: asyncio.Event) -> None:
         await play_event.wait()
         steamguard = core.steamguard.main()
 
         async for module_data in steamguard:
-            self.main_window.set_status("steamguard", module_data)
+            events.bus.publish("steamguard", module_data)
 
     @while_window_realized
     async def run_cardfarming(self, play_event: asyncio.Event) -> None:
         cardfarming = core.cardfarming.main(self.steamid, play_event)
 
         async for module_data in cardfarming:
-            self.main_window.set_status("cardfarming", module_data)
+            events.bus.publish("cardfarming", module_data)
 
-            if module_data.action == "check":
-                executors = module_data.raw_data
-
-                if not play_event.is_set():
-                    for executor in executors:
-                        executor.shutdown()
-                        # TODO: On Windows processes can't answer too fast due executor workaround
-                        await asyncio.sleep(1)
-
-                    await play_event.wait()
-
-                    for executor in executors:
-                        executor.__init__(executor.appid)
+            if module_data.action == "check" and not play_event.is_set():
+                core.cardfarming.supervisor.pause_all()
+                await play_event.wait()
+                await core.cardfarming.supervisor.resume_all()
 
     @while_window_realized
     async def run_confirmations(self) -> None:
@@ -269,6 +298,7 @@ class SteamToolsNG(Gtk.Application):
 
         async for module_data in confirmations:
             await wait_available()
+            events.bus.publish("confirmations", module_data)
 
             if module_data.error:
                 self.main_window.statusbar.set_critical('confirmations', module_data.error)
@@ -324,6 +354,7 @@ class SteamToolsNG(Gtk.Application):
         coupons = core.coupons.main(self.steamid, fetch_coupon_event, wait_available)
 
         async for module_data in coupons:
+            events.bus.publish("coupons", module_data)
             self.main_window.statusbar.clear("coupons")
             await wait_available()
             await fetch_coupon_event.wait()
@@ -362,7 +393,7 @@ class SteamToolsNG(Gtk.Application):
         steamtrades = core.steamtrades.main()
 
         async for module_data in steamtrades:
-            self.main_window.set_status("steamtrades", module_data)
+            events.bus.publish("steamtrades", module_data)
 
             if module_data.action == "login":
                 await self.do_login(auto=True)
@@ -374,7 +405,7 @@ class SteamToolsNG(Gtk.Application):
         steamgifts = core.steamgifts.main()
 
         async for module_data in steamgifts:
-            self.main_window.set_status("steamgifts", module_data)
+            events.bus.publish("steamgifts", module_data)
 
             if module_data.action == "login":
                 await self.do_login(auto=True)
@@ -384,6 +415,10 @@ class SteamToolsNG(Gtk.Application):
         settings_window = settings.SettingsWindow(self.main_window, self)
         settings_window.present()
 
+    def on_internals_activate(self, *args: Any) -> None:
+        internals_window = gtk_internals.InternalsWindow(self.main_window, self)
+        internals_window.present()
+
     def on_about_activate(self, *args: Any) -> None:
         about_dialog = about.AboutDialog(self.main_window)
         about_dialog.present()
@@ -21,6 +21,8 @@ import contextlib
 from gi.repository import Gtk, GLib
 from typing import Optional
 
+from .. import bootstrap
+
 
 async def async_iterator(
         application: Gtk.Application,
@@ -52,8 +54,7 @@ async def async_iterator_for_the_fifth_dimension(
 
 # FIXME: https://github.com/python/asyncio/pull/465
 def run(application: Optional[Gtk.Application] = None) -> None:
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
+    loop = bootstrap.instance.loop
     main_context = GLib.MainContext.default()
 
     if not application:
@@ -67,3 +68,5 @@ def run(application: Optional[Gtk.Application] = None) -> None:
 
     with contextlib.suppress(KeyboardInterrupt):
         loop.run_forever()
+
+    bootstrap.instance.shutdown()
@@ -23,7 +23,7 @@ from gi.repository import Gtk
 
 from stlib import universe, community
 from . import utils
-from .. import config, i18n
+from .. import config, i18n, metrics
 
 log = logging.getLogger(__name__)
 _ = i18n.get_translation
@@ -162,6 +162,7 @@ class FinalizeWindow(utils.PopupWindowBase):
             )
             await asyncio.sleep(0.5)
 
+        metrics.confirmations_processed.inc(self.raw_action)
         assert isinstance(result, dict)
         return result
 
@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+#
+# Lara Maia <dev@lara.monster> 2015 ~ 2023
+#
+# The Steam Tools NG is free software: you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, either version 3 of
+# the License, or (at your option) any later version.
+#
+# The Steam Tools NG is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see http://www.gnu.org/licenses/.
+#
+import asyncio
+import logging
+import time
+from typing import Any, Optional
+
+from gi.repository import Gtk
+
+from . import utils
+from .. import accounting, i18n, loop_monitor, metrics
+
+log = logging.getLogger(__name__)
+_ = i18n.get_translation
+
+
+# noinspection PyUnusedLocal
+class InternalsWindow(utils.PopupWindowBase):
+    def __init__(self, parent_window: Gtk.Window, application: Gtk.Application) -> None:
+        super().__init__(parent_window, application)
+        self.set_title(_('Internals'))
+        self.set_default_size(700, 400)
+        self.set_resizable(True)
+        self.set_modal(False)
+
+        self.status = utils.SimpleStatus()
+        self.content_grid.attach(self.status, 0, 0, 1, 1)
+
+        self.tasks_tree = utils.SimpleTextTree('_task', '_cpu', '_cpu %', '_wakeups', '_wakeups/s', '_events')
+        self.content_grid.attach(self.tasks_tree, 0, 1, 1, 1)
+
+        self.update_task: Optional[asyncio.Task[None]] = None
+
+        # only updated while it's visible
+        self.connect('show', self.on_show)
+        self.connect('destroy', self.on_close)
+        self.connect('close-request', self.on_close)
+
+    def on_show(self, *args: Any) -> None:
+        if not self.update_task:
+            self.update_task = asyncio.create_task(self.update())
+            self.update_task.add_done_callback(utils.safe_task_callback)
+
+    def on_close(self, *args: Any) -> None:
+        if self.update_task:
+            self.update_task.cancel()
+            self.update_task = None
+
+    async def update(self) -> None:
+        while True:
+            elapsed = max(time.monotonic() - accounting.start_time, 1)
+            events = metrics.events_by_module()
+            self.status.info(loop_monitor.monitor.short_summary())
+            self.tasks_tree.clear()
+
+            sorted_accounts = sorted(accounting.accounts.items(), key=lambda item: item[1].cpu_time, reverse=True)
+
+            for name, account in sorted_accounts:
+                item = self.tasks_tree.new_item(
+                    name,
+                    f'{account.cpu_time:.2f}s',
+                    f'{account.cpu_time / elapsed * 100:.1f}',
+                    str(account.wakeups),
+                    f'{account.wakeups / elapsed:.2f}',
+                    str(int(events[name])) if name in events else '',
+                )
+                self.tasks_tree.append_row(item)
+
+            await asyncio.sleep(2)
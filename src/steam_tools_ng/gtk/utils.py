@@ -30,7 +30,7 @@ from gi.repository import Gtk, Gdk, Gio, GObject
 
 from stlib import internals
 from . import async_gtk
-from .. import i18n, config
+from .. import i18n, config, http_stats, loop_monitor
 
 log = logging.getLogger(__name__)
 _ = i18n.get_translation
@@ -119,6 +119,10 @@ class StatusBar(Gtk.Grid):
         self._status.set_hexpand(True)
         self.attach(self._status, 0, 1, 1, 1)
 
+        self._http_status = Gtk.Label()
+        self._http_status.set_halign(Gtk.Align.END)
+        self.attach(self._http_status, 1, 1, 1, 1)
+
         self.messages = {}
         for module in config.plugins.keys():
             self.messages[module] = {"warning": "", "critical": ""}
@@ -127,6 +131,22 @@ class StatusBar(Gtk.Grid):
         task = loop.create_task(self.__loop_messages())
         task.add_done_callback(safe_task_callback)
 
+        http_task = loop.create_task(self.__loop_http_stats())
+        http_task.add_done_callback(safe_task_callback)
+
+    async def __loop_http_stats(self) -> None:
+        while True:
+            if http_stats.stats.endpoints:
+                self._http_status.set_text(
+                    f"HTTP: {http_stats.stats.short_summary()} | {loop_monitor.monitor.short_summary()}"
+                )
+                self._http_status.set_tooltip_markup(
+                    f"<tt>{html.escape(http_stats.stats.summary(10))}\n\n"
+                    f"{html.escape(loop_monitor.monitor.summary(10))}</tt>"
+                )
+
+            await asyncio.sleep(5)
+
     async def __loop_messages(self) -> None:
         while True:
             # when query is empty
@@ -154,7 +174,7 @@ class StatusBar(Gtk.Grid):
 
 
 class SimpleTextTreeItem(GObject.Object):
-    def __init__(self, *args: str, headers: Tuple[str], **kwargs) -> None:
+    def __init__(self, *args: str, headers: Tuple[str, ...], **kwargs: Any) -> None:
         for name, value in kwargs.items():
             setattr(self, name, value)
 
@@ -301,10 +321,10 @@ class SimpleTextTree(Gtk.Grid):
 
         return None
 
-    def new_item(self, *data: List[str], **kwargs) -> SimpleTextTreeItem:
+    def new_item(self, *data: str, **kwargs: Any) -> SimpleTextTreeItem:
         return SimpleTextTreeItem(*data, headers=self.headers, **kwargs)
 
-    def append_row(self, row: Gtk.TreeListRow) -> None:
+    def append_row(self, row: SimpleTextTreeItem) -> None:
         self._store.append(row)
 
     def remove_row(self, row: Gtk.TreeListRow) -> bool:
@@ -514,6 +534,9 @@ class Status(Gtk.Frame):
             button.set_icon_name("media-playback-start")
             self.play_event.clear()
 
+    def set_playing(self, value: bool) -> None:
+        self._play_pause_button.set_active(value)
+
     def set_pausable(self, value: bool = True) -> None:
         if value:
             self._play_pause_button.set_visible(True)
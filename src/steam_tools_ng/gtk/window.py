@@ -28,7 +28,7 @@ import stlib
 from stlib import login, plugins
 from . import confirmation, utils, coupon, authenticator
 from .login import LoginWindow
-from .. import config, i18n, core
+from .. import bootstrap, config, i18n, core
 
 _ = i18n.get_translation
 log = logging.getLogger(__name__)
@@ -73,6 +73,7 @@ class Main(Gtk.ApplicationWindow):
 
         menu = Gio.Menu()
         menu.append(_("Settings"), "app.settings")
+        menu.append(_("Internals"), "app.internals")
         menu.append(_("About"), "app.about")
         menu.append(_("Exit"), "app.exit")
 
@@ -885,8 +886,7 @@ class Main(Gtk.ApplicationWindow):
 
         config.config_file.unlink(missing_ok=True)
 
-        config.parser.clear()
-        config.init()
+        bootstrap.instance.reload_config()
 
         def reset_callback() -> None:
             login_window.destroy()
@@ -15,7 +15,6 @@
 # You should have received a copy of the GNU General Public License
 # along with this program. If not, see http://www.gnu.org/licenses/.
 #
-import asyncio
 import os
 import sys
 
@@ -37,8 +36,8 @@ from pathlib import Path
 from subprocess import call
 from typing import Optional, Any
 
-from steam_tools_ng import config, i18n
-from steam_tools_ng.gtk import application, about
+from steam_tools_ng import bootstrap, config, i18n
+from steam_tools_ng.gtk import about
 from steam_tools_ng.gtk import async_gtk, utils
 from gi.repository import Gtk
 
@@ -55,7 +54,7 @@ class GraphicalArgParser(argparse.ArgumentParser):
 def main() -> None:
     freeze_support()
     try:
-        config.init()
+        bootstrap.instance.init_config()
     except configparser.Error as exception:
         utils.fatal_error_dialog(exception, [])
         sys.exit(1)
@@ -102,8 +101,8 @@ def main() -> None:
     if console_params.version:
         about_dialog = about.AboutDialog(parent_window=None)
         about_dialog.present()
-        about_dialog.connect("close-request", lambda *args: asyncio.get_event_loop().stop())
-        about_dialog.connect("destroy", lambda *args: asyncio.get_event_loop().stop())
+        about_dialog.connect("close-request", lambda *args: bootstrap.instance.loop.stop())
+        about_dialog.connect("destroy", lambda *args: bootstrap.instance.loop.stop())
 
         if not Gtk.Application.get_default():
             async_gtk.run()
@@ -119,7 +118,7 @@ def main() -> None:
         sys.exit(0)
 
     try:
-        config.init_logger()
+        bootstrap.instance.init_logger()
     except configparser.Error as exception:
         utils.fatal_error_dialog(exception, [])
         sys.exit(1)
@@ -145,6 +144,9 @@ def main() -> None:
         log.critical("Use 'steam-tools-ng' for the command line interface.")
         sys.exit(1)
 
+    # main window (and all modules) is only loaded when it will be used
+    from steam_tools_ng.gtk import application
+
     app = application.SteamToolsNG()
     async_gtk.run(app)
 
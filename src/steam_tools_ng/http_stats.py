@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+#
+# Lara Maia <dev@lara.monster> 2015 ~ 2023
+#
+# The Steam Tools NG is free software: you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, either version 3 of
+# the License, or (at your option) any later version.
+#
+# The Steam Tools NG is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see http://www.gnu.org/licenses/.
+#
+
+# Per endpoint request counters and latency histograms, collected with aiohttp tracing
+# on every http session created by bootstrap.
+
+import asyncio
+import bisect
+import logging
+import time
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+from typing import Any, Dict, List, Tuple, TYPE_CHECKING
+
+from . import i18n
+
+if TYPE_CHECKING:
+    import aiohttp
+
+_ = i18n.get_translation
+log = logging.getLogger(__name__)
+
+# upper bounds (in seconds) of each latency bucket. The last one catches everything else
+latency_buckets = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, float('inf'))
+
+
+def _is_id(segment: str) -> bool:
+    # api versions (v1, v2...) aren't ids
+    if segment[:1] == 'v' and segment[1:].isdigit():
+        return False
+
+    return any(char.isdigit() for char in segment)
+
+
+# ids (steamids, appids, trade ids...) would create a new endpoint for each request
+def endpoint(host: str, path: str) -> Tuple[str, str]:
+    segments = ['{id}' if _is_id(segment) else segment for segment in path.split('/')]
+    return host, '/'.join(segments[:4])
+
+
+@dataclass
+class EndpointStats:
+    requests: int = 0
+    errors: int = 0
+    bytes: int = 0
+    latency_sum: float = 0.0
+    latency_max: float = 0.0
+    statuses: Dict[int, int] = field(default_factory=dict)
+    buckets: List[int] = field(default_factory=lambda: [0] * len(latency_buckets))
+
+    def record(self, latency: float) -> None:
+        self.latency_sum += latency
+        self.latency_max = max(self.latency_max, latency)
+        self.buckets[bisect.bisect_left(latency_buckets, latency)] += 1
+
+    # upper bound of the bucket where the quantile is
+    def percentile(self, quantile: float) -> float:
+        total = sum(self.buckets)
+
+        if not total:
+            return 0.0
+
+        target = quantile * total
+        count = 0
+
+        for bound, bucket_count in zip(latency_buckets, self.buckets):
+            count += bucket_count
+
+            if count >= target:
+                return min(bound, self.latency_max)
+
+        return self.latency_max
+
+    def merge(self, other: 'EndpointStats') -> None:
+        self.requests += other.requests
+        self.errors += other.errors
+        self.bytes += other.bytes
+        self.latency_sum += other.latency_sum
+        self.latency_max = max(self.latency_max, other.latency_max)
+
+        for status, count in other.statuses.items():
+            self.statuses[status] = self.statuses.get(status, 0) + count
+
+        self.buckets = [count + other_count for count, other_count in zip(self.buckets, other.buckets)]
+
+
+class HttpStats:
+    def __init__(self) -> None:
+        self.endpoints: Dict[Tuple[str, str], EndpointStats] = {}
+        self.start_time = time.monotonic()
+
+    def get(self, host: str, path: str) -> EndpointStats:
+        key = endpoint(host, path)
+
+        if key not in self.endpoints:
+            self.endpoints[key] = EndpointStats()
+
+        return self.endpoints[key]
+
+    def totals(self) -> EndpointStats:
+        totals = EndpointStats()
+
+        for endpoint_stats in self.endpoints.values():
+            totals.merge(endpoint_stats)
+
+        return totals
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            f'{host}{path}': {
+                'requests': endpoint_stats.requests,
+                'errors': endpoint_stats.errors,
+                'bytes': endpoint_stats.bytes,
+                'statuses': endpoint_stats.statuses,
+                'p50': endpoint_stats.percentile(0.5),
+                'p95': endpoint_stats.percentile(0.95),
+                'max': endpoint_stats.latency_max,
+            }
+            for (host, path), endpoint_stats in self.endpoints.items()
+        }
+
+    def short_summary(self) -> str:
+        totals = self.totals()
+
+        return _("{} requests, {} errors, p50 {:.0f}ms, p95 {:.0f}ms").format(
+            totals.requests,
+            totals.errors + sum(count for status, count in totals.statuses.items() if status >= 400),
+            totals.percentile(0.5) * 1000,
+            totals.percentile(0.95) * 1000,
+        )
+
+    def summary(self, limit: int = 25) -> str:
+        minutes = max((time.monotonic() - self.start_time) / 60, 1 / 60)
+        lines = [f"{'endpoint':<80} {'reqs':>6} {'/min':>6} {'err':>4} {'KiB':>8} {'p50':>7} {'p95':>7} {'max':>7}"]
+        endpoints = sorted(self.endpoints.items(), key=lambda item: item[1].requests, reverse=True)
+
+        for (host, path), endpoint_stats in endpoints[:limit]:
+            errors = endpoint_stats.errors + sum(
+                count for status, count in endpoint_stats.statuses.items() if status >= 400
+            )
+
+            lines.append(
+                f"{(host + path)[:80]:<80} {endpoint_stats.requests:>6} "
+                f"{endpoint_stats.requests / minutes:>6.1f} {errors:>4} {endpoint_stats.bytes / 1024:>8.1f} "
+                f"{endpoint_stats.percentile(0.5) * 1000:>5.0f}ms {endpoint_stats.percentile(0.95) * 1000:>5.0f}ms "
+                f"{endpoint_stats.latency_max * 1000:>5.0f}ms"
+            )
+
+        return '\n'.join(lines)
+
+    async def _on_request_start(self, session: Any, context: SimpleNamespace, params: Any) -> None:
+        context.endpoint = self.get(params.url.host or '', params.url.path)
+        context.start_time = time.perf_counter()
+
+    async def _on_request_end(self, session: Any, context: SimpleNamespace, params: Any) -> None:
+        endpoint_stats = context.endpoint
+        endpoint_stats.requests += 1
+        endpoint_stats.statuses[params.response.status] = endpoint_stats.statuses.get(params.response.status, 0) + 1
+        endpoint_stats.record(time.perf_counter() - context.start_time)
+
+    async def _on_request_exception(self, session: Any, context: SimpleNamespace, params: Any) -> None:
+        endpoint_stats = context.endpoint
+        endpoint_stats.requests += 1
+        endpoint_stats.errors += 1
+        endpoint_stats.record(time.perf_counter() - context.start_time)
+
+    async def _on_response_chunk_received(self, session: Any, context: SimpleNamespace, params: Any) -> None:
+        # chunks are received after request end, so endpoint is already known
+        if hasattr(context, 'endpoint'):
+            context.endpoint.bytes += len(params.chunk)
+
+    def trace_config(self) -> 'aiohttp.TraceConfig':
+        import aiohttp
+
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_start.append(self._on_request_start)
+        trace_config.on_request_end.append(self._on_request_end)
+        trace_config.on_request_exception.append(self._on_request_exception)
+        trace_config.on_response_chunk_received.append(self._on_response_chunk_received)
+        return trace_config
+
+    async def log_periodically(self, interval: int) -> None:
+        while True:
+            await asyncio.sleep(interval)
+
+            if self.endpoints:
+                log.info(_("HTTP stats: %s"), self.short_summary())
+                log.debug("\n%s", self.summary())
+
+
+stats = HttpStats()
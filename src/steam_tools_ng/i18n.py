@@ -18,22 +18,29 @@
 
 # Never use VHL methods in this file to avoid infinite recursion:
 # [method>get_translation->vhlm->get_translation->vhlm] IT'S NOT A BUG!
-import configparser
+import functools
 import gettext
 from importlib import resources
+from typing import Optional
 
-from . import config
+# set by config when it's loaded (or when language is changed)
+language: Optional[str] = None
+
+
+def set_language(language_: str) -> None:
+    global language
+    language = language_
+
+
+@functools.lru_cache(maxsize=None)
+def _translation(language_: str) -> gettext.NullTranslations:
+    with resources.as_file(resources.files('steam_tools_ng')) as path:
+        return gettext.translation("steam-tools-ng", path / 'locale', languages=[language_], fallback=True)
 
 
 def get_translation(text: str) -> str:
-    try:
-        language = config.parser.get('general', 'language')
-    except configparser.NoSectionError:
+    if not language:
         # assume that config is not fully loaded yet
         return text
 
-    with resources.as_file(resources.files('steam_tools_ng')) as path:
-        translation = gettext.translation("steam-tools-ng", path / 'locale', languages=[language], fallback=True)
-        translated_text = translation.gettext(text)
-
-    return translated_text
+    return _translation(language).gettext(text)
@@ -0,0 +1,259 @@
+#!/usr/bin/env python
+#
+# Lara Maia <dev@lara.monster> 2015 ~ 2023
+#
+# The Steam Tools NG is free software: you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, either version 3 of
+# the License, or (at your option) any later version.
+#
+# The Steam Tools NG is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see http://www.gnu.org/licenses/.
+#
+
+# Event loop health monitor.
+#
+# A probe task measures how late the loop wakes it up (scheduling lag). A watchdog
+# thread wakes up when the probe is due and, if the loop didn't run it yet, takes the
+# stack of the blocked loop thread, so each stall is attributed to the task and
+# module that was running at that moment. Nothing is added to the callbacks path.
+
+import asyncio
+import bisect
+import collections
+import logging
+import sys
+import threading
+import time
+import traceback
+from dataclasses import dataclass, field
+from types import FrameType
+from typing import Deque, Dict, List, Optional, Tuple
+
+from . import i18n
+
+_ = i18n.get_translation
+log = logging.getLogger(__name__)
+
+# upper bounds (in seconds) of each lag bucket. The last one catches everything else
+lag_buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float('inf'))
+
+# task names used by the frontends to run each module
+known_modules = ('steamguard', 'confirmations', 'cardfarming', 'fakerun', 'coupons', 'steamtrades', 'steamgifts')
+
+
+@dataclass
+class Stall:
+    time: float
+    duration: float
+    module: str
+    task: str
+    location: str
+    stack: List[str] = field(default_factory=list)
+
+
+@dataclass
+class StallStats:
+    count: int = 0
+    total: float = 0.0
+    max: float = 0.0
+
+
+def _frame_module(frame: FrameType) -> Optional[str]:
+    module_name = frame.f_globals.get('__name__', '')
+
+    if not module_name.startswith('steam_tools_ng.'):
+        return None
+
+    parts = module_name.split('.')
+
+    # core.cardfarming -> cardfarming, gtk.window -> gtk
+    if parts[1] == 'core' and len(parts) > 2:
+        return str(parts[2])
+
+    return str(parts[1])
+
+
+# can be called from any thread. No locks are needed, it's just a read from a dict
+def current_task_name(loop: asyncio.AbstractEventLoop) -> str:
+    current_tasks = getattr(asyncio.tasks, '_current_tasks', {})
+
+    if task := current_tasks.get(loop):
+        return str(task.get_name())
+
+    return ''
+
+
+def _frame_location(frame: FrameType) -> str:
+    return f'{frame.f_code.co_filename}:{frame.f_lineno} ({frame.f_code.co_name})'
+
+
+# innermost frame from the application is the offending one
+def attribute(frame: Optional[FrameType], task_name: str = '') -> Tuple[str, str]:
+    module = task_name if task_name in known_modules else ''
+    location = _frame_location(frame) if frame else ''
+    app_location = ''
+
+    while frame:
+        if not app_location and (frame_module := _frame_module(frame)):
+            app_location = _frame_location(frame)
+
+            if not module:
+                module = frame_module
+
+        frame = frame.f_back
+
+    return module or 'unknown', app_location or location
+
+
+class LoopMonitor:
+    def __init__(self, interval: float = 0.5, threshold: float = 0.1, window: int = 600) -> None:
+        self.interval = interval
+        self.threshold = threshold
+
+        self.lag_count = 0
+        self.lag_sum = 0.0
+        self.lag_max = 0.0
+        self.buckets = [0] * len(lag_buckets)
+        # last samples (5 minutes by default), for percentiles of current loop health
+        self.recent: Deque[float] = collections.deque(maxlen=window)
+        self.stalls: Dict[str, StallStats] = {}
+        self.recent_stalls: Deque[Stall] = collections.deque(maxlen=50)
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id = 0
+        self._beat = 0.0
+        self._capture: Optional[Tuple[float, str, str, str, List[str]]] = None
+        self._known_sites: Dict[Tuple[str, str], int] = {}
+        self._task: Optional['asyncio.Task[None]'] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None
+
+    def record(self, lag: float) -> None:
+        self.lag_count += 1
+        self.lag_sum += lag
+        self.lag_max = max(self.lag_max, lag)
+        self.buckets[bisect.bisect_left(lag_buckets, lag)] += 1
+        self.recent.append(lag)
+
+    def percentile(self, quantile: float) -> float:
+        if not self.recent:
+            return 0.0
+
+        samples = sorted(self.recent)
+        return samples[min(int(quantile * len(samples)), len(samples) - 1)]
+
+    def _watch(self) -> None:
+        while not self._stop_event.is_set():
+            beat = self._beat
+            wait = beat + self.interval + self.threshold - time.monotonic()
+
+            if wait > 0:
+                self._stop_event.wait(wait)
+                continue
+
+            # probe is late, so the loop thread is blocked right now
+            if not self._capture or self._capture[0] != beat:
+                self._capture = (beat, *self._take_stack())
+
+            self._stop_event.wait(self.threshold)
+
+    def _take_stack(self) -> Tuple[str, str, str, List[str]]:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        task_name = current_task_name(self._loop) if self._loop else ''
+        module, location = attribute(frame, task_name)
+        stack = traceback.format_stack(frame) if frame else []
+        return module, task_name, location, stack
+
+    def _on_stall(self, lag: float) -> None:
+        if self._capture and self._capture[0] == self._beat:
+            _beat, module, task_name, location, stack = self._capture
+        else:
+            # shorter than the watchdog resolution
+            module, task_name, location, stack = 'unknown', '', '', []
+
+        stats = self.stalls.setdefault(module, StallStats())
+        stats.count += 1
+        stats.total += lag
+        stats.max = max(stats.max, lag)
+        self.recent_stalls.append(Stall(time.time(), lag, module, task_name, location, stack))
+
+        site = (module, location)
+        self._known_sites[site] = self._known_sites.get(site, 0) + 1
+
+        # full stack is only logged on the first stall of each site
+        if stack and self._known_sites[site] == 1:
+            log.warning(
+                _("Event loop blocked for %.3fs by %s (task %s) at %s\n%s"),
+                lag, module, task_name or '-', location, ''.join(stack),
+            )
+        else:
+            log.debug(_("Event loop blocked for %.3fs by %s (task %s) at %s"), lag, module, task_name or '-', location)
+
+    async def _probe(self) -> None:
+        while True:
+            self._beat = time.monotonic()
+            await asyncio.sleep(self.interval)
+            lag = max(time.monotonic() - self._beat - self.interval, 0.0)
+            self.record(lag)
+
+            if lag >= self.threshold:
+                self._on_stall(lag)
+
+    def start(self) -> None:
+        if self._task:
+            return
+
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._beat = time.monotonic()
+        self._stop_event.clear()
+        self._task = asyncio.create_task(self._probe(), name='loop_monitor')
+        self._watchdog = threading.Thread(target=self._watch, name='loop_monitor', daemon=True)
+        self._watchdog.start()
+
+    def stop(self) -> None:
+        self._stop_event.set()
+
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+        self._watchdog = None
+
+    def short_summary(self) -> str:
+        return _("loop lag p50 {:.0f}ms, p99 {:.0f}ms, {} stalls").format(
+            self.percentile(0.5) * 1000,
+            self.percentile(0.99) * 1000,
+            sum(stats.count for stats in self.stalls.values()),
+        )
+
+    def summary(self, limit: int = 10) -> str:
+        lines = [f"{'module':<16} {'stalls':>6} {'total':>8} {'max':>8}"]
+        stalls = sorted(self.stalls.items(), key=lambda item: item[1].total, reverse=True)
+
+        for module, stats in stalls:
+            lines.append(f"{module:<16} {stats.count:>6} {stats.total:>7.2f}s {stats.max * 1000:>6.0f}ms")
+
+        if self.recent_stalls:
+            lines.append('')
+
+            for stall in list(self.recent_stalls)[-limit:]:
+                lines.append(
+                    f"{time.strftime('%H:%M:%S', time.localtime(stall.time))} "
+                    f"{stall.duration * 1000:>6.0f}ms {stall.module:<14} {stall.location}"
+                )
+
+        return '\n'.join(lines)
+
+
+monitor = LoopMonitor()
@@ -0,0 +1,237 @@
+#!/usr/bin/env python
+#
+# Lara Maia <dev@lara.monster> 2015 ~ 2023
+#
+# The Steam Tools NG is free software: you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, either version 3 of
+# the License, or (at your option) any later version.
+#
+# The Steam Tools NG is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see http://www.gnu.org/licenses/.
+#
+
+# Memory diagnostics based on tracemalloc.
+#
+# Snapshots are compared with the first one (baseline) and with the previous
+# one, and the allocation sites that grew are grouped by the module that made
+# them (innermost frame from steam_tools_ng, or stlib).
+#
+# tracemalloc slows down every allocation, so it's only running while requested
+# (--memory-report, logger/memory_report_interval or memory_start on control socket).
+
+import asyncio
+import logging
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+from . import i18n
+
+_ = i18n.get_translation
+log = logging.getLogger(__name__)
+
+_filters = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, __file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>'),
+]
+
+
+@dataclass
+class Site:
+    location: str
+    size_diff: int
+    count_diff: int
+    size: int
+
+
+@dataclass
+class ModuleGrowth:
+    size_diff: int = 0
+    count_diff: int = 0
+    sites: List[Site] = field(default_factory=list)
+
+
+def _module_from_path(filename: str) -> Optional[str]:
+    path = filename.replace('\\', '/')
+
+    if '/steam_tools_ng/' in path:
+        parts = path.rsplit('/steam_tools_ng/', 1)[1].split('/')
+
+        # core/cardfarming.py -> cardfarming, gtk/window.py -> gtk
+        if parts[0] == 'core' and len(parts) > 1:
+            return parts[1].removesuffix('.py')
+
+        return parts[0].removesuffix('.py')
+
+    if '/stlib/' in path or '/stlib-plugins/' in path:
+        return 'stlib'
+
+    return None
+
+
+def attribute(traceback: tracemalloc.Traceback) -> Tuple[str, str]:
+    # most recent frame first
+    for frame in reversed(traceback):
+        if module := _module_from_path(frame.filename):
+            return module, f'{frame.filename}:{frame.lineno}'
+
+    frame = traceback[-1]
+    return 'other', f'{frame.filename}:{frame.lineno}'
+
+
+def growth_by_module(
+        snapshot: tracemalloc.Snapshot,
+        old_snapshot: tracemalloc.Snapshot,
+        sites_per_module: int = 5,
+) -> Dict[str, ModuleGrowth]:
+    modules: Dict[str, ModuleGrowth] = {}
+
+    for stat in snapshot.compare_to(old_snapshot, 'traceback'):
+        if stat.size_diff <= 0:
+            continue
+
+        module, location = attribute(stat.traceback)
+        growth = modules.setdefault(module, ModuleGrowth())
+        growth.size_diff += stat.size_diff
+        growth.count_diff += stat.count_diff
+        growth.sites.append(Site(location, stat.size_diff, stat.count_diff, stat.size))
+
+    for growth in modules.values():
+        # the same line can be reached from different tracebacks
+        sites: Dict[str, Site] = {}
+
+        for site in growth.sites:
+            if site.location in sites:
+                sites[site.location].size_diff += site.size_diff
+                sites[site.location].count_diff += site.count_diff
+                sites[site.location].size += site.size
+            else:
+                sites[site.location] = site
+
+        growth.sites = sorted(sites.values(), key=lambda site_: site_.size_diff, reverse=True)[:sites_per_module]
+
+    return dict(sorted(modules.items(), key=lambda item: item[1].size_diff, reverse=True))
+
+
+class MemoryTracker:
+    def __init__(self) -> None:
+        self.baseline: Optional[tracemalloc.Snapshot] = None
+        self.previous: Optional[tracemalloc.Snapshot] = None
+        self.baseline_time = 0.0
+        self.previous_time = 0.0
+        self._started_tracing = False
+        self._task: Optional['asyncio.Task[None]'] = None
+
+    @property
+    def is_running(self) -> bool:
+        return self.baseline is not None
+
+    def take_snapshot(self) -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces(_filters)
+
+    def start(self, nframes: int = 25, interval: int = 0) -> None:
+        if self.baseline:
+            raise RuntimeError(_("Memory tracking is already running"))
+
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(nframes)
+            self._started_tracing = True
+
+        self.baseline = self.previous = self.take_snapshot()
+        self.baseline_time = self.previous_time = time.time()
+        log.info(_("Memory tracking started (%s frames)"), tracemalloc.get_traceback_limit())
+
+        if interval:
+            self._task = asyncio.create_task(self._report_periodically(interval))
+
+    def stop(self) -> None:
+        if not self.baseline:
+            raise RuntimeError(_("Memory tracking is not running"))
+
+        if self._task:
+            self._task.cancel()
+            self._task = None
+
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+        self.baseline = self.previous = None
+        log.info(_("Memory tracking stopped"))
+
+    def report(self, limit: int = 10) -> Dict[str, Any]:
+        if not self.baseline or not self.previous:
+            raise RuntimeError(_("Memory tracking is not running"))
+
+        snapshot = self.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+
+        result = {
+            'traced': current,
+            'peak': peak,
+            'since_start': self._as_dict(growth_by_module(snapshot, self.baseline), limit),
+            'since_previous': self._as_dict(growth_by_module(snapshot, self.previous), limit),
+            'start_time': self.baseline_time,
+            'previous_time': self.previous_time,
+        }
+
+        self.previous = snapshot
+        self.previous_time = time.time()
+        return result
+
+    @staticmethod
+    def _as_dict(modules: Dict[str, ModuleGrowth], limit: int) -> Dict[str, Any]:
+        return {
+            module: {
+                'size_diff': growth.size_diff,
+                'count_diff': growth.count_diff,
+                'sites': [site.__dict__ for site in growth.sites],
+            }
+            for module, growth in list(modules.items())[:limit]
+        }
+
+    def format_report(self, limit: int = 10) -> str:
+        report = self.report(limit)
+        lines = [
+            _("Traced memory: {:.1f} MiB (peak {:.1f} MiB)").format(
+                report['traced'] / 2 ** 20,
+                report['peak'] / 2 ** 20,
+            )
+        ]
+
+        for key, title, since in (
+                ('since_start', _("Growth since tracking started"), report['start_time']),
+                ('since_previous', _("Growth since previous report"), report['previous_time']),
+        ):
+            lines.append('')
+            lines.append(f"{title} ({time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(since))})")
+
+            for module, growth in report[key].items():
+                lines.append(
+                    f"  {module:<16} {growth['size_diff'] / 1024:>+10.1f} KiB {growth['count_diff']:>+8} blocks"
+                )
+
+                for site in growth['sites']:
+                    lines.append(
+                        f"      {site['size_diff'] / 1024:>+10.1f} KiB {site['count_diff']:>+8} {site['location']}"
+                    )
+
+        return '\n'.join(lines)
+
+    async def _report_periodically(self, interval: int) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            log.info(_("Memory report:\n%s"), self.format_report())
+
+
+tracker = MemoryTracker()
@@ -0,0 +1,356 @@
+#!/usr/bin/env python
+#
+# Lara Maia <dev@lara.monster> 2015 ~ 2023
+#
+# The Steam Tools NG is free software: you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, either version 3 of
+# the License, or (at your option) any later version.
+#
+# The Steam Tools NG is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see http://www.gnu.org/licenses/.
+#
+
+# Prometheus / OpenMetrics exporter.
+#
+# Updating a metric is just a dict update, so modules can do it on every event.
+# Text is only rendered when /metrics is scraped or the textfile is written.
+
+import asyncio
+import collections
+import contextlib
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Callable, Deque, Dict, Iterator, List, Optional, Tuple, TYPE_CHECKING
+
+from . import accounting, config, http_stats, i18n, loop_monitor
+from .core import utils
+
+if TYPE_CHECKING:
+    from aiohttp import web
+    from . import events
+
+_ = i18n.get_translation
+log = logging.getLogger(__name__)
+
+OPENMETRICS_CONTENT_TYPE = 'application/openmetrics-text; version=1.0.0; charset=utf-8'
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"')
+
+
+class Counter:
+    kind = 'counter'
+    suffix = '_total'
+
+    def __init__(self, name: str, help_: str, labels: Tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.help = help_
+        self.labels = labels
+        self.values: Dict[Tuple[str, ...], float] = {} if labels else {(): 0}
+        registry.append(self)
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        self.values[label_values] = self.values.get(label_values, 0) + amount
+
+    def render(self, openmetrics: bool) -> Iterator[str]:
+        # prometheus text format has no metric families, so counters are named after the sample
+        family = self.name if openmetrics else f'{self.name}{self.suffix}'
+        yield f'# HELP {family} {self.help}'
+        yield f'# TYPE {family} {self.kind}'
+
+        for label_values, value in self.values.items():
+            if label_values:
+                labels = ','.join(
+                    f'{label}="{_escape(label_value)}"' for label, label_value in zip(self.labels, label_values)
+                )
+                yield f'{self.name}{self.suffix}{{{labels}}} {value}'
+            else:
+                yield f'{self.name}{self.suffix} {value}'
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+    suffix = ''
+
+    def set(self, value: float, *label_values: str) -> None:
+        self.values[label_values] = value
+
+
+class Histogram(Counter):
+    kind = 'histogram'
+    suffix = ''
+
+    def __init__(self, name: str, help_: str, buckets: Tuple[float, ...]) -> None:
+        super().__init__(name, help_)
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+
+    def render(self, openmetrics: bool) -> Iterator[str]:
+        yield f'# HELP {self.name} {self.help}'
+        yield f'# TYPE {self.name} {self.kind}'
+        count = 0
+
+        for bound, bucket_count in zip(self.buckets, self.counts):
+            count += bucket_count
+            yield f'{self.name}_bucket{{le="{"+Inf" if bound == float("inf") else bound}"}} {count}'
+
+        yield f'{self.name}_count {count}'
+        yield f'{self.name}_sum {self.sum}'
+
+
+registry: List[Counter] = []
+# called before each render to update metrics that are derived from other states
+collectors: List[Callable[[], None]] = []
+
+module_states = ('running', 'error', 'disabled')
+
+module_state = Gauge('stng_module_state', 'Current state of each module', ('module', 'state'))
+module_events = Counter('stng_module_events', 'Events yielded by each module', ('module',))
+module_errors = Counter('stng_module_errors', 'Errors reported by each module', ('module',))
+module_last_event = Gauge(
+    'stng_module_last_event_timestamp_seconds',
+    'Time of the last event yielded by each module',
+    ('module',),
+)
+cards_remaining = Gauge('stng_cards_remaining', 'Cards left to drop', ('account',))
+card_drops = Counter('stng_card_drops', 'Cards dropped', ('account',))
+card_drops_per_hour = Gauge('stng_card_drops_per_hour', 'Cards dropped in the last hour', ('account',))
+giveaways_joined = Counter('stng_giveaways_joined', 'Steamgifts giveaways joined', ('account',))
+steamgifts_points = Gauge('stng_steamgifts_points', 'Steamgifts points balance', ('account',))
+trades_bumped = Counter('stng_trades_bumped', 'Steamtrades trades bumped', ('account',))
+confirmations_pending = Gauge('stng_confirmations_pending', 'Confirmations waiting to be accepted or canceled')
+confirmations_processed = Counter('stng_confirmations_processed', 'Confirmations finalized', ('action',))
+http_requests = Counter('stng_http_requests', 'HTTP requests made')
+http_errors = Counter('stng_http_errors', 'HTTP requests failed or answered with an error status')
+event_loop_lag = Histogram(
+    'stng_event_loop_lag_seconds',
+    'How late the event loop runs a scheduled callback',
+    loop_monitor.lag_buckets,
+)
+event_loop_stalls = Counter('stng_event_loop_stalls', 'Event loop stalls caused by each module', ('module',))
+event_loop_stall_seconds = Counter(
+    'stng_event_loop_stall_seconds',
+    'Time the event loop was blocked by each module',
+    ('module',),
+)
+task_cpu_time = Counter('stng_task_cpu_seconds', 'CPU time used by each module and background task', ('task',))
+task_wakeups = Counter('stng_task_wakeups', 'Times each module and background task was woken up', ('task',))
+process_cpu_time = Counter('stng_process_cpu_seconds', 'CPU time used by the process')
+start_time = Gauge('stng_start_time_seconds', 'Time when the application was started')
+start_time.set(time.time())
+
+_current_states: Dict[str, str] = {}
+_drops_window: Dict[str, Deque[Tuple[float, int]]] = {}
+
+
+def _enable_option(module_name: str) -> Tuple[str, str]:
+    if module_name == "confirmations":
+        return "steamguard", "enable_confirmations"
+
+    return module_name, "enable"
+
+
+# must be called for every event yielded by a module (see on_event)
+def observe(module_name: str, module_data: utils.ModuleData) -> None:
+    module_events.inc(module_name)
+    module_last_event.set(utils.clock.time(), module_name)
+
+    if module_data.error:
+        module_errors.inc(module_name)
+        _current_states[module_name] = 'error'
+    else:
+        _current_states[module_name] = 'running'
+
+    if module_name == "confirmations" and module_data.action == "update":
+        confirmations_pending.set(len(module_data.raw_data))
+
+
+def on_event(event: 'events.Event') -> None:
+    observe(event.module, event.data)
+
+
+def record_drops(session_index: int, drops: int) -> None:
+    if drops <= 0:
+        return
+
+    account = str(session_index)
+    card_drops.inc(account, amount=drops)
+    _drops_window.setdefault(account, collections.deque()).append((utils.clock.monotonic(), drops))
+
+
+def events_by_module() -> Dict[str, float]:
+    return {module_name: count for (module_name,), count in module_events.values.items()}
+
+
+def _collect_module_states() -> None:
+    for module_name, current_state in _current_states.items():
+        section, option = _enable_option(module_name)
+
+        with contextlib.suppress(ValueError, LookupError):
+            if not config.parser.getboolean(section, option):
+                current_state = 'disabled'
+
+        for state in module_states:
+            module_state.set(int(state == current_state), module_name, state)
+
+
+def _collect_drops_per_hour() -> None:
+    limit = utils.clock.monotonic() - 3600
+
+    for account, window in _drops_window.items():
+        while window and window[0][0] < limit:
+            window.popleft()
+
+        card_drops_per_hour.set(sum(drops for _time, drops in window), account)
+
+
+def _collect_http_stats() -> None:
+    totals = http_stats.stats.totals()
+    http_requests.values[()] = totals.requests
+    http_errors.values[()] = totals.errors + sum(
+        count for status, count in totals.statuses.items() if status >= 400
+    )
+
+
+def _collect_loop_monitor() -> None:
+    monitor = loop_monitor.monitor
+    event_loop_lag.counts = monitor.buckets
+    event_loop_lag.sum = monitor.lag_sum
+
+    for module_name, stats in monitor.stalls.items():
+        event_loop_stalls.values[(module_name,)] = stats.count
+        event_loop_stall_seconds.values[(module_name,)] = stats.total
+
+
+def _collect_accounting() -> None:
+    process_cpu_time.values[()] = time.process_time()
+
+    for name, account in accounting.accounts.items():
+        task_cpu_time.values[(name,)] = account.cpu_time
+        task_wakeups.values[(name,)] = account.wakeups
+
+
+collectors.extend([
+    _collect_module_states,
+    _collect_drops_per_hour,
+    _collect_http_stats,
+    _collect_loop_monitor,
+    _collect_accounting,
+])
+
+
+def render(openmetrics: bool = True) -> str:
+    for collector in collectors:
+        collector()
+
+    lines: List[str] = []
+
+    for metric in registry:
+        if metric.values:
+            lines.extend(metric.render(openmetrics))
+
+    if openmetrics:
+        lines.append('# EOF')
+
+    return '\n'.join(lines) + '\n'
+
+
+# node_exporter reads the textfile at any time, so it's replaced atomically
+def write_textfile(path: Path) -> None:
+    temp_path = path.with_name(f'.{path.name}.{os.getpid()}.tmp')
+    temp_path.write_text(render(openmetrics=False), encoding='utf-8')
+    os.replace(temp_path, path)
+
+
+class MetricsExporter:
+    def __init__(
+            self,
+            listen_address: str,
+            port: int,
+            textfile: Optional[Path] = None,
+            textfile_interval: int = 60,
+    ) -> None:
+        self.listen_address = listen_address
+        self.port = port
+        self.textfile = textfile
+        self.textfile_interval = textfile_interval
+
+        self._runner: Optional['web.AppRunner'] = None
+        self._tasks: List['asyncio.Task[None]'] = []
+
+    async def _handle_metrics(self, request: 'web.Request') -> 'web.Response':
+        from aiohttp import web
+
+        openmetrics = 'application/openmetrics-text' in request.headers.get('Accept', '')
+        response = web.Response(text=render(openmetrics))
+        response.headers['Content-Type'] = OPENMETRICS_CONTENT_TYPE if openmetrics else PROMETHEUS_CONTENT_TYPE
+        return response
+
+    async def _write_textfile_periodically(self) -> None:
+        assert self.textfile
+
+        while True:
+            try:
+                write_textfile(self.textfile)
+            except OSError as exception:
+                log.error(_("Unable to write metrics to %s: %s"), self.textfile, str(exception))
+
+            await asyncio.sleep(self.textfile_interval)
+
+    async def start(self) -> None:
+        if self.port:
+            from aiohttp import web
+
+            app = web.Application()
+            app.router.add_get('/metrics', self._handle_metrics)
+            self._runner = web.AppRunner(app, access_log=None)
+            await self._runner.setup()
+            await web.TCPSite(self._runner, self.listen_address, self.port).start()
+            log.info(_("Metrics available at http://%s:%s/metrics"), self.listen_address, self.port)
+
+        if self.textfile:
+            self.textfile.parent.mkdir(parents=True, exist_ok=True)
+            self._tasks.append(asyncio.create_task(self._write_textfile_periodically()))
+            log.info(_("Writing metrics to %s"), self.textfile)
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+
+            with contextlib.suppress(asyncio.CancelledError):
+                await task
+
+        self._tasks.clear()
+
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+        if self.textfile:
+            with contextlib.suppress(OSError):
+                write_textfile(self.textfile)
+
+
+def new_exporter() -> Optional[MetricsExporter]:
+    if not config.parser.getboolean("metrics", "enable"):
+        return None
+
+    textfile = config.parser.get("metrics", "textfile")
+
+    return MetricsExporter(
+        config.parser.get("metrics", "listen_address"),
+        config.parser.getint("metrics", "port"),
+        Path(textfile) if textfile else None,
+        config.parser.getint("metrics", "textfile_interval"),
+    )
@@ -0,0 +1,187 @@
+#!/usr/bin/env python
+#
+# Lara Maia <dev@lara.monster> 2015 ~ 2023
+#
+# The Steam Tools NG is free software: you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, either version 3 of
+# the License, or (at your option) any later version.
+#
+# The Steam Tools NG is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see http://www.gnu.org/licenses/.
+#
+
+# On-demand profiler for running instances, started and stopped with SIGUSR2
+# or from the control socket (profile_start / profile_stop).
+#
+# sampling: a thread takes the stack of the event loop thread every few ms and
+#           writes collapsed stacks (flamegraph.pl / speedscope) tagged with the
+#           module running at that moment.
+# cprofile: deterministic profile of the event loop thread, saved as pstats.
+#
+# Nothing runs (or is hooked) while the profiler is stopped.
+
+import asyncio
+import cProfile
+import logging
+import sys
+import threading
+import time
+from pathlib import Path
+from types import FrameType
+from typing import Dict, List, Optional
+
+from . import config, i18n, loop_monitor
+
+_ = i18n.get_translation
+log = logging.getLogger(__name__)
+
+modes = ('sampling', 'cprofile')
+
+
+def _frame_name(frame: FrameType) -> str:
+    # ';' is the separator of collapsed stacks
+    return f"{frame.f_globals.get('__name__', '?')}:{frame.f_code.co_name}".replace(';', ',')
+
+
+def collapse(frame: Optional[FrameType], tag: str) -> str:
+    names: List[str] = []
+
+    while frame:
+        names.append(_frame_name(frame))
+        frame = frame.f_back
+
+    names.append(tag)
+    names.reverse()
+    return ';'.join(names)
+
+
+class Profiler:
+    def __init__(self) -> None:
+        self.mode = ''
+        self.interval = 0.005
+        self.start_time = 0.0
+        self.samples: Dict[str, int] = {}
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id = 0
+        self._profile: Optional[cProfile.Profile] = None
+        self._sampler: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+        self._stop_handle: Optional[asyncio.TimerHandle] = None
+
+    @property
+    def is_running(self) -> bool:
+        return bool(self.mode)
+
+    def _sample(self) -> None:
+        loop_thread_id = self._loop_thread_id
+        samples = self.samples
+
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(loop_thread_id)
+
+            if not frame:
+                continue
+
+            task_name = loop_monitor.current_task_name(self._loop) if self._loop else ''
+            module, _location = loop_monitor.attribute(frame, task_name)
+            # the loop is waiting for events when nothing is running
+            stack = collapse(frame, module if task_name or module != 'unknown' else 'idle')
+            samples[stack] = samples.get(stack, 0) + 1
+
+    # must be called from the event loop thread
+    def start(self, mode: str = 'sampling', interval: float = 0.005, duration: float = 0) -> None:
+        if mode not in modes:
+            raise ValueError(_("Unknown profiler mode {}").format(mode))
+
+        if self.mode:
+            raise RuntimeError(_("Profiler is already running"))
+
+        self.mode = mode
+        self.interval = interval
+        self.start_time = time.time()
+        self.samples = {}
+        self._loop_thread_id = threading.get_ident()
+
+        try:
+            self._loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._loop = None
+
+        if mode == 'cprofile':
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        else:
+            self._stop_event.clear()
+            self._sampler = threading.Thread(target=self._sample, name='profiler', daemon=True)
+            self._sampler.start()
+
+        if duration and self._loop:
+            self._stop_handle = self._loop.call_later(duration, self.stop)
+
+        log.info(_("Profiler started (%s)"), mode)
+
+    def stop(self) -> List[Path]:
+        if not self.mode:
+            raise RuntimeError(_("Profiler is not running"))
+
+        if self._stop_handle:
+            self._stop_handle.cancel()
+            self._stop_handle = None
+
+        log_directory = Path(config.parser.get("logger", "log_directory"))
+        prefix = log_directory / f"profile-{time.strftime('%Y%m%d-%H%M%S', time.localtime(self.start_time))}"
+        files = []
+
+        try:
+            if self._profile:
+                self._profile.disable()
+                files.append(prefix.with_suffix('.pstats'))
+                self._profile.dump_stats(files[-1])
+
+            if self._sampler:
+                self._stop_event.set()
+                self._sampler.join()
+                files.append(prefix.with_suffix('.collapsed'))
+
+                with open(files[-1], 'w', encoding='utf-8') as collapsed_file:
+                    for stack, count in sorted(self.samples.items()):
+                        collapsed_file.write(f'{stack} {count}\n')
+        finally:
+            self.mode = ''
+            self._profile = None
+            self._sampler = None
+
+        log.info(
+            _("Profiler stopped after %.0fs. Saved to %s"),
+            time.time() - self.start_time,
+            ', '.join(str(file) for file in files),
+        )
+        return files
+
+    def toggle(self) -> None:
+        if self.mode:
+            self.stop()
+        else:
+            self.start(config.parser.get("logger", "profiler_mode"))
+
+
+profiler = Profiler()
+
+
+def install_signal_handler(loop: asyncio.AbstractEventLoop) -> None:
+    if sys.platform == 'win32':
+        return
+
+    import signal
+
+    try:
+        loop.add_signal_handler(signal.SIGUSR2, profiler.toggle)
+    except (NotImplementedError, RuntimeError, ValueError) as exception:
+        log.debug(_("Unable to install profiler signal handler: %s"), str(exception))
@@ -0,0 +1,43 @@
+from typing import Iterator
+
+import pytest
+
+from steam_tools_ng import config
+from steam_tools_ng.core import utils
+
+
+# time only moves when the test (or a sleep) moves it
+class FakeClock(utils.Clock):
+    def __init__(self, now: float = 1000.0) -> None:
+        self.now = now
+
+    def time(self) -> float:
+        return self.now
+
+    def monotonic(self) -> float:
+        return self.now
+
+    async def sleep(self, delay: float) -> None:
+        self.now += delay
+
+
+@pytest.fixture
+def clock() -> Iterator[FakeClock]:
+    previous_clock = utils.clock
+    fake_clock = FakeClock()
+    utils.set_clock(fake_clock)
+
+    try:
+        yield fake_clock
+    finally:
+        utils.set_clock(previous_clock)
+
+
+@pytest.fixture
+def default_config() -> Iterator[None]:
+    config.parser.read_dict(config.default_config)
+
+    try:
+        yield
+    finally:
+        config.parser.clear()
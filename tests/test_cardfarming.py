@@ -0,0 +1,85 @@
+import pytest
+
+from steam_tools_ng.core import cardfarming
+
+
+@pytest.fixture
+def controller(monkeypatch, clock):
+    monkeypatch.setattr(cardfarming.ConcurrencyController, '_host_overloaded', staticmethod(lambda: False))
+    monkeypatch.setattr(cardfarming.supervisor, 'spawn_failures', lambda: 0)
+    return cardfarming.ConcurrencyController(8, window=600)
+
+
+def test_starts_at_maximum(controller):
+    assert controller.limit == 8
+    assert not controller.sample(8)
+
+
+def test_busy_halves_limit(controller):
+    controller.record_busy()
+
+    assert controller.sample(8)
+    assert controller.limit == 4
+
+    # only once for each busy report
+    assert not controller.sample(4)
+
+
+def test_spawn_failures_halve_limit(controller, monkeypatch):
+    monkeypatch.setattr(cardfarming.supervisor, 'spawn_failures', lambda: 1)
+
+    assert controller.sample(8)
+    assert controller.limit == 4
+
+
+def test_limit_never_below_one(controller):
+    for _index in range(10):
+        controller.record_busy()
+        controller.sample(1)
+
+    assert controller.limit == 1
+
+
+def test_raised_when_all_slots_in_use(controller, clock):
+    controller.record_busy()
+    controller.sample(8)
+
+    clock.now += 600
+    controller.record_drops(4)
+
+    assert controller.sample(4)
+    assert controller.limit == 5
+
+
+def test_not_raised_with_free_slots(controller, clock):
+    controller.record_busy()
+    controller.sample(8)
+
+    clock.now += 600
+    assert not controller.sample(2)
+    assert controller.limit == 4
+
+
+def test_lowered_when_drop_rate_goes_down(controller, clock):
+    controller.record_busy()
+    controller.sample(8)
+
+    clock.now += 600
+    controller.record_drops(40)
+    controller.sample(4)
+    assert controller.limit == 5
+
+    clock.now += 600
+    controller.record_drops(1)
+
+    assert controller.sample(5)
+    assert controller.limit == 4
+
+
+def test_drop_rate(controller, clock):
+    clock.now += 300
+    controller.sample(12)
+    controller.record_drops(3)
+
+    # 3 drops in one hour of game time
+    assert controller.drop_rate == pytest.approx(3)
@@ -0,0 +1,163 @@
+import asyncio
+import json
+import sys
+import threading
+
+import pytest
+
+from steam_tools_ng import config, control
+from steam_tools_ng.core import utils
+
+
+@pytest.fixture
+def server(tmp_path):
+    return control.ControlServer(tmp_path / 'control.sock', queue_size=2)
+
+
+def dispatch(server, request, queue=None):
+    line = request if isinstance(request, bytes) else json.dumps(request).encode()
+    return asyncio.run(server._dispatch(line, queue or asyncio.Queue()))
+
+
+def test_parse_error(server):
+    response, _subscribe = dispatch(server, b'{invalid')
+
+    assert response['error']['code'] == control.PARSE_ERROR
+    assert response['id'] is None
+
+
+def test_invalid_request(server):
+    response, _subscribe = dispatch(server, {'id': 1, 'params': {}})
+
+    assert response['error']['code'] == control.INVALID_REQUEST
+
+
+def test_method_not_found(server):
+    response, _subscribe = dispatch(server, {'jsonrpc': '2.0', 'id': 1, 'method': 'nothing'})
+
+    assert response == {
+        'jsonrpc': '2.0',
+        'id': 1,
+        'error': {'code': control.METHOD_NOT_FOUND, 'message': 'Method nothing not found'},
+    }
+
+
+def test_invalid_params(server):
+    response, _subscribe = dispatch(server, {'id': 1, 'method': 'pause', 'params': []})
+    assert response['error']['code'] == control.INVALID_PARAMS
+
+    response, _subscribe = dispatch(server, {'id': 2, 'method': 'pause', 'params': {'unknown': 1}})
+    assert response['error']['code'] == control.INVALID_PARAMS
+
+
+def test_notifications_have_no_response(server):
+    response, subscribe = dispatch(server, {'method': 'subscribe', 'params': {'modules': ['steamgifts']}})
+
+    assert response is None
+    assert subscribe
+
+
+def test_publish_to_subscribers(server):
+    queue = asyncio.Queue(2)
+    request = {'id': 1, 'method': 'subscribe', 'params': {'modules': ['steamgifts']}}
+    response, subscribe = dispatch(server, request, queue)
+
+    assert response['result'] == ['steamgifts']
+    assert subscribe
+
+    server.publish('steamtrades', utils.ModuleData(info='ignored'))
+    # raw_data can't be copied or serialized, so it's never sent
+    server.publish('steamgifts', utils.ModuleData(info='Joined', raw_data=threading.Lock()))
+
+    message = queue.get_nowait()
+    assert queue.empty()
+    assert message['method'] == 'module_data'
+    assert message['params']['module'] == 'steamgifts'
+    assert message['params']['info'] == 'Joined'
+    assert 'raw_data' not in message['params']
+    json.dumps(message)
+
+
+def test_slow_subscribers_lose_oldest_events(server):
+    queue = asyncio.Queue(2)
+    dispatch(server, {'id': 1, 'method': 'subscribe'}, queue)
+
+    for index in range(4):
+        server.publish('steamgifts', utils.ModuleData(info=str(index)))
+
+    assert [queue.get_nowait()['params']['info'] for _index in range(2)] == ['2', '3']
+
+
+def test_pause_and_resume(server):
+    play_event = asyncio.Event()
+    play_event.set()
+    server.register_module('steamgifts', play_event)
+
+    response, _subscribe = dispatch(server, {'id': 1, 'method': 'pause', 'params': {'module': 'steamgifts'}})
+    assert response['result'] is False
+    assert not play_event.is_set()
+
+    response, _subscribe = dispatch(server, {'id': 2, 'method': 'resume', 'params': {'module': 'steamgifts'}})
+    assert response['result'] is True
+    assert play_event.is_set()
+
+
+def test_enable_requires_a_module_manager(server, default_config, monkeypatch, tmp_path):
+    monkeypatch.setattr(config, 'config_file', tmp_path / 'steam-tools-ng.config')
+    request = {'id': 1, 'method': 'disable', 'params': {'module': 'steamgifts'}}
+
+    response, _subscribe = dispatch(server, request)
+    assert response['error']['code'] == control.SERVER_ERROR
+    assert config.parser.getboolean('steamgifts', 'enable')
+
+    server.manage_modules = True
+    response, _subscribe = dispatch(server, request)
+    assert response['result'] is False
+    assert not config.parser.getboolean('steamgifts', 'enable')
+
+
+def test_finalize_confirmations_unknown_account(server, default_config):
+    request = {'id': 1, 'method': 'finalize_confirmations', 'params': {'action': 'allow', 'account': 3}}
+    response, _subscribe = dispatch(server, request)
+
+    assert response['error']['code'] == control.INVALID_PARAMS
+
+
+class BrokenWriter:
+    def write(self, data):
+        raise BrokenPipeError()
+
+
+def test_stream_unsubscribes_disconnected_clients(server):
+    async def stream() -> None:
+        queue = asyncio.Queue(2)
+        await server._dispatch(b'{"id": 1, "method": "subscribe"}', queue)
+        server.publish('steamgifts', utils.ModuleData(info='Joined'))
+
+        await server._stream(queue, BrokenWriter())
+        assert queue not in server._subscribers
+
+    asyncio.run(stream())
+
+
+@pytest.mark.skipif(sys.platform == 'win32', reason="requires unix sockets")
+def test_socket(server):
+    async def client() -> None:
+        await server.start()
+
+        try:
+            reader, writer = await asyncio.open_unix_connection(str(server.socket_path))
+            writer.write(b'{"jsonrpc": "2.0", "id": 7, "method": "subscribe", "params": {"modules": ["steamguard"]}}\n')
+            response = json.loads(await reader.readline())
+            assert response == {'jsonrpc': '2.0', 'id': 7, 'result': ['steamguard']}
+
+            server.publish('steamguard', utils.ModuleData(status='ABCDE'))
+            message = json.loads(await asyncio.wait_for(reader.readline(), 5))
+            assert message['params']['status'] == 'ABCDE'
+
+            writer.close()
+        finally:
+            await server.stop()
+
+    asyncio.run(client())
+    assert not server.socket_path.exists()
@@ -0,0 +1,116 @@
+import asyncio
+
+from steam_tools_ng import events
+from steam_tools_ng.core import utils
+
+
+def test_event_types():
+    assert isinstance(events.new_event('steamgifts', utils.ModuleData(info='Waiting')), events.ProgressEvent)
+    assert isinstance(events.new_event('steamgifts', utils.ModuleData(action='login')), events.ActionEvent)
+    assert isinstance(events.new_event('steamgifts', utils.ModuleData(error='Failed')), events.ErrorEvent)
+
+
+def test_latest_keeps_last_progress_per_account():
+    bus = events.EventBus()
+    subscription = bus.subscribe(policies={events.ProgressEvent: events.LATEST})
+
+    for index in range(5):
+        bus.publish('steamgifts', utils.ModuleData(info=str(index)))
+        bus.publish('steamgifts', utils.ModuleData(info=f'account {index}', account=1))
+
+    bus.publish('steamtrades', utils.ModuleData(info='trades'))
+
+    assert [(event.module, event.data.info) for event in subscription.drain()] == [
+        ('steamgifts', '4'),
+        ('steamgifts', 'account 4'),
+        ('steamtrades', 'trades'),
+    ]
+
+
+def test_lossless_keeps_every_action():
+    bus = events.EventBus()
+    subscription = bus.subscribe(policies={events.ProgressEvent: events.LATEST})
+
+    for index in range(3):
+        bus.publish('confirmations', utils.ModuleData(action='update', info=str(index)))
+        bus.publish('confirmations', utils.ModuleData(info='progress'))
+
+    bus.publish('confirmations', utils.ModuleData(error='Failed'))
+
+    assert [type(event).__name__ for event in subscription.drain()] == [
+        'ActionEvent',
+        'ActionEvent',
+        'ActionEvent',
+        'ProgressEvent',
+        'ErrorEvent',
+    ]
+
+
+def test_drop_oldest():
+    bus = events.EventBus()
+    subscription = bus.subscribe(policies={events.ActionEvent: events.DROP_OLDEST}, maxsize=2)
+
+    for index in range(5):
+        bus.publish('steamgifts', utils.ModuleData(action='update', info=str(index)))
+
+    assert [event.data.info for event in subscription.drain()] == ['3', '4']
+    assert subscription.dropped == 3
+
+
+def test_module_filter():
+    bus = events.EventBus()
+    subscription = bus.subscribe(['steamgifts'])
+    bus.publish('steamtrades', utils.ModuleData(info='trades'))
+    bus.publish('steamgifts', utils.ModuleData(info='gifts'))
+
+    assert [event.module for event in subscription.drain()] == ['steamgifts']
+
+    subscription.close()
+    bus.publish('steamgifts', utils.ModuleData(info='gifts'))
+    assert not subscription.drain()
+
+
+def test_events_are_snapshots():
+    bus = events.EventBus()
+    subscription = bus.subscribe()
+    module_data = utils.ModuleData(info='Waiting', action='check')
+
+    bus.publish('cardfarming', module_data)
+    module_data.info = 'Waiting (1s)'
+    module_data.action = ''
+
+    event = subscription.drain()[0]
+    assert event.data.info == 'Waiting'
+    assert event.data.action == 'check'
+
+
+def test_listeners():
+    bus = events.EventBus()
+    received = []
+
+    def broken_listener(event: events.Event) -> None:
+        raise ValueError
+
+    bus.add_listener(broken_listener)
+    bus.add_listener(received.append)
+    bus.publish('steamguard', utils.ModuleData(status='ABCDE'))
+
+    assert [event.data.status for event in received] == ['ABCDE']
+
+    bus.remove_listener(received.append)
+    bus.publish('steamguard', utils.ModuleData(status='FGHIJ'))
+    assert len(received) == 1
+
+
+def test_subscription_wakes_up_consumer():
+    async def consume() -> None:
+        bus = events.EventBus()
+        subscription = bus.subscribe()
+        consumer = asyncio.create_task(subscription.get())
+        await asyncio.sleep(0)
+
+        bus.publish('steamgifts', utils.ModuleData(info='Joined'))
+        event = await asyncio.wait_for(consumer, 1)
+        assert event.data.info == 'Joined'
+
+    asyncio.run(consume())
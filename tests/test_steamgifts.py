@@ -0,0 +1,207 @@
+import asyncio
+import sqlite3
+import types
+from typing import NamedTuple
+
+import pytest
+
+from steam_tools_ng import config
+from steam_tools_ng.core import steamgifts
+
+
+class Giveaway(NamedTuple):
+    id: str
+    points: int
+    copies: int = 1
+    level: int = 0
+
+
+class FakeSession:
+    def __init__(self, giveaways):
+        self.giveaways = giveaways
+        self.requests = 0
+
+    async def get_giveaways(self, type_, metascore_filter, entries_filter, pinned_giveaways):
+        self.requests += 1
+        return list(self.giveaways)
+
+
+@pytest.fixture(autouse=True)
+def listing_cache(clock, default_config):
+    steamgifts._listing_cache.clear()
+
+
+def get_giveaways(session, session_index=0, type_='main'):
+    return asyncio.run(steamgifts.get_giveaways(session, session_index, type_, (0, 100), (0, 999999), False))
+
+
+def test_filter_giveaways():
+    giveaways = [Giveaway('a', 10, copies=1, level=0), Giveaway('b', 50, copies=5, level=5), Giveaway('c', 5, level=10)]
+
+    assert steamgifts.filter_giveaways(giveaways, (0, 50), (0, 100), (1, 999)) == giveaways
+    assert steamgifts.filter_giveaways(giveaways, (10, 50), (0, 100), (1, 999)) == giveaways[:2]
+    assert steamgifts.filter_giveaways(giveaways, (0, 50), (1, 9), (1, 999)) == giveaways[1:2]
+    assert steamgifts.filter_giveaways(giveaways, (0, 50), (0, 100), (2, 999)) == giveaways[1:2]
+
+
+def test_listings_are_shared_between_strategies(clock):
+    session = FakeSession([Giveaway('a', 10)])
+
+    assert get_giveaways(session) == [Giveaway('a', 10)]
+    assert get_giveaways(session) == [Giveaway('a', 10)]
+    assert session.requests == 1
+
+    # each listing is cached by its own filters and account
+    get_giveaways(session, type_='wishlist')
+    get_giveaways(session, session_index=1)
+    assert session.requests == 3
+
+
+def test_listing_cache_expires(clock):
+    session = FakeSession([Giveaway('a', 10)])
+    get_giveaways(session)
+
+    clock.now += 301
+    get_giveaways(session)
+    assert session.requests == 2
+
+
+def test_discard_giveaway(clock):
+    session = FakeSession([Giveaway('a', 10), Giveaway('b', 10)])
+    get_giveaways(session)
+    get_giveaways(session, session_index=1)
+
+    steamgifts.discard_giveaway(0, 'a')
+
+    assert [giveaway.id for giveaway in get_giveaways(session)] == ['b']
+    assert [giveaway.id for giveaway in get_giveaways(session, session_index=1)] == ['a', 'b']
+    assert session.requests == 2
+
+
+def test_plan_giveaways_fits_budget():
+    giveaways = [Giveaway('a', 50), Giveaway('b', 30), Giveaway('c', 30), Giveaway('d', 10)]
+    plan = steamgifts.plan_giveaways(giveaways, 60)
+
+    assert [giveaway.id for giveaway in plan] == ['b', 'c']
+
+
+def test_plan_giveaways_maximizes_score():
+    # one giveaway with more copies is worth more than two single copies
+    giveaways = [Giveaway('a', 10), Giveaway('b', 10), Giveaway('c', 20, copies=5)]
+    plan = steamgifts.plan_giveaways(giveaways, 20)
+
+    assert [giveaway.id for giveaway in plan] == ['c']
+
+
+def test_plan_giveaways_keeps_order_on_ties():
+    giveaways = [Giveaway('a', 10), Giveaway('b', 10), Giveaway('c', 10)]
+    plan = steamgifts.plan_giveaways(giveaways, 20)
+
+    assert [giveaway.id for giveaway in plan] == ['a', 'b']
+
+
+def test_plan_giveaways_without_budget():
+    assert steamgifts.plan_giveaways([Giveaway('a', 10)], 0) == []
+    assert steamgifts.plan_giveaways([Giveaway('a', 10)], 5) == []
+    assert steamgifts.plan_giveaways([], 100) == []
+
+
+def test_giveaway_index(clock, tmp_path):
+    database = str(tmp_path / 'steamgifts.sqlite3')
+
+    async def fill() -> None:
+        index = steamgifts.GiveawayIndex(database)
+        index.add(0, 'a', 'joined')
+        index.add(0, 'b', 'failed')
+        index.add(1, 'c', 'ended')
+
+        assert await index.known_ids(0) == {'a', 'b'}
+        assert await index.known_ids(1) == {'c'}
+        await index.close()
+
+    asyncio.run(fill())
+
+    async def reload() -> None:
+        index = steamgifts.GiveawayIndex(database)
+        assert await index.known_ids(0) == {'a', 'b'}
+
+        # failed giveaways are retried sooner
+        clock.now += steamgifts.index_expiration['failed'] + 1
+        assert await index.known_ids(0) == {'a'}
+        await index.close()
+
+    asyncio.run(reload())
+
+
+def test_giveaway_index_batches_writes(clock, tmp_path):
+    async def add() -> None:
+        index = steamgifts.GiveawayIndex(str(tmp_path / 'steamgifts.sqlite3'))
+
+        for giveaway_id in range(50):
+            index.add(0, str(giveaway_id), 'joined')
+
+        await index.flush()
+        assert len(await index.known_ids(0)) == 50
+        await index.close()
+
+    asyncio.run(add())
+
+
+def test_giveaway_index_retries_failed_writes(clock, tmp_path):
+    database = str(tmp_path / 'steamgifts.sqlite3')
+
+    async def add() -> None:
+        index = steamgifts.GiveawayIndex(database)
+        write = index._write
+
+        def locked(rows):
+            raise sqlite3.OperationalError("database is locked")
+
+        index._write = locked
+        index.add(0, 'a', 'joined')
+        assert await index.known_ids(0) == set()
+
+        index._write = write
+        index.add(0, 'b', 'joined')
+        await index.close()
+
+        assert index.connection is None
+
+    asyncio.run(add())
+
+    async def reload() -> None:
+        index = steamgifts.GiveawayIndex(database)
+        assert await index.known_ids(0) == {'a', 'b'}
+        await index.close()
+
+    asyncio.run(reload())
+
+
+class BrokenSession:
+    user_info = types.SimpleNamespace(points=100, level=10)
+
+    async def do_login(self):
+        pass
+
+    async def configure(self):
+        pass
+
+    async def get_giveaways(self, type_, metascore_filter, entries_filter, pinned_giveaways):
+        raise ValueError("unexpected page")
+
+
+def test_fetch_errors_dont_stop_cleanup(monkeypatch, tmp_path, caplog, clock):
+    plugin = types.SimpleNamespace(Main=types.SimpleNamespace(get_session=lambda session_index: BrokenSession()))
+    monkeypatch.setattr(steamgifts, 'plugins', types.SimpleNamespace(
+        has_plugin=lambda name: True,
+        get_plugin=lambda name: plugin,
+    ))
+    monkeypatch.setattr(config, 'config_file_directory', tmp_path)
+
+    async def run_main():
+        return [module_data async for module_data in steamgifts.main()]
+
+    module_data = asyncio.run(run_main())
+
+    assert "No giveaways to join." in [data.status for data in module_data]
+    assert "unexpected page" in caplog.text
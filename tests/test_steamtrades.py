@@ -0,0 +1,97 @@
+import asyncio
+import types
+from typing import NamedTuple
+
+import pytest
+from stlib import login
+
+from steam_tools_ng import config
+from steam_tools_ng.core import steamtrades
+
+
+class TradeInfo(NamedTuple):
+    id: str
+    title: str
+
+
+class FakeSession:
+    def __init__(self, errors):
+        self.errors = errors
+        self.fetches = []
+        self.bumps = []
+
+    async def do_login(self):
+        pass
+
+    async def get_trade_info(self, trade_id):
+        self.fetches.append(trade_id)
+        return TradeInfo(trade_id, f'Trade {trade_id}')
+
+    async def bump(self, trade_info):
+        self.bumps.append(trade_info.id)
+
+        if trade_info.id in self.errors:
+            raise self.errors[trade_info.id]
+
+        return True
+
+
+@pytest.fixture
+def session(monkeypatch, tmp_path, clock, default_config):
+    session = FakeSession({})
+    plugin = types.SimpleNamespace(
+        Main=types.SimpleNamespace(get_session=lambda session_index: session),
+        **{name: type(name, (Exception,), {}) for name in [
+            'NoTradesError', 'TradeNotReadyError', 'TradeClosedError',
+            'TooFast', 'UserSuspended', 'PrivateProfile', 'UserLevelError',
+        ]},
+    )
+    session.plugin = plugin
+    monkeypatch.setattr(steamtrades, 'plugins', types.SimpleNamespace(
+        has_plugin=lambda name: True,
+        get_plugin=lambda name: plugin,
+    ))
+    monkeypatch.setattr(config, 'config_file_directory', tmp_path)
+    config.parser.set('steamtrades', 'trade_ids', 'a, b')
+    steamtrades._schedulers.clear()
+    steamtrades._trade_info_cache.clear()
+
+    return session
+
+
+async def run_main():
+    return [module_data async for module_data in steamtrades.main()]
+
+
+def test_bumped_trades_are_saved_when_login_is_lost(session, clock):
+    session.errors['b'] = login.LoginError('logged out')
+
+    module_data = asyncio.run(run_main())
+
+    assert module_data[-1].error == "Login is lost. Trying to relogin."
+
+    scheduler = steamtrades.get_scheduler(0)
+    assert not scheduler.is_due('a')
+    assert scheduler.is_due('b')
+
+    steamtrades._schedulers.clear()
+    assert steamtrades.get_scheduler(0).deadline('a') == scheduler.deadline('a')
+
+
+def test_closed_trades_wait_until_trade_info_expires(session, clock):
+    asyncio.run(run_main())
+    assert session.bumps == ['a', 'b']
+
+    closed = session.plugin.TradeClosedError()
+    closed.id, closed.title = 'b', 'Trade b'
+    session.errors['b'] = closed
+    clock.now += config.parser.getint('steamtrades', 'wait_for_bump')
+    start_time = clock.now
+    asyncio.run(run_main())
+
+    # cached info was refreshed once to confirm the trade is really closed
+    assert session.fetches == ['a', 'b', 'b']
+    assert session.bumps == ['a', 'b', 'a', 'b', 'b']
+
+    scheduler = steamtrades.get_scheduler(0)
+    assert scheduler.deadline('b') >= start_time + config.parser.getint('steamtrades', 'trade_info_ttl')
@@ -0,0 +1,99 @@
+import asyncio
+
+import pytest
+
+from steam_tools_ng.core import supervisor
+
+
+class FakeExecutor:
+    def __init__(self, appid: int) -> None:
+        self.appid = appid
+        self._processes = {}
+        self._broken = False
+        self.is_shutdown = False
+
+    def shutdown(self) -> None:
+        self.is_shutdown = True
+
+
+@pytest.fixture
+def executor_supervisor(monkeypatch, clock):
+    monkeypatch.setattr(supervisor.client, 'SteamAPIExecutor', FakeExecutor)
+    return supervisor.ExecutorSupervisor(spawn_interval=0)
+
+
+def test_spawn_reuses_running_executor(executor_supervisor):
+    executor = asyncio.run(executor_supervisor.spawn(440))
+
+    assert asyncio.run(executor_supervisor.spawn(440)) is executor
+    assert executor_supervisor.executors[440].spawn_count == 1
+    assert executor_supervisor.running_executors() == [executor]
+
+
+def test_dead_executor_is_kept_until_respawned(executor_supervisor):
+    executor = asyncio.run(executor_supervisor.spawn(440))
+    executor._broken = True
+
+    assert executor_supervisor.health_check() == [440]
+    assert executor.is_shutdown
+
+    executor_supervisor.reap()
+    assert executor_supervisor.executors[440].state == 'dead'
+
+    respawned = asyncio.run(executor_supervisor.spawn(440))
+    assert respawned is not executor
+    assert executor_supervisor.executors[440].state == 'running'
+    assert executor_supervisor.executors[440].spawn_count == 2
+
+
+def test_stopped_executor_is_reaped(executor_supervisor):
+    asyncio.run(executor_supervisor.spawn(440))
+    executor_supervisor.stop(440)
+    executor_supervisor.reap()
+
+    assert 440 not in executor_supervisor.executors
+
+
+def test_pause_and_resume(executor_supervisor):
+    asyncio.run(executor_supervisor.spawn(440))
+    asyncio.run(executor_supervisor.spawn(730))
+    executor_supervisor.pause(440)
+
+    assert executor_supervisor.executors[440].state == 'paused'
+    assert [executor.appid for executor in executor_supervisor.running_executors()] == [730]
+
+    asyncio.run(executor_supervisor.resume_all())
+    assert executor_supervisor.executors[440].state == 'running'
+
+
+def test_spawn_failures(executor_supervisor, monkeypatch):
+    def broken_executor(appid: int) -> None:
+        raise ProcessLookupError
+
+    monkeypatch.setattr(supervisor.client, 'SteamAPIExecutor', broken_executor)
+
+    with pytest.raises(ProcessLookupError):
+        asyncio.run(executor_supervisor.spawn(440))
+
+    assert executor_supervisor.spawn_failures() == 1
+    assert executor_supervisor.executors[440].state == 'stopped'
+
+
+def test_memory_limit(executor_supervisor, monkeypatch):
+    monkeypatch.setattr(supervisor, 'process_usage', lambda pid: (0, 100))
+    executor = asyncio.run(executor_supervisor.spawn(440))
+    executor._processes = {1: None}
+    executor_supervisor.max_memory = 100
+
+    with pytest.raises(MemoryError):
+        asyncio.run(executor_supervisor.spawn(730))
+
+    assert executor_supervisor.spawn_failures() == 1
+
+
+def test_shutdown(executor_supervisor):
+    executor = asyncio.run(executor_supervisor.spawn(440))
+    executor_supervisor.shutdown()
+
+    assert executor.is_shutdown
+    assert not executor_supervisor.executors
@@ -0,0 +1,107 @@
+import asyncio
+
+import pytest
+
+from steam_tools_ng.core import utils
+
+
+def test_rate_limiter_spaces_calls(clock):
+    limiter = utils.RateLimiter(5)
+
+    assert limiter.reserve() == 0
+    assert limiter.reserve() == 5
+    assert limiter.reserve() == 10
+
+    clock.now += 30
+    assert limiter.reserve() == 0
+
+
+def test_rate_limiter_delay_first(clock):
+    limiter = utils.RateLimiter(5, delay_first=True)
+
+    assert limiter.reserve() == 5
+
+
+def test_rate_limiter_jitter(clock):
+    limiter = utils.RateLimiter(5, 10)
+    limiter.reserve()
+
+    assert 5 <= limiter.reserve() <= 15
+
+
+def test_rate_limiter_wait(clock):
+    limiter = utils.RateLimiter(5)
+    start_time = clock.now
+
+    asyncio.run(limiter.wait())
+    asyncio.run(limiter.wait())
+
+    assert clock.now == start_time + 5
+
+
+def test_deadline_scheduler(clock):
+    scheduler = utils.DeadlineScheduler()
+    scheduler.schedule('a', clock.now + 100)
+    scheduler.schedule('b', clock.now + 50)
+
+    assert not scheduler.is_due('a')
+    assert scheduler.is_due('c')
+    assert scheduler.next_deadline(['a', 'b']) == clock.now + 50
+    # unknown keys are due now
+    assert scheduler.next_deadline(['a', 'c']) == 0
+
+    scheduler.schedule('b', clock.now + 200)
+    assert scheduler.next_deadline(['a', 'b']) == clock.now + 100
+
+    scheduler.retain(['b'])
+    assert scheduler.next_deadline(['b']) == clock.now + 200
+    assert scheduler.deadline('a') == 0
+
+    clock.now += 200
+    assert scheduler.is_due('b')
+
+
+def test_deadline_scheduler_persistence(clock, tmp_path):
+    path = tmp_path / 'deadlines.json'
+    scheduler = utils.DeadlineScheduler(path)
+    scheduler.schedule('a', clock.now + 100)
+    scheduler.schedule('b', clock.now + 50)
+    asyncio.run(scheduler.save())
+
+    restored = utils.DeadlineScheduler(path)
+
+    assert restored.deadline('a') == clock.now + 100
+    assert restored.next_deadline(['a', 'b']) == clock.now + 50
+    assert not list(tmp_path.glob('*.tmp'))
+
+
+def test_deadline_scheduler_invalid_file(tmp_path):
+    path = tmp_path / 'deadlines.json'
+    path.write_text('{invalid', encoding='utf-8')
+
+    assert utils.DeadlineScheduler(path).next_deadline(['a']) == 0
+
+
+def test_run_virtual():
+    async def main():
+        start_time = utils.clock.monotonic()
+        await asyncio.sleep(3600)
+        await utils.clock.sleep(1800)
+        return utils.clock.time(), utils.clock.monotonic() - start_time
+
+    previous_clock = utils.clock
+    now, elapsed = utils.run_virtual(main(), start_time=1000)
+
+    assert elapsed == 5400
+    assert now == 6400
+    assert utils.clock is previous_clock
+
+
+def test_run_virtual_timeouts():
+    async def main():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(asyncio.sleep(60), 30)
+
+        return utils.clock.monotonic()
+
+    assert utils.run_virtual(main()) == 30
@@ -0,0 +1,280 @@
+#!/usr/bin/env python
+#
+# Lara Maia <dev@lara.monster> 2015 ~ 2023
+#
+# The Steam Tools NG is free software: you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, either version 3 of
+# the License, or (at your option) any later version.
+#
+# The Steam Tools NG is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see http://www.gnu.org/licenses/.
+#
+
+# Micro benchmarks for the hot paths that run on every module event
+#
+# usage: microbenchmark.py [--repeats N] [--output results.json] [--compare previous.json] [benchmark ...]
+
+import argparse
+import contextlib
+import io
+import json
+import logging
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import timeit
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+source_directory = Path(__file__).resolve().parent.parent / 'src'
+
+# Each benchmark returns the function to be timed (or raises ImportError to be skipped)
+Benchmark = Callable[[], Callable[[], Any]]
+
+
+def timed_module_data() -> Callable[[], Any]:
+    from steam_tools_ng.core import utils
+    # one minute countdown on virtual time (without the real one second sleep between steps)
+    loop = utils.VirtualEventLoop()
+    real_clock = utils.clock
+    virtual_clock = utils.VirtualClock(loop)
+
+    async def consume() -> None:
+        module_data = utils.ModuleData(info="Waiting")
+
+        async for _data in utils.timed_module_data(60, module_data):
+            pass
+
+    # other benchmarks must keep running on real time
+    def countdown() -> None:
+        utils.set_clock(virtual_clock)
+
+        try:
+            loop.run_until_complete(consume())
+        finally:
+            utils.set_clock(real_clock)
+
+    return countdown
+
+
+def time_offset_cache() -> Callable[[], Any]:
+    from steam_tools_ng.core import utils
+
+    @utils.time_offset_cache(ttl=3600)
+    def server_time() -> int:
+        return int(time.time())
+
+    return server_time
+
+
+def get_translation() -> Callable[[], Any]:
+    from steam_tools_ng import i18n
+    i18n.set_language('pt_BR')
+    return lambda: i18n.get_translation("Waiting Changes")
+
+
+def _init_config() -> Any:
+    from steam_tools_ng import config
+
+    if not config.parser.sections():
+        config.config_file_directory.mkdir(parents=True, exist_ok=True)
+        config.parser.read_dict(config.default_config)
+
+    return config
+
+
+def config_new_unchanged() -> Callable[[], Any]:
+    config = _init_config()
+    config.new('steamgifts', 'wait_after_each_strategy', 10)
+    return lambda: config.new('steamgifts', 'wait_after_each_strategy', 10)
+
+
+def config_new_changed() -> Callable[[], Any]:
+    config = _init_config()
+    values = iter(range(sys.maxsize))
+    return lambda: config.new('steamgifts', 'wait_after_each_strategy', next(values))
+
+
+def _coupon_names(count: int) -> List[str]:
+    return [f"{10 + index % 80}% OFF Game {index} - Coupon" for index in range(count)]
+
+
+def coupons_parse_blacklist() -> Callable[[], Any]:
+    from steam_tools_ng.core import coupons
+    blacklist = ','.join([*_coupon_names(50), '*Edition', 'Game 1*'])
+    owned_games = [f'Owned Game {index}' for index in range(1000)]
+    return lambda: coupons.parse_blacklist(blacklist, owned_games)
+
+
+def coupons_is_blacklisted() -> Callable[[], Any]:
+    from steam_tools_ng.core import coupons
+    blacklist = coupons.parse_blacklist(
+        ','.join([*_coupon_names(50), '*Edition', 'Game 1*']),
+        [f'Owned Game {index}' for index in range(1000)],
+    )
+    game_names = [coupons.coupon_game_name(name) for name in _coupon_names(100)]
+
+    def run() -> None:
+        for game_name in game_names:
+            coupons.is_blacklisted(game_name, blacklist)
+
+    return run
+
+
+def set_console() -> Callable[[], Any]:
+    from steam_tools_ng.core import utils
+    from steam_tools_ng.console import utils as console_utils
+    module_data = utils.ModuleData(display='440', status='Running', info='Waiting drops', level=(10, 100))
+    output = io.StringIO()
+
+    def run() -> None:
+        output.seek(0)
+        output.truncate()
+
+        with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+            console_utils.set_console(module_data)
+
+    return run
+
+
+def metrics_observe() -> Callable[[], Any]:
+    from steam_tools_ng import metrics
+    from steam_tools_ng.core import utils
+    module_data = utils.ModuleData(display='440', status='Running', info='Waiting drops', level=(10, 100))
+    return lambda: metrics.observe('cardfarming', module_data)
+
+
+def metrics_render() -> Callable[[], Any]:
+    _init_config()
+    from steam_tools_ng import metrics
+    from steam_tools_ng.core import utils
+
+    for module_name in ('steamguard', 'cardfarming', 'steamtrades', 'steamgifts', 'confirmations'):
+        metrics.observe(module_name, utils.ModuleData(info='Waiting'))
+
+    return metrics.render
+
+
+def events_publish() -> Callable[[], Any]:
+    from steam_tools_ng import events
+    from steam_tools_ng.core import utils
+    bus = events.EventBus()
+    subscription = bus.subscribe(['cardfarming'], {events.ProgressEvent: events.LATEST})
+    module_data = utils.ModuleData(display='440', status='Running', info='Waiting drops', level=(10, 100))
+
+    def publish() -> None:
+        bus.publish('cardfarming', module_data)
+        subscription.drain()
+
+    return publish
+
+
+def simple_text_tree_item() -> Callable[[], Any]:
+    from steam_tools_ng.gtk import utils as gtk_utils
+    headers = ('_id', 'name', 'copies', 'points', 'level')
+    return lambda: gtk_utils.SimpleTextTreeItem('1', 'Game', '1', '10', '2', headers=headers)
+
+
+benchmarks: Dict[str, Benchmark] = {
+    'core.utils.timed_module_data': timed_module_data,
+    'core.utils.time_offset_cache': time_offset_cache,
+    'i18n.get_translation': get_translation,
+    'config.new (unchanged)': config_new_unchanged,
+    'config.new (changed)': config_new_changed,
+    'coupons.parse_blacklist': coupons_parse_blacklist,
+    'coupons.is_blacklisted (x100)': coupons_is_blacklisted,
+    'console.utils.set_console': set_console,
+    'metrics.observe': metrics_observe,
+    'metrics.render': metrics_render,
+    'events.publish': events_publish,
+    'gtk.utils.SimpleTextTreeItem': simple_text_tree_item,
+}
+
+
+def run(benchmark: Benchmark, repeats: int) -> Dict[str, Any]:
+    try:
+        function_ = benchmark()
+    except ImportError as exception:
+        return {'error': str(exception)}
+
+    timer = timeit.Timer(function_)
+    # calls per sample are chosen so each sample takes at least 0.2s
+    calls, _elapsed = timer.autorange()
+    samples = [elapsed / calls * 1e9 for elapsed in timer.repeat(repeats, calls)]
+
+    return {
+        'ns_per_call': round(statistics.median(samples), 1),
+        'min_ns': round(min(samples), 1),
+        'calls': calls,
+        'repeats': repeats,
+    }
+
+
+def compare(results: Dict[str, Any], previous: Dict[str, Any]) -> None:
+    print(f"{'benchmark':<32} {'previous':>12} {'current':>12} {'delta':>9}")
+
+    for name, result in results['benchmarks'].items():
+        old_result = previous['benchmarks'].get(name, {})
+
+        if 'ns_per_call' not in result or 'ns_per_call' not in old_result:
+            continue
+
+        delta = (result['ns_per_call'] - old_result['ns_per_call']) / old_result['ns_per_call'] * 100
+        print(f"{name:<32} {old_result['ns_per_call']:>10.0f}ns {result['ns_per_call']:>10.0f}ns {delta:>+8.1f}%")
+
+
+def main() -> None:
+    command_parser = argparse.ArgumentParser()
+    command_parser.add_argument('--repeats', type=int, default=7, help='Samples per benchmark (median is used)')
+    command_parser.add_argument('--output', type=Path, help='Save results as JSON')
+    command_parser.add_argument('--compare', type=Path, help='Compare with results from a previous run')
+    command_parser.add_argument('benchmarks', nargs='*', help='Benchmarks to run (default: all)')
+    params = command_parser.parse_args()
+
+    selected = params.benchmarks or list(benchmarks)
+    results: Dict[str, Any] = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'time': int(time.time()),
+        'benchmarks': {},
+    }
+
+    output = params.output.resolve() if params.output else None
+    previous = params.compare.resolve() if params.compare else None
+
+    with tempfile.TemporaryDirectory(prefix='stng_bench_') as temp_directory:
+        # config files and logs must not touch the user config
+        os.environ['XDG_CONFIG_HOME'] = temp_directory
+        os.environ['LOCALAPPDATA'] = temp_directory
+        os.chdir(temp_directory)
+        sys.path.insert(0, str(source_directory))
+        logging.disable(logging.CRITICAL)
+
+        for name in selected:
+            result = run(benchmarks[name], params.repeats)
+            results['benchmarks'][name] = result
+
+            if 'error' in result:
+                print(f"{name:<32} skipped ({result['error']})")
+            else:
+                print(f"{name:<32} {result['ns_per_call']:>10.0f}ns (min: {result['min_ns']:.0f}ns)")
+
+    if output:
+        output.write_text(json.dumps(results, indent=2), encoding='utf-8')
+
+    if previous:
+        print()
+        compare(results, json.loads(previous.read_text(encoding='utf-8')))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+#
+# Lara Maia <dev@lara.monster> 2015 ~ 2023
+#
+# The Steam Tools NG is free software: you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, either version 3 of
+# the License, or (at your option) any later version.
+#
+# The Steam Tools NG is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see http://www.gnu.org/licenses/.
+#
+
+# Cold-start benchmark for each entry point, based on `python -X importtime`
+#
+# usage: startup_benchmark.py [--runs N] [--output results.json] [--compare previous.json]
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+source_directory = Path(__file__).resolve().parent.parent / 'src'
+
+
+def _run_entry_point(name: str, argv: List[str]) -> str:
+    return f"import sys; sys.argv = {['steam-tools-ng', *argv]!r}; from steam_tools_ng import {name}; {name}.main()"
+
+
+entry_points = {
+    'cli --version': _run_entry_point('cli', ['--version']),
+    'cli --config-dir': _run_entry_point('cli', ['--config-dir']),
+    'cli': 'import steam_tools_ng.cli',
+    'gui': 'import steam_tools_ng.gui',
+    'core': 'import steam_tools_ng.core',
+    **{
+        f'core.{module}': f'import steam_tools_ng.core.{module}'
+        for module in [
+            'steamguard',
+            'confirmations',
+            'steamtrades',
+            'steamgifts',
+            'coupons',
+            'cardfarming',
+            'fakerun',
+        ]
+    },
+}
+
+
+def parse_importtime(output: str) -> Tuple[int, List[Tuple[str, int]]]:
+    total = 0
+    modules = []
+
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+
+        self_time, cumulative_time, name = line[len('import time:'):].split('|')
+
+        # top level imports don't have indentation
+        if not name[1:].startswith(' '):
+            total += int(cumulative_time)
+
+        modules.append((name.strip(), int(self_time)))
+
+    modules.sort(key=lambda module: module[1], reverse=True)
+    return total, modules
+
+
+def run(code: str, runs: int) -> Dict[str, Any]:
+    wall_times = []
+    import_times = []
+    slowest: List[Tuple[str, int]] = []
+
+    with tempfile.TemporaryDirectory(prefix='stng_startup_') as temp_directory:
+        env = {
+            **os.environ,
+            'PYTHONPATH': str(source_directory),
+            'XDG_CONFIG_HOME': temp_directory,
+            'LOCALAPPDATA': temp_directory,
+            'PYTHONDONTWRITEBYTECODE': '1',
+        }
+
+        for _ in range(runs):
+            # each run reads bytecode from an empty cache, so none of them is warmed up by the previous
+            with tempfile.TemporaryDirectory(prefix='stng_pycache_') as pycache_directory:
+                start_time = time.perf_counter()
+                process = subprocess.run(
+                    [sys.executable, '-B', '-X', 'importtime', '-c', code],
+                    cwd=temp_directory,
+                    env={**env, 'PYTHONPYCACHEPREFIX': pycache_directory},
+                    capture_output=True,
+                    text=True,
+                )
+                wall_time = time.perf_counter() - start_time
+
+            if process.returncode != 0:
+                error = process.stderr.strip().splitlines()[-1] if process.stderr.strip() else 'unknown error'
+                return {'error': error}
+
+            total, slowest = parse_importtime(process.stderr)
+            wall_times.append(round(wall_time * 1000, 2))
+            import_times.append(round(total / 1000, 2))
+
+    return {
+        'wall_ms': statistics.median(wall_times),
+        'import_ms': statistics.median(import_times),
+        'runs': runs,
+        'slowest': [{'module': name, 'self_ms': round(self_time / 1000, 2)} for name, self_time in slowest[:10]],
+    }
+
+
+def compare(results: Dict[str, Any], previous: Dict[str, Any]) -> None:
+    print(f"{'entry point':<22} {'previous':>10} {'current':>10} {'delta':>9}")
+
+    for name, result in results['entry_points'].items():
+        old_result = previous['entry_points'].get(name, {})
+
+        if 'wall_ms' not in result or 'wall_ms' not in old_result:
+            continue
+
+        delta = (result['wall_ms'] - old_result['wall_ms']) / old_result['wall_ms'] * 100
+        print(f"{name:<22} {old_result['wall_ms']:>8.1f}ms {result['wall_ms']:>8.1f}ms {delta:>+8.1f}%")
+
+
+def main() -> None:
+    command_parser = argparse.ArgumentParser()
+    command_parser.add_argument('--runs', type=int, default=5, help='Runs per entry point (median is used)')
+    command_parser.add_argument('--output', type=Path, help='Save results as JSON')
+    command_parser.add_argument('--compare', type=Path, help='Compare with results from a previous run')
+    command_parser.add_argument('entry_points', nargs='*', help='Entry points to run (default: all)')
+    params = command_parser.parse_args()
+
+    selected = params.entry_points or list(entry_points)
+    results: Dict[str, Any] = {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'time': int(time.time()),
+        'entry_points': {},
+    }
+
+    for name in selected:
+        result = run(entry_points[name], params.runs)
+        results['entry_points'][name] = result
+
+        if 'error' in result:
+            print(f"{name:<22} skipped ({result['error']})")
+        else:
+            print(f"{name:<22} {result['wall_ms']:>8.1f}ms (imports: {result['import_ms']:.1f}ms)")
+
+    if params.output:
+        params.output.write_text(json.dumps(results, indent=2), encoding='utf-8')
+
+    if params.compare:
+        print()
+        compare(results, json.loads(params.compare.read_text(encoding='utf-8')))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,606 @@
+#!/usr/bin/env python
+#
+# Lara Maia <dev@lara.monster> 2015 ~ 2023
+#
+# The Steam Tools NG is free software: you can redistribute it and/or
+# modify it under the terms of the GNU General Public License as
+# published by the Free Software Foundation, either version 3 of
+# the License, or (at your option) any later version.
+#
+# The Steam Tools NG is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+# See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program. If not, see http://www.gnu.org/licenses/.
+#
+
+# Local stand-in for the Steam, steamgifts and steamtrades endpoints used by stlib,
+# for reproducible load tests without touching the real servers.
+#
+# usage: steam_simulator.py [--port 8088] [--latency MS] [--jitter MS] [--error-rate 0.05]
+#                           [--badges N] [--coupons N] [--confirmations N] [--giveaways N] [--trades N]
+#
+# Point the app at it with:
+#     [steam]
+#     redirect_url = http://localhost:8088
+#
+# Any account name and password are accepted. Running games for card farming still
+# needs a real Steam client, so drops are simulated over time instead.
+# Request counters and latencies are available at /_simulator/stats
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import string
+import time
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict, List, Set
+
+import rsa
+from aiohttp import web
+
+Handler = Callable[[web.Request], Awaitable[web.StreamResponse]]
+
+# these routes are never delayed or failed so the app is always able to log in
+setup_routes = (
+    '/IAuthenticationService/',
+    '/jwt/',
+    '/login/',
+    '/account',
+    '/dev/',
+    '/openid/',
+    '/_simulator/',
+)
+
+
+def _html(body: str) -> web.Response:
+    return web.Response(text=f'<html><head></head><body>{body}</body></html>', content_type='text/html')
+
+
+def _json(data: Any) -> web.Response:
+    return web.json_response(data)
+
+
+def _random_id(rng: random.Random, size: int = 5) -> str:
+    return ''.join(rng.choices(string.ascii_letters + string.digits, k=size))
+
+
+class SteamSimulator:
+    def __init__(self, params: argparse.Namespace) -> None:
+        self.params = params
+        self.rng = random.Random(params.seed)
+        self.steamid = params.steamid
+        self.public_key, _private_key = rsa.newkeys(512)
+        self.points = params.points
+        self.points_updated = time.monotonic()
+
+        self.games = [
+            {
+                'appid': 10000 + index * 10,
+                'name': f'Simulated Game {index}',
+                'playtime_forever': self.rng.randint(0, 6000),
+                'img_icon_url': '',
+                'has_dlc': False,
+                'has_market': True,
+                'has_workshop': False,
+            }
+            for index in range(max(params.games, params.badges))
+        ]
+
+        self.cards = {game['appid']: self.rng.randint(1, 4) for game in self.games[:params.badges]}
+        self.last_drop: Dict[int, float] = {}
+
+        self.coupons = []
+
+        for index in range(params.coupons):
+            game = self.rng.choice(self.games)
+            packages = ','.join(str(self.rng.randint(1000, 999999)) for _ in range(self.rng.randint(1, 2)))
+
+            self.coupons.append({
+                'assetid': str(20000000000 + index),
+                'classid': str(3000000 + index),
+                'discount': self.rng.choice([10, 25, 33, 50, 66, 75, 90]),
+                'name': game['name'],
+                'link': f'https://store.steampowered.com/search/?list_of_subs={packages}',
+            })
+
+        self.confirmations = {
+            1000 + index: {
+                'id': str(1000 + index),
+                'type': 2,
+                'accept': 'Accept',
+                'cancel': 'Cancel',
+                'creator_id': str(5000 + index),
+                'nonce': str(self.rng.getrandbits(60)),
+                'creation_time': int(time.time()),
+                'icon': '',
+                'summary': [f'Trade with Simulated Friend {index}'],
+            }
+            for index in range(params.confirmations)
+        }
+
+        self.giveaways = {}
+
+        for index in range(params.giveaways):
+            id_ = _random_id(self.rng)
+            self.giveaways[id_] = {
+                'name': f'Simulated Giveaway {index}',
+                'copies': self.rng.choice([1, 1, 1, 1, 1, 1, 2, 3, 5, 10]),
+                'points': self.rng.randint(1, 50),
+                'level': self.rng.choice([0, 0, 0, 0, 0, 1, 2, 3, 5, 8]),
+                'pinned': index < 3,
+            }
+
+        self.entered: Set[str] = set()
+        self.trades = {f'TR{index:03d}': 0.0 for index in range(params.trades)}
+
+        self.requests: Dict[str, int] = defaultdict(int)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+
+    def route_name(self, request: web.Request) -> str:
+        resource = request.match_info.route.resource
+        return f'{request.method} {resource.canonical if resource else request.path}'
+
+    @web.middleware
+    async def middleware(self, request: web.Request, handler: Handler) -> web.StreamResponse:
+        name = self.route_name(request)
+        self.requests[name] += 1
+        start_time = time.perf_counter()
+
+        try:
+            if not request.path.startswith(setup_routes):
+                if self.params.latency or self.params.jitter:
+                    delay = self.params.latency + self.rng.uniform(-self.params.jitter, self.params.jitter)
+                    await asyncio.sleep(max(0.0, delay) / 1000)
+
+                if self.rng.random() < self.params.error_rate:
+                    self.errors[name] += 1
+                    raise web.HTTPServiceUnavailable()
+
+            return await handler(request)
+        finally:
+            self.latencies[name].append(time.perf_counter() - start_time)
+
+    async def stats(self, request: web.Request) -> web.Response:
+        routes = {}
+
+        for name, count in sorted(self.requests.items()):
+            latencies = sorted(self.latencies[name])
+
+            routes[name] = {
+                'requests': count,
+                'errors': self.errors[name],
+                'median_ms': round(statistics.median(latencies) * 1000, 2) if latencies else 0,
+                'p95_ms': round(latencies[int(len(latencies) * 0.95)] * 1000, 2) if latencies else 0,
+            }
+
+        return _json({'routes': routes, 'points': self.user_points, 'entered': len(self.entered)})
+
+    # --- login ---
+
+    async def rsa_public_key(self, request: web.Request) -> web.Response:
+        return _json({'response': {
+            'publickey_mod': format(self.public_key.n, 'x'),
+            'publickey_exp': format(self.public_key.e, 'x'),
+            'timestamp': str(int(time.time())),
+        }})
+
+    async def begin_auth_session(self, request: web.Request) -> web.Response:
+        return _json({'response': {
+            'client_id': str(self.rng.getrandbits(60)),
+            'request_id': _random_id(self.rng, 16),
+            'steamid': str(self.steamid),
+            'allowed_confirmations': [{'confirmation_type': 3}],
+        }})
+
+    async def update_auth_session(self, request: web.Request) -> web.Response:
+        return _json({'response': {'success': True}})
+
+    async def poll_auth_session(self, request: web.Request) -> web.Response:
+        return _json({'response': {
+            'account_name': 'simulated',
+            'refresh_token': _random_id(self.rng, 32),
+            'access_token': _random_id(self.rng, 32),
+        }})
+
+    async def finalize_login(self, request: web.Request) -> web.Response:
+        data = await request.post()
+
+        return _json({'transfer_info': [{
+            'url': 'https://steamcommunity.com/login/settoken',
+            'params': {'nonce': data.get('nonce', ''), 'auth': _random_id(self.rng, 16)},
+        }]})
+
+    async def set_token(self, request: web.Request) -> web.Response:
+        response = _json({'result': 1})
+        response.set_cookie('steamLoginSecure', f'{self.steamid}%7C%7C{_random_id(self.rng, 32)}')
+        return response
+
+    async def account(self, request: web.Request) -> web.Response:
+        return _html('<div class="account_setting_block">Simulated account</div>')
+
+    async def community_root(self, request: web.Request) -> web.Response:
+        # same path is used by steamgifts and steamtrades login pages
+        if 'login' in request.query:
+            return _html(
+                '<form action="https://steamcommunity.com/openid/login" method="post">'
+                '<input type="hidden" name="openid.mode" value="checkid_setup">'
+                f'<input type="hidden" name="nonce" value="{_random_id(self.rng, 16)}">'
+                '</form>'
+            )
+
+        session_id = _random_id(self.rng, 24)
+        response = _html(f'<script>\n\t\tg_sessionID = "{session_id}";\n</script>')
+        response.set_cookie('sessionid', session_id)
+        return response
+
+    async def openid_login(self, request: web.Request) -> web.Response:
+        # steamgifts and steamtrades check for different avatar classes
+        return _html(
+            '<a class="nav__avatar-outer-wrap" href="/user/simulated"></a>'
+            f'<a class="nav_avatar" href="/user/{self.steamid}"></a>'
+        )
+
+    async def api_key(self, request: web.Request) -> web.Response:
+        return _html(
+            '<div id="mainContents"><div id="bodyContents_ex">'
+            '<h2>Your Steam Web API Key</h2>'
+            f'<p>Key: {"0" * 32}</p>'
+            '<p>Domain Name: Steam Tools NG</p>'
+            '</div></div>'
+        )
+
+    async def api_key_update(self, request: web.Request) -> web.Response:
+        return _html('')
+
+    # --- webapi ---
+
+    async def server_info(self, request: web.Request) -> web.Response:
+        return _json({'servertime': int(time.time()), 'servertimestring': time.ctime()})
+
+    async def owned_games(self, request: web.Request) -> web.Response:
+        appids = {int(value) for key, value in request.query.items() if key.startswith('appids_filter')}
+        games = [game for game in self.games if not appids or game['appid'] in appids]
+        return _json({'response': {'game_count': len(games), 'games': games}})
+
+    # --- card farming ---
+
+    def _remaining_cards(self, appid: int) -> int:
+        now = time.monotonic()
+        last_drop = self.last_drop.setdefault(appid, now)
+
+        if self.cards.get(appid, 0) > 0 and now - last_drop >= self.params.drop_interval:
+            self.cards[appid] -= 1
+            self.last_drop[appid] = now
+
+        return self.cards.get(appid, 0)
+
+    @staticmethod
+    def _progress(cards: int) -> str:
+        text = f'{cards} card drops remaining' if cards else 'No card drops remaining'
+        return f'<span class="progress_info_bold">{text}</span>'
+
+    async def profile(self, request: web.Request) -> web.Response:
+        return _html('<div class="profile_header">Simulated</div>')
+
+    async def badges(self, request: web.Request) -> web.Response:
+        appids = [appid for appid, cards in self.cards.items() if cards]
+        per_page = self.params.badges_per_page
+        pages = max(1, -(-len(appids) // per_page))
+        page = int(request.query.get('p', 1))
+        rows = []
+
+        for appid in appids[(page - 1) * per_page:page * per_page]:
+            rows.append(
+                '<div class="badge_row"><div class="badge_title_row">'
+                f'<a class="btn_green_white_innerfade" href="steam://run/{appid}">Play</a>'
+                f'<div class="badge_title">\n{chr(9) * 9}Simulated Game {(appid - 10000) // 10}{chr(9) * 9}'
+                '&nbsp;<span class="badge_view_details">View details</span></div>'
+                f'{self._progress(self._remaining_cards(appid))}'
+                '</div></div>'
+            )
+
+        links = ''.join(f'<a class="pagelink" href="?p={index}">{index}</a>' for index in range(2, pages + 1))
+        return _html(''.join(rows) + links)
+
+    async def gamecards(self, request: web.Request) -> web.Response:
+        appid = int(request.match_info['appid'])
+        return _html(f'<div class="badge_title_stats_drops">{self._progress(self._remaining_cards(appid))}</div>')
+
+    # --- coupons ---
+
+    async def inventory(self, request: web.Request) -> web.Response:
+        count = int(request.query.get('count', 5000))
+        start = int(request.query.get('start_assetid', 0))
+        coupons = [coupon for coupon in self.coupons if int(coupon['assetid']) > start][:count]
+
+        data: Dict[str, Any] = {
+            'success': 1,
+            'total_inventory_count': len(self.coupons),
+            'assets': [
+                {
+                    'appid': 753,
+                    'contextid': '3',
+                    'assetid': coupon['assetid'],
+                    'classid': coupon['classid'],
+                    'instanceid': '0',
+                    'amount': '1',
+                }
+                for coupon in coupons
+            ],
+            'descriptions': [
+                {
+                    'appid': 753,
+                    'classid': coupon['classid'],
+                    'instanceid': '0',
+                    'name': f"{coupon['discount']}% OFF {coupon['name']}",
+                    'market_name': f"{coupon['discount']}% OFF {coupon['name']}",
+                    'type': 'Coupon',
+                    'marketable': 0,
+                    'tradable': 1,
+                    'commodity': 0,
+                    'icon_url': '',
+                    'icon_url_large': '',
+                    'item_expiration': '',
+                    'actions': [{'link': coupon['link'], 'name': 'View in store'}],
+                }
+                for coupon in coupons
+            ],
+        }
+
+        if coupons and coupons[-1] is not self.coupons[-1]:
+            data['more_items'] = 1
+            data['last_assetid'] = coupons[-1]['assetid']
+
+        return _json(data)
+
+    async def package_details(self, request: web.Request) -> web.Response:
+        packageid = request.query.get('packageids', '0')
+        rng = random.Random(packageid)
+
+        return _json({packageid: {'success': True, 'data': {
+            'name': f'Simulated Package {packageid}',
+            'page_image': '',
+            'small_logo': '',
+            'apps': [{'id': rng.choice(self.games)['appid'], 'name': 'Simulated Game'}],
+            'platforms': {'windows': True, 'mac': False, 'linux': True},
+            'release_date': {'coming_soon': False, 'date': '1 Jan, 2020'},
+            'price': {'currency': 'USD', 'initial': rng.randint(199, 5999), 'discount_percent': 0},
+        }}})
+
+    async def send_trade_offer(self, request: web.Request) -> web.Response:
+        return _json({'tradeofferid': str(self.rng.getrandbits(40)), 'needs_mobile_confirmation': True})
+
+    # --- confirmations ---
+
+    async def confirmations_list(self, request: web.Request) -> web.Response:
+        return _json({'success': True, 'conf': list(self.confirmations.values())})
+
+    async def confirmation_details(self, request: web.Request) -> web.Response:
+        confirmation_id = int(request.match_info['id'])
+
+        if confirmation_id not in self.confirmations:
+            return _json({'success': False})
+
+        item = '<div class="trade_item" data-economy-item="classinfo/753/{}/0"></div>'
+        html = (
+            '<div class="mobileconf_offer_friend"><span>Simulated Friend</span></div>'
+            f'<div class="tradeoffer_item_list">{item.format(confirmation_id)}</div>'
+            f'<div class="tradeoffer_item_list">{item.format(confirmation_id + 1)}</div>'
+        )
+
+        return _json({'success': True, 'html': html})
+
+    async def item_class_hover(self, request: web.Request) -> web.Response:
+        classid = request.match_info['classid']
+        item = json.dumps({
+            'id': classid,
+            'name': f'Simulated Card {classid}',
+            'market_name': f'Simulated Card {classid}',
+            'type': 'Trading Card',
+            'appid': '753',
+        }, separators=(',', ':'))
+
+        return _html(f"<script>BuildHover( 'economy_item', {item} );</script>")
+
+    async def confirmation_action(self, request: web.Request) -> web.Response:
+        self.confirmations.pop(int(request.query.get('cid', 0)), None)
+        return _json({'success': True})
+
+    # --- steamgifts ---
+
+    @property
+    def user_points(self) -> int:
+        now = time.monotonic()
+        gained = int((now - self.points_updated) / 60 * self.params.points_per_minute)
+
+        if gained:
+            self.points = min(self.params.points, self.points + gained)
+            self.points_updated = now
+
+        return self.points
+
+    def _giveaway_row(self, id_: str, giveaway: Dict[str, Any]) -> str:
+        copies = f'<span class="giveaway__heading__thin">({giveaway["copies"]} Copies)</span>'
+        level = f'<div class="giveaway__column--contributor-level">Level {giveaway["level"]}+</div>'
+
+        return (
+            '<div class="giveaway__row-outer-wrap">'
+            f'<a class="giveaway__heading__name" href="/giveaway/{id_}/simulated">{giveaway["name"]}</a>'
+            f'{copies if giveaway["copies"] > 1 else ""}'
+            f'<span class="giveaway__heading__thin">({giveaway["points"]}P)</span>'
+            f'{level if giveaway["level"] else ""}'
+            '</div>'
+        )
+
+    async def giveaways_search(self, request: web.Request) -> web.Response:
+        query = request.query
+        pinned = []
+        rows = []
+
+        for id_, giveaway in self.giveaways.items():
+            if id_ in self.entered:
+                continue
+
+            if not int(query.get('point_min', 0)) <= giveaway['points'] <= int(query.get('point_max', 50)):
+                continue
+
+            if not int(query.get('level_min', 0)) <= giveaway['level'] <= int(query.get('level_max', 100)):
+                continue
+
+            if giveaway['pinned']:
+                pinned.append(self._giveaway_row(id_, giveaway))
+            elif len(rows) < 50:
+                rows.append(self._giveaway_row(id_, giveaway))
+
+        return _html(
+            f'<a class="nav__button"><span class="nav__points">{self.user_points}</span>'
+            f'<span>Level {self.params.level}</span></a>'
+            '<div class="widget-container">'
+            f'<div class="pinned-giveaways__outer-wrap">{"".join(pinned)}</div>'
+            '<div class="page__heading">Giveaways</div>'
+            f'{"".join(rows)}'
+            '</div>'
+        )
+
+    async def giveaway(self, request: web.Request) -> web.Response:
+        id_ = request.match_info['id']
+        form = ''
+
+        if id_ in self.giveaways and id_ not in self.entered:
+            form = (
+                '<form><input type="hidden" name="xsrf_token" value="simulated">'
+                f'<input type="hidden" name="code" value="{id_}"></form>'
+            )
+
+        return _html(f'<a class="nav__avatar-outer-wrap" href="/user/simulated"></a><div class="sidebar">{form}</div>')
+
+    async def giveaways_settings(self, request: web.Request) -> web.Response:
+        return _html('<form><input type="hidden" name="xsrf_token" value="simulated"></form>')
+
+    # --- steamtrades ---
+
+    async def trade(self, request: web.Request) -> web.Response:
+        id_ = request.match_info['id']
+
+        if id_ not in self.trades:
+            raise web.HTTPNotFound()
+
+        if not request.match_info.get('title'):
+            raise web.HTTPMovedPermanently(f'/trade/{id_}/simulated-trade-{id_.lower()}')
+
+        return _html(
+            f'<a class="nav_avatar" href="/user/{self.steamid}"></a>'
+            '<form><input type="hidden" name="xsrf_token" value="simulated">'
+            f'<input type="hidden" name="code" value="{id_}"></form>'
+        )
+
+    async def trades_list(self, request: web.Request) -> web.Response:
+        # the most recently bumped trades are on the first page
+        bumped = sorted(self.trades, key=lambda trade_id: self.trades[trade_id], reverse=True)
+        return _html(''.join(f'<a href="/trade/{trade_id}/">{trade_id}</a>' for trade_id in bumped[:25]))
+
+    async def ajax(self, request: web.Request) -> web.Response:
+        data = await request.post()
+        code = str(data.get('code', ''))
+
+        if data.get('do') == 'entry_insert':
+            giveaway = self.giveaways.get(code)
+
+            if not giveaway or code in self.entered or self.user_points < giveaway['points']:
+                return _json({'type': 'error', 'msg': 'Not Enough Points'})
+
+            self.points -= giveaway['points']
+            self.entered.add(code)
+            return _json({'type': 'success', 'entry_count': '1', 'points': str(self.points)})
+
+        if data.get('do') == 'trade_bump':
+            minutes_left = int((self.trades.get(code, 0) + 3600 - time.time()) / 60)
+
+            if minutes_left > 0:
+                return _json({'popup_heading_h2': [f'Please wait another {minutes_left} minutes.']})
+
+            self.trades[code] = time.time()
+            return _json({'type': 'success'})
+
+        raise web.HTTPBadRequest()
+
+
+def build_app(simulator: SteamSimulator) -> web.Application:
+    app = web.Application(middlewares=[simulator.middleware])
+    app.add_routes([
+        web.get('/_simulator/stats', simulator.stats),
+        web.get('/IAuthenticationService/GetPasswordRSAPublicKey/v1', simulator.rsa_public_key),
+        web.post('/IAuthenticationService/BeginAuthSessionViaCredentials/v1', simulator.begin_auth_session),
+        web.post('/IAuthenticationService/UpdateAuthSessionWithSteamGuardCode/v1', simulator.update_auth_session),
+        web.post('/IAuthenticationService/PollAuthSessionStatus/v1', simulator.poll_auth_session),
+        web.post('/jwt/finalizelogin', simulator.finalize_login),
+        web.post('/login/settoken', simulator.set_token),
+        web.get('/account', simulator.account),
+        web.get('/', simulator.community_root),
+        web.post('/openid/login', simulator.openid_login),
+        web.get('/dev/apikey', simulator.api_key),
+        web.post('/dev/revokekey', simulator.api_key_update),
+        web.post('/dev/registerkey', simulator.api_key_update),
+        web.get('/ISteamWebAPIUtil/GetServerInfo/v1', simulator.server_info),
+        web.get('/IPlayerService/GetOwnedGames/v1', simulator.owned_games),
+        web.get('/profiles/{steamid}', simulator.profile),
+        web.get('/profiles/{steamid}/badges/', simulator.badges),
+        web.get('/profiles/{steamid}/gamecards/{appid}', simulator.gamecards),
+        web.get('/inventory/{steamid}/{appid}/{contextid}', simulator.inventory),
+        web.get('/api/packagedetails', simulator.package_details),
+        web.post('/tradeoffer/new/send', simulator.send_trade_offer),
+        web.get('/mobileconf/getlist', simulator.confirmations_list),
+        web.get('/mobileconf/details/{id}', simulator.confirmation_details),
+        web.get('/mobileconf/ajaxop', simulator.confirmation_action),
+        web.get('/economy/itemclasshover/{appid}/{classid}', simulator.item_class_hover),
+        web.get('/giveaways/search', simulator.giveaways_search),
+        web.get('/giveaway/{id}/{title}', simulator.giveaway),
+        web.get('/account/settings/giveaways', simulator.giveaways_settings),
+        web.post('/account/settings/giveaways', simulator.giveaways_settings),
+        web.get('/trade/{id}/', simulator.trade),
+        web.get('/trade/{id}/{title}', simulator.trade),
+        web.get('/trades', simulator.trades_list),
+        web.post('/ajax.php', simulator.ajax),
+    ])
+
+    return app
+
+
+def main() -> None:
+    command_parser = argparse.ArgumentParser()
+    command_parser.add_argument('--host', default='localhost', help='Address to listen on')
+    command_parser.add_argument('--port', type=int, default=8088, help='Port to listen on')
+    command_parser.add_argument('--latency', type=float, default=0, help='Response delay in milliseconds')
+    command_parser.add_argument('--jitter', type=float, default=0, help='Random variation of the delay in milliseconds')
+    command_parser.add_argument('--error-rate', type=float, default=0, help='Fraction of requests failing with 503')
+    command_parser.add_argument('--seed', type=int, default=0, help='Seed for generated data')
+    command_parser.add_argument('--steamid', type=int, default=76561198000000001, help='SteamID of the account')
+    command_parser.add_argument('--games', type=int, default=100, help='Owned games')
+    command_parser.add_argument('--badges', type=int, default=50, help='Games with card drops remaining')
+    command_parser.add_argument('--badges-per-page', type=int, default=150, help='Badges on each badge page')
+    command_parser.add_argument('--drop-interval', type=float, default=600, help='Seconds between card drops')
+    command_parser.add_argument('--coupons', type=int, default=100, help='Coupons in the bot inventory')
+    command_parser.add_argument('--confirmations', type=int, default=5, help='Pending confirmations')
+    command_parser.add_argument('--giveaways', type=int, default=200, help='Open giveaways')
+    command_parser.add_argument('--points', type=int, default=400, help='Maximum steamgifts points')
+    command_parser.add_argument('--points-per-minute', type=float, default=1, help='steamgifts points regeneration')
+    command_parser.add_argument('--level', type=int, default=5, help='steamgifts user level')
+    command_parser.add_argument('--trades', type=int, default=3, help='steamtrades trades')
+    params = command_parser.parse_args()
+
+    simulator = SteamSimulator(params)
+
+    if simulator.trades:
+        print(f"steamtrades trade_ids: {','.join(simulator.trades)}")
+
+    web.run_app(build_app(simulator), host=params.host, port=params.port)
+
+
+if __name__ == "__main__":
+    main()